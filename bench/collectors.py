@@ -0,0 +1,61 @@
+"""Compare the psutil and /proc collector backends on synthetic process tables.
+
+Usage: python -m bench.collectors [--sizes 1000 5000 20000] [--rounds 5]
+"""
+import argparse
+import statistics
+import time
+
+import psutil
+
+from bench.fixtures import make_proc_tree, remove_proc_tree
+from tracker.collectors import ProcCollector, PsutilCollector
+
+DEFAULT_SIZES = [1000, 5000, 20000]
+
+
+def time_collector(collector, rounds):
+    collector.collect()  # Warm up caches, the first pass also primes cpu_percent
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        rows = collector.collect()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(rows)
+
+
+def run(sizes=DEFAULT_SIZES, rounds=5):
+    results = []
+    for size in sizes:
+        root = make_proc_tree(size)
+        previous_procfs = psutil.PROCFS_PATH
+        psutil.PROCFS_PATH = root
+        try:
+            for collector in (PsutilCollector(), ProcCollector(proc_root=root)):
+                median, rows = time_collector(collector, rounds)
+                results.append({"backend": collector.name, "processes": size,
+                                "rows": rows, "median_ms": median * 1000})
+        finally:
+            psutil.PROCFS_PATH = previous_procfs
+            remove_proc_tree(root)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.rounds)
+    print(f"{'backend':<8} {'processes':>9} {'rows':>6} {'median ms':>10} {'speedup':>8}")
+    baseline = {}
+    for r in results:
+        if r["backend"] == "psutil":
+            baseline[r["processes"]] = r["median_ms"]
+        speedup = baseline[r["processes"]] / r["median_ms"]
+        print(f"{r['backend']:<8} {r['processes']:>9} {r['rows']:>6} {r['median_ms']:>10.2f} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
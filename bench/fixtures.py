@@ -0,0 +1,66 @@
+import os
+import random
+import shutil
+import tempfile
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+TOTAL_MEMORY_KB = 64 * 1024 * 1024  # 64 GB host
+
+NAMES = ["python3", "chrome", "gunicorn", "postgres", "java", "node", "bash", "sshd",
+         "systemd-journald", "containerd-shim-runc-v2", "nginx", "redis-server"]
+
+
+def _stat_line(pid, name, ppid, utime, stime, start_time, rss_pages):
+    # Field layout of /proc/<pid>/stat, only the fields ResFlow and psutil read matter
+    fields = ["S", ppid, pid, pid, 0, -1, 4194560, 100, 0, 0, 0, utime, stime, 0, 0, 20, 0, 1, 0,
+              start_time, rss_pages * PAGE_SIZE * 2, rss_pages] + [0] * 30
+    return f"{pid} ({name[:15]}) " + " ".join(str(f) for f in fields) + "\n"
+
+
+def write_process(root, pid, name, rss_pages, utime=0, stime=0, start_time=1000, ppid=1):
+    base = os.path.join(root, str(pid))
+    os.makedirs(base, exist_ok=True)
+    with open(os.path.join(base, "stat"), "w") as f:
+        f.write(_stat_line(pid, name, ppid, utime, stime, start_time, rss_pages))
+    with open(os.path.join(base, "statm"), "w") as f:
+        f.write(f"{rss_pages * 2} {rss_pages} {rss_pages // 4} 100 0 {rss_pages} 0\n")
+    with open(os.path.join(base, "status"), "w") as f:
+        f.write(f"Name:\t{name[:15]}\nState:\tS (sleeping)\nPid:\t{pid}\nPPid:\t{ppid}\n"
+                f"Uid:\t1000\t1000\t1000\t1000\nGid:\t1000\t1000\t1000\t1000\n"
+                f"VmRSS:\t{rss_pages * PAGE_SIZE // 1024} kB\n")
+    with open(os.path.join(base, "cmdline"), "w") as f:
+        f.write(f"/usr/bin/{name}\0--synthetic\0")
+    with open(os.path.join(base, "cgroup"), "w") as f:
+        f.write(f"0::/system.slice/{name}.service\n")
+
+
+def make_proc_tree(count, root=None, seed=0):
+    """Build a fake /proc with `count` processes, returns its path.
+
+    Memory sizes are log-normal so most processes are tiny and a few dominate,
+    which is what a real host looks like to the 0.1% cutoff.
+    """
+    rng = random.Random(seed)
+    root = root or tempfile.mkdtemp(prefix="resflow-proc-")
+    with open(os.path.join(root, "meminfo"), "w") as f:
+        f.write(f"MemTotal:       {TOTAL_MEMORY_KB} kB\n"
+                f"MemFree:        {TOTAL_MEMORY_KB // 2} kB\n"
+                f"MemAvailable:   {TOTAL_MEMORY_KB // 2} kB\n"
+                "Buffers:               0 kB\nCached:                0 kB\n"
+                "Active:                0 kB\nInactive:              0 kB\nShmem:                 0 kB\n"
+                "SwapTotal:             0 kB\nSwapFree:              0 kB\n")
+    with open(os.path.join(root, "stat"), "w") as f:
+        f.write("cpu  100 0 100 10000 0 0 0 0 0 0\nbtime 1700000000\n")
+    with open(os.path.join(root, "uptime"), "w") as f:
+        f.write("100000.00 100000.00\n")
+
+    for pid in range(1, count + 1):
+        rss_kb = int(min(rng.lognormvariate(9.5, 1.8), TOTAL_MEMORY_KB // 20))
+        write_process(root, pid, rng.choice(NAMES), max(1, rss_kb * 1024 // PAGE_SIZE),
+                      utime=rng.randint(0, 10 ** 6), stime=rng.randint(0, 10 ** 5),
+                      start_time=rng.randint(100, 10 ** 7), ppid=1 if pid < 50 else rng.randint(1, 49))
+    return root
+
+
+def remove_proc_tree(root):
+    shutil.rmtree(root, ignore_errors=True)
@@ -0,0 +1,71 @@
+"""Throughput of the sharded /proc collector against the worker count on a synthetic process table.
+
+Usage: python -m bench.parallel [--processes 20000] [--workers 1 2 4 8] [--modes process thread]
+                                [--rounds 5] [--json FILE]
+
+Every case returns the whole table and is compared with a single
+ProcCollector on the same table. Speedup is bounded by the cores of this
+machine, printed in the header.
+"""
+import argparse
+import json
+import os
+import sys
+
+from bench.collectors import time_collector
+from bench.fixtures import make_proc_tree, remove_proc_tree
+from tracker.collectors import ProcCollector, ShardedCollector
+
+DEFAULT_WORKERS = [1, 2, 4, 8]
+
+
+def run(processes=20000, workers=DEFAULT_WORKERS, modes=("process", "thread"), rounds=5):
+    root = make_proc_tree(processes)
+    results = []
+    try:
+        baseline, rows = time_collector(ProcCollector(proc_root=root), rounds)
+        results.append({"mode": "single", "workers": 1, "rows": rows, "median_ms": baseline * 1000})
+        for mode in modes:
+            for count in workers:
+                collector = ShardedCollector(proc_root=root, workers=count, mode=mode)
+                try:
+                    median, rows = time_collector(collector, rounds)
+                    results.append({"mode": mode, "workers": count, "rows": rows, "median_ms": median * 1000})
+                finally:
+                    collector.close()
+    finally:
+        remove_proc_tree(root)
+    for r in results:
+        r["processes_per_s"] = processes / r["median_ms"] * 1000
+        r["speedup"] = baseline * 1000 / r["median_ms"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKERS)
+    parser.add_argument("--modes", nargs="+", choices=["process", "thread"], default=["process", "thread"])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON, '-' for stdout")
+    args = parser.parse_args()
+
+    results = run(args.processes, args.workers, args.modes, args.rounds)
+    if args.json:
+        report = {"python": sys.version.split()[0], "cpus": os.cpu_count(), "processes": args.processes,
+                  "results": results}
+        if args.json == "-":
+            print(json.dumps(report, indent=2))
+            return
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{args.processes} processes, {os.cpu_count()} CPUs")
+    print(f"{'mode':<8} {'workers':>7} {'rows':>6} {'median ms':>10} {'procs/s':>10} {'speedup':>8}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['workers']:>7} {r['rows']:>6} {r['median_ms']:>10.2f} "
+              f"{r['processes_per_s']:>10.0f} {r['speedup']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Cold-start time of each entry point, measured with `python -X importtime`.
+
+Usage: python -m bench.startup [--runs 5] [--only NAME ...] [--json FILE] [--scale 1.0]
+
+Each scenario starts a fresh interpreter. It reports the median wall time
+and time spent importing over `--runs` starts, plus the heaviest top-level
+imports. Exits 1 when a median is over its budget (times `--scale`, for slow
+machines), or when a command loads a module it must never need, e.g. Qt for
+`resflow query`.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+GUI_ONLY = ("PyQt5", "pyqtgraph", "numpy")
+SAMPLER = ("psutil",)
+
+# (name, interpreter arguments, wall-time budget in ms, top-level packages it must not import)
+SCENARIOS = (
+    ("help", [MAIN, "--help"], 100, GUI_ONLY + SAMPLER),
+    ("query", [MAIN, "query", "--help"], 120, GUI_ONLY + SAMPLER),
+    ("watch", [MAIN, "watch", "--help"], 120, GUI_ONLY),
+    ("daemon", [MAIN, "daemon", "--help"], 300, GUI_ONLY),
+    ("agent", [MAIN, "agent", "--help"], 300, GUI_ONLY),
+    ("bench", [MAIN, "bench", "--help"], 200, GUI_ONLY),
+    ("gui", ["-c", "import main, gui.app_gui"], 1000, ()),
+)
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def parse_importtime(output):
+    """[(module, cumulative µs, depth)] from -X importtime output"""
+    modules = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(2)), (len(match.group(3)) - 1) // 2))
+    return modules
+
+
+def run_once(args):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT, stdout=subprocess.DEVNULL,
+                            stderr=subprocess.PIPE, env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    wall = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} exited with {result.returncode}:\n{result.stderr.decode()[-2000:]}")
+    return wall, parse_importtime(result.stderr.decode(errors="replace"))
+
+
+def measure(name, args, budget, forbidden, runs):
+    walls = []
+    imports = []
+    modules = []
+    for _ in range(runs):
+        wall, modules = run_once(args)
+        walls.append(wall)
+        imports.append(sum(us for _, us, depth in modules if depth == 0) / 1000)
+    top_level = sorted(((m, us) for m, us, depth in modules if depth == 0), key=lambda m: m[1], reverse=True)
+    loaded = {m.split(".")[0] for m, _, _ in modules}
+    wall = statistics.median(walls)
+    return {
+        "name": name,
+        "wall_ms": wall,
+        "import_ms": statistics.median(imports),
+        "modules": len(modules),
+        "heaviest": [[m, round(us / 1000, 1)] for m, us in top_level[:3]],
+        "budget_ms": budget,
+        "forbidden": sorted(loaded.intersection(forbidden)),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="interpreter starts per scenario")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only these scenarios")
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON, '-' for stdout")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply every budget, for slower machines")
+    args = parser.parse_args(argv)
+
+    quiet = args.json == "-"
+    if not quiet:
+        print(f"{'command':<8} {'wall ms':>8} {'import ms':>10} {'budget':>7} {'modules':>8}  heaviest imports")
+    results = []
+    failed = False
+    for name, command, budget, forbidden in SCENARIOS:
+        if args.only and name not in args.only:
+            continue
+        result = measure(name, command, budget * args.scale, forbidden, args.runs)
+        over = result["wall_ms"] > result["budget_ms"]
+        failed = failed or over or bool(result["forbidden"])
+        results.append(result)
+        if not quiet:
+            heaviest = ", ".join(f"{m} {ms}ms" for m, ms in result["heaviest"])
+            flags = ("  OVER BUDGET" if over else "") + (
+                f"  LOADS {', '.join(result['forbidden'])}" if result["forbidden"] else "")
+            print(f"{name:<8} {result['wall_ms']:>8.1f} {result['import_ms']:>10.1f} {result['budget_ms']:>7.0f} "
+                  f"{result['modules']:>8}  {heaviest}{flags}", flush=True)
+
+    report = {"python": sys.version.split()[0], "runs": args.runs, "results": results}
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
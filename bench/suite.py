@@ -0,0 +1,304 @@
+"""Time ResFlow's own hot paths on a synthetic process table.
+
+Usage: resflow bench [--processes 2000] [--rounds 50] [--only NAME ...] [--no-gui]
+                     [--json FILE] [--compare BASELINE.json] [--tolerance 0.25]
+
+Every case runs against the fake /proc from bench.fixtures, so results do
+not depend on what the host happens to be running. Each case reports timing
+percentiles plus the peak memory traced during one call and the net number of
+blocks it leaves allocated. --json writes the results for later runs to
+--compare against.
+"""
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench.fixtures import make_proc_tree, remove_proc_tree
+
+FORMAT_VERSION = 1
+VARIANTS = 8  # Jittered copies of the process table, cycled so every round sees changed values
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def measure(name, func, rounds, warmup=2):
+    """Time `func(i)` for `rounds` calls, then trace the allocations of one more call"""
+    for i in range(warmup):
+        func(i)
+    timings = []
+    for i in range(rounds):
+        started = time.perf_counter()
+        func(warmup + i)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        blocks = sys.getallocatedblocks()
+        func(warmup + rounds)
+        blocks = sys.getallocatedblocks() - blocks
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "name": name,
+        "rounds": rounds,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": percentile(timings, 0.50),
+        "p90_ms": percentile(timings, 0.90),
+        "p99_ms": percentile(timings, 0.99),
+        "max_ms": timings[-1],
+        "alloc_peak_kb": peak / 1024,
+        "alloc_blocks": blocks,
+    }
+
+
+def jittered(rows, count=VARIANTS, seed=0):
+    """Copies of `rows` whose memory and CPU drift a little, like consecutive scans"""
+    rng = random.Random(seed)
+    variants = []
+    for _ in range(count):
+        variant = []
+        for row in rows:
+            scale = 1 + rng.uniform(-0.02, 0.02)
+            variant.append(dict(row, memory_mb=round(row["memory_mb"] * scale, 2),
+                                memory_percent=round(row["memory_percent"] * scale, 2),
+                                cpu_percent=round(rng.uniform(0, 5), 2)))
+        variants.append(variant)
+    return variants
+
+
+def collection_cases(root):
+    import psutil
+    from tracker import monitor
+    from tracker.collectors import EventProcCollector, ProcCollector, PsutilCollector
+
+    proc = ProcCollector(proc_root=root)
+    yield "collect.proc", lambda i: proc.collect()
+
+    # Polls the fake /proc for starts and exits, so only candidates and a slice of idle processes are read
+    events = EventProcCollector(proc_root=root)
+    try:
+        yield "collect.events", lambda i: events.collect()
+    finally:
+        events.close()
+
+    psutil_collector = PsutilCollector()
+
+    def collect_psutil(i):
+        previous, psutil.PROCFS_PATH = psutil.PROCFS_PATH, root
+        try:
+            psutil_collector.collect()
+        finally:
+            psutil.PROCFS_PATH = previous
+    yield "collect.psutil", collect_psutil
+
+    # The whole scan: collect, group, filter and rank, as the sampler runs it
+    def snapshot(i):
+        monitor.get_snapshot(ttl=0)
+    previous = monitor.get_collector()
+    monitor.set_collector(ProcCollector(proc_root=root))
+    try:
+        yield "snapshot", snapshot
+    finally:
+        monitor.set_collector(previous)
+
+
+def ranking_cases(variants):
+    import heapq
+    from tracker.collectors import MIN_MEMORY_PERCENT
+    from tracker.groups import ProcessGroups
+    from tracker.monitor import ProcessSnapshot, RANK_LIMIT, rank_key
+
+    ranked_rows = [[p for p in rows if p["memory_percent"] >= MIN_MEMORY_PERCENT] for rows in variants]
+    yield "rank.nlargest", lambda i: heapq.nlargest(RANK_LIMIT, ranked_rows[i % len(ranked_rows)], key=rank_key)
+
+    snapshots = [ProcessSnapshot(rows) for rows in ranked_rows]
+    yield "get_top_processes", lambda i: snapshots[i % len(snapshots)].top(5)
+
+    yield "groups.update", lambda i: ProcessGroups(variants[i % len(variants)])
+
+
+def logging_cases(snapshot, directory):
+    from tracker import logger
+
+    previous = logger.log_dir
+    logger.configure()
+    logger.log_dir = directory
+    try:
+        yield "log.memory", lambda i: logger.log_memory(55.5, snapshot)
+        yield "log.flush", lambda i: (logger.log_memory(55.5, snapshot), logger.shutdown())
+    finally:
+        logger.shutdown()
+        logger.log_dir = previous
+
+
+class _Replay:
+    """Stands in for the sampler so update_data renders the prepared process tables"""
+
+    def __init__(self, variants):
+        from tracker.monitor import ProcessSnapshot
+        self.snapshot_class = ProcessSnapshot
+        self.variants = variants
+        self.seq = 0
+        self.start = time.time()
+
+    def take(self):
+        from tracker.monitor import Sample
+        self.seq += 1
+        # A new snapshot timestamp every tick, so the table refreshes every time
+        timestamp = self.start + self.seq
+        variant = self.variants[self.seq % len(self.variants)]
+        snapshot = self.snapshot_class(variant.processes, variant.ranked, timestamp=timestamp, groups=variant.groups)
+        return Sample(seq=self.seq, timestamp=timestamp,
+                      memory={"total": 65536.0, "available": 30000.0, "used": 35536.0, "percent": 54.2 + self.seq % 5},
+                      cpu_percent=12.0, swap={"total": 0.0, "used": 0.0, "percent": 0.0},
+                      snapshot=snapshot, duration=0.0, jitter=0.0)
+
+    def stop(self):
+        pass
+
+
+def gui_cases(variants, snapshots, directory):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    from gui.process_table import ProcessTableModel
+
+    model = ProcessTableModel()
+    yield "gui.table_update", lambda i: (model.update(variants[i % len(variants)]), app.processEvents())
+
+    # A whole tick of the main window, sampling replaced by prepared samples
+    from gui.app_gui import MemoryTrackerApp
+    cwd = os.getcwd()
+    os.chdir(directory)  # The window opens logs/metrics.bin relative to the working directory
+    window = None
+    try:
+        window = MemoryTrackerApp()
+        window.sampler.stop()
+        window.sampler = _Replay(snapshots)
+        window.show()
+        yield "gui.update_data", lambda i: (window.update_data(), app.processEvents())
+    finally:
+        if window is not None:
+            window.close()
+        os.chdir(cwd)
+
+
+def run(processes=2000, rounds=50, only=None, gui=True, progress=None):
+    from tracker.collectors import MIN_MEMORY_PERCENT, ProcCollector
+    from tracker.groups import ProcessGroups
+    from tracker.monitor import ProcessSnapshot
+
+    root = make_proc_tree(processes)
+    directory = tempfile.mkdtemp(prefix="resflow-bench-")
+    results = []
+    try:
+        rows = ProcCollector(proc_root=root).collect()
+        variants = jittered(rows)
+        snapshots = [ProcessSnapshot([p for p in v if p["memory_percent"] >= MIN_MEMORY_PERCENT],
+                                     groups=ProcessGroups(v)) for v in variants]
+
+        # Case groups are generators that set up on first use, so skipped ones cost nothing (no Qt import)
+        groups = [
+            (("collect", "snapshot"), lambda: collection_cases(root)),
+            (("rank", "get_top_processes", "groups"), lambda: ranking_cases(variants)),
+            (("log",), lambda: logging_cases(snapshots[0], directory)),
+        ]
+        if gui:
+            groups.append((("gui",), lambda: gui_cases(variants, snapshots, directory)))
+        for prefixes, cases in groups:
+            if only and not any(o.startswith(p) or p.startswith(o) for o in only for p in prefixes):
+                continue
+            for name, func in cases():
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                result = measure(name, func, rounds)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    finally:
+        remove_proc_tree(root)
+        remove_proc_tree(directory)
+
+    return {
+        "version": FORMAT_VERSION,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processes": processes,
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance):
+    """Cases whose p50 got slower than `tolerance` (a fraction) relative to the baseline"""
+    previous = {r["name"]: r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(result["name"])
+        if old is None or old["p50_ms"] <= 0:
+            continue
+        ratio = result["p50_ms"] / old["p50_ms"]
+        result["baseline_p50_ms"] = old["p50_ms"]
+        result["ratio"] = ratio
+        if ratio > 1 + tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def print_result(result):
+    print(f"{result['name']:<18} {result['p50_ms']:>9.3f} {result['p90_ms']:>9.3f} {result['p99_ms']:>9.3f} "
+          f"{result['max_ms']:>9.3f} {result['alloc_peak_kb']:>10.1f} {result['alloc_blocks']:>8}", flush=True)
+
+
+def add_arguments(parser):
+    parser.add_argument("--processes", type=int, default=2000, help="size of the synthetic process table")
+    parser.add_argument("--rounds", type=int, default=50, help="timed calls per case")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="run only cases whose name starts with NAME")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Qt cases")
+    parser.add_argument("--json", metavar="FILE", help="write results as JSON, '-' for stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON from an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed p50 slowdown against the baseline, as a fraction")
+
+
+def main(args):
+    quiet = args.json == "-"
+    if not quiet:
+        print(f"{args.processes} synthetic processes, {args.rounds} rounds per case (times in ms)")
+        print(f"{'case':<18} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'peak KB':>10} {'blocks':>8}")
+    try:
+        report = run(args.processes, args.rounds, args.only, gui=not args.no_gui,
+                     progress=None if quiet else print_result)
+    except ImportError as e:
+        raise SystemExit(f"resflow bench: {e} (use --no-gui to skip the Qt cases)")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if not quiet:
+            for result in report["results"]:
+                if "ratio" in result:
+                    flag = "  REGRESSION" if result in regressions else ""
+                    print(f"{result['name']:<18} {result['ratio']:>6.2f}x baseline{flag}")
+
+    if args.json == "-":
+        print(json.dumps(report, indent=2))
+    elif args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if regressions:
+        raise SystemExit(1)
@@ -4,23 +4,47 @@ import os
 import numpy as np
 from PyQt5.QtWidgets import (
     QApplication, QLabel, QVBoxLayout, QWidget, QPushButton,
-    QHBoxLayout, QFrame, QMainWindow
+    QHBoxLayout, QFrame, QMainWindow, QComboBox, QCheckBox
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QTimer, QObject, QEvent, pyqtSignal
 import pyqtgraph as pg
-from tracker.monitor import get_memory_usage, get_top_processes
+from tracker import instrument
+from tracker.monitor import RemoteSampler, Sampler, get_smaps_reader, set_accurate_memory
+from tracker.ipc import IpcClient
+from tracker.groups import GROUPINGS, query_groups
+from tracker.timeseries import RingBuffer
+from tracker.storage import MetricsStore, StoreLocked
+from tracker.rollup import Rollups
+from tracker.leaks import LeakDetector
+from tracker.scheduler import AdaptiveScheduler
+from gui.process_table import ProcessTable
 from PyQt5.QtWidgets import QSizePolicy, QScrollArea
 from PyQt5.QtWidgets import QGraphicsDropShadowEffect
 from PyQt5.QtGui import QColor
-from PyQt5.QtWidgets import QInputDialog
+from PyQt5.QtWidgets import QInputDialog, QMessageBox, QSystemTrayIcon
 from tracker.alert import set_alert_threshold, set_cooldown_time, DEFAULT_ALERT_THRESHOLD,DEFAULT_COOLDOWN_TIME
-from tracker.alert import alert_threshold
+from tracker.alert import AlertEngine, CallbackSink, LogSink, memory_rule
 # Set global pyqtgraph configuration
 pg.setConfigOptions(antialias=True)
 
+# How much raw history is kept in memory, and how much of it the graph shows at first.
+# Zooming out further switches the graph to the min/max/mean rollups.
+HISTORY_HOURS = 6
+PLOT_WINDOW = 60  # seconds
+SAMPLE_INTERVAL = 1.0
+
+
+class SamplerBridge(QObject):
+    """Carries sampler notifications from the worker thread into the GUI thread"""
+    sample_ready = pyqtSignal()
+    alert_raised = pyqtSignal(object)
+
+
 class MemoryTrackerApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, attach=None):
         super().__init__()
+        # Socket of a running daemon to take samples from, None to sample locally
+        self.attach = attach
         
         # Main setup
         self.setWindowTitle("ResFlow - Memory Tracker")
@@ -92,11 +116,11 @@ class MemoryTrackerApp(QMainWindow):
         self.main_layout.addWidget(usage_frame)
 
         # Graph widget
-        self.graph_widget = pg.PlotWidget()
+        self.graph_widget = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
         self.graph_widget.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         self.graph_widget.setBackground('w')
         self.graph_widget.setLabel('left', 'Memory Usage', units='%')
-        self.graph_widget.setLabel('bottom', 'Time', units='s')
+        self.graph_widget.setLabel('bottom', 'Time')
         self.graph_widget.showGrid(x=True, y=True, alpha=0.3)
         self.graph_widget.setYRange(0, 100)
         self.graph_widget.enableAutoRange(axis='y', enable=True)
@@ -104,15 +128,22 @@ class MemoryTrackerApp(QMainWindow):
         self.graph_widget.setMinimumHeight(400)
         self.graph_widget.setMaximumHeight(400)
 
+        # Multi-resolution history, lets the graph zoom out to weeks at a fixed cost
+        self.rollups = Rollups()
+        self.view_span = PLOT_WINDOW
+        self.follow_live = True
+
         viewbox = self.graph_widget.getViewBox()
         viewbox.setLimits(
-            xMin=0, xMax=None, minXRange=5, maxXRange=60,
+            minXRange=5, maxXRange=self.rollups.retention,
             yMin=0, yMax=120, minYRange=5, maxYRange=120
         )
-        viewbox.setMouseEnabled(x=False, y=False)
+        viewbox.setMouseEnabled(x=True, y=False)
+        viewbox.sigRangeChangedManually.connect(self.on_view_changed)
 
         # Create plot line for memory usage with fill
-        self.memory_curve = self.graph_widget.plot([], [], pen=pg.mkPen(color='r', width=3))
+        self.graph_widget.addLegend(offset=(10, 10))
+        self.memory_curve = self.graph_widget.plot([], [], pen=pg.mkPen(color='r', width=3), name="Memory")
         
         # Add filled area under the curve
         self.fill_curve = pg.PlotDataItem([], [], 
@@ -122,9 +153,21 @@ class MemoryTrackerApp(QMainWindow):
         )
         self.graph_widget.addItem(self.fill_curve)
 
-        self.memory_data = np.array([])
-        self.time_data = np.array([])
-        self.elapsed_time = 0
+        # Peak of each bucket, only shown while a rollup tier is plotted
+        self.peak_curve = self.graph_widget.plot([], [], pen=pg.mkPen(color=(128, 128, 128), width=1, style=Qt.DashLine))
+
+        # Share of time some task waited for memory (PSI), only drawn from raw samples
+        self.pressure_curve = self.graph_widget.plot([], [], pen=pg.mkPen(color=(255, 140, 0), width=2, style=Qt.DashLine),
+                                                    name="Memory stall (PSI)")
+
+        # Preallocated history, the plot gets views into it instead of copies
+        self.history = RingBuffer.for_retention(HISTORY_HOURS, SAMPLE_INTERVAL)
+        self.memory_data = self.history.values("memory_percent")
+        self.time_data = self.history.times()
+
+        # On-disk history, so the graph survives a restart
+        self.store = self.open_store()
+        self.load_history()
 
         self.main_layout.addWidget(self.graph_widget)
 
@@ -141,14 +184,84 @@ class MemoryTrackerApp(QMainWindow):
 
         process_layout = QVBoxLayout(process_frame)
 
-        process_title = QLabel("Top Memory Consumers")
-        process_title.setStyleSheet("font-size: 16px; font-weight: bold; margin-bottom: 10px;")
-        process_layout.addWidget(process_title)
+        process_header = QHBoxLayout()
+        self.back_button = QPushButton("◀ Back")
+        self.back_button.setFixedWidth(80)
+        self.back_button.clicked.connect(self.leave_group)
+        self.back_button.hide()
+        process_header.addWidget(self.back_button)
+        self.process_title = QLabel("Top Memory Consumers")
+        self.process_title.setStyleSheet("font-size: 16px; font-weight: bold; margin-bottom: 10px;")
+        process_header.addWidget(self.process_title)
+        process_header.addStretch()
+
+        # Sum small processes by tree, name, user or cgroup, double-click a group to see its members
+        self.group_combo = QComboBox()
+        self.group_combo.addItem("Processes", None)
+        for grouping in GROUPINGS:
+            self.group_combo.addItem(f"By {grouping}", grouping)
+        self.group_combo.currentIndexChanged.connect(self.set_grouping)
+        process_header.addWidget(self.group_combo)
+
+        # PSS/USS/swap of the top processes, costly so off by default
+        self.accurate_check = QCheckBox("PSS/USS")
+        self.accurate_check.setToolTip("Read proportional and unique memory of the top processes from smaps_rollup")
+        self.accurate_check.toggled.connect(self.set_accurate_memory)
+        process_header.addWidget(self.accurate_check)
+
+        # Rows are updated in place every tick instead of rebuilding widgets
+        self.process_table = ProcessTable(self.kill_process)
+        self.process_table.setMinimumHeight(300)
+        self.process_table.group_activated.connect(self.enter_group)
+
+        kill_button = QPushButton("Kill Selected")
+        kill_button.setFixedWidth(140)
+        kill_button.setStyleSheet("""
+            QPushButton {
+                background-color: #F44336;
+                color: white;
+                font-weight: bold;
+                border-radius: 6px;
+                padding: 6px;
+            }
+            QPushButton:hover {
+                background-color: #E53935;
+            }
+        """)
+        kill_button.clicked.connect(self.process_table.kill_selected)
+        process_header.addWidget(kill_button)
+
+        process_layout.addLayout(process_header)
+        process_layout.addWidget(self.process_table)
 
-        self.process_cards = QVBoxLayout()
-        process_layout.addLayout(self.process_cards)
+        # Processes whose RSS keeps climbing, refreshed every few samples
+        self.leak_label = QLabel("Growing fastest: collecting...")
+        self.leak_label.setStyleSheet("font-size: 13px; background-color: transparent; border: none;")
+        self.leak_label.setWordWrap(True)
+        process_layout.addWidget(self.leak_label)
 
         self.main_layout.addWidget(process_frame)
+
+        # What ResFlow itself costs, hidden until asked for since timing is off until then
+        self.overhead_frame = QFrame()
+        self.overhead_frame.setStyleSheet("""
+            QFrame {
+                background-color: white;
+                border-radius: 10px;
+                padding: 10px;
+            }
+        """)
+        self.add_shadow(self.overhead_frame)
+        overhead_layout = QVBoxLayout(self.overhead_frame)
+        overhead_title = QLabel("ResFlow Overhead")
+        overhead_title.setStyleSheet("font-size: 16px; font-weight: bold; margin-bottom: 10px;")
+        overhead_layout.addWidget(overhead_title)
+        self.overhead_label = QLabel("Collecting...")
+        self.overhead_label.setStyleSheet("font-size: 12px; background-color: transparent; border: none;")
+        self.overhead_label.setTextFormat(Qt.RichText)
+        overhead_layout.addWidget(self.overhead_label)
+        self.overhead_frame.hide()
+        self.main_layout.addWidget(self.overhead_frame)
 # In the header_layout section, after adding the theme button:
 
         self.threshold_button = QPushButton("⚙️ Set Alert")
@@ -168,14 +281,39 @@ class MemoryTrackerApp(QMainWindow):
         self.threshold_button.clicked.connect(self.set_alert_threshold)
         header_layout.addWidget(self.threshold_button)
 
+        self.overhead_button = QPushButton("⏱ Overhead")
+        self.overhead_button.setFixedWidth(120)
+        self.overhead_button.setCheckable(True)
+        self.overhead_button.setStyleSheet("""
+            QPushButton {
+                background-color: #607D8B;
+                color: white;
+                font-weight: bold;
+                border-radius: 6px;
+                padding: 8px;
+            }
+            QPushButton:hover, QPushButton:checked {
+                background-color: #455A64;
+            }
+        """)
+        self.overhead_button.toggled.connect(self.show_overhead)
+        header_layout.addWidget(self.overhead_button)
+
         # Initialize state
-        self.alert_triggered = False
+        self.scheduler = None
+        self.shown_snapshot_time = None
+        self.shown_snapshot = None
+        self.grouping = None
+        self.drill_group = None
+        self.query_client = None
+        self.alert_box = None
+        self.tray_icon = None
         self.apply_theme()
         self.start_tracking()
 
     def update_fill_curve(self, data_min=None):
         if data_min is None and len(self.memory_data) > 0:
-            data_min = np.min(self.memory_data) - 4
+            data_min = np.nanmin(self.memory_data) - 4
         else:
             data_min = 0
         self.fill_curve.setFillLevel(data_min)
@@ -250,7 +388,20 @@ class MemoryTrackerApp(QMainWindow):
                     min-height: 20px;
                     border-radius: 5px;
                 }
-                               
+
+                QTableView {
+                    background-color: #1e1e1e;
+                    alternate-background-color: #252525;
+                    selection-background-color: #3700B3;
+                    border: none;
+                }
+                QHeaderView::section {
+                    background-color: #2a2a2a;
+                    color: #e0e0e0;
+                    border: none;
+                    padding: 4px;
+                    font-weight: bold;
+                }
             """)
             self.threshold_button.setStyleSheet("""
                 QPushButton {
@@ -311,6 +462,20 @@ class MemoryTrackerApp(QMainWindow):
                     min-height: 20px;
                     border-radius: 5px;
                 }
+
+                QTableView {
+                    background-color: white;
+                    alternate-background-color: #f7f7f7;
+                    selection-background-color: #0078d4;
+                    border: none;
+                }
+                QHeaderView::section {
+                    background-color: #f0f0f0;
+                    color: #333333;
+                    border: none;
+                    padding: 4px;
+                    font-weight: bold;
+                }
             """)
             self.threshold_button.setStyleSheet("""
                 QPushButton {
@@ -342,91 +507,212 @@ class MemoryTrackerApp(QMainWindow):
                     """)
 
     def start_tracking(self):
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_data)
-        self.timer.start(1000)
-
-    def update_process_cards(self, processes):
-        # Clear existing cards
-        for i in reversed(range(self.process_cards.count())):
-            widget = self.process_cards.itemAt(i).widget()
-            if widget:
-                widget.setParent(None)
-
-        for process in processes:
-            card = QFrame()
-            if self.is_dark_mode:
-                card.setStyleSheet("""
-                    QFrame {
-                        background-color: #1e1e1e;
-                        border-radius: 10px;
-                        padding: 10px;
-                        border: 1px solid #333333;
-                    }
-                    QFrame:hover {
-                        background-color: #333333;
-                    }
-                """)
-            else:
-                card.setStyleSheet("""
-                    QFrame {
-                        background-color: white;
-                        border-radius: 10px;
-                        padding: 10px;
-                        border: 1px solid #e0e0e0;
-                    }
-                    QFrame:hover {
-                        background-color: #f0f0f0;
-                    }
-                """)
-            self.add_shadow(card)
-
-            card_layout = QHBoxLayout(card)
-            card_layout.setContentsMargins(8, 6, 8, 6)
-            card_layout.setSpacing(10)
-
-            # Process name and details in a single line
-            process_info = f"<b>{process['name']}</b> (PID: {process['pid']}) - {process['memory_mb']}MB, CPU: {process['cpu_percent']}%"
-            process_label = QLabel(process_info)
-            process_label.setStyleSheet("font-size: 14px; background-color: transparent; border: none;")
-            card_layout.addWidget(process_label)
-
-            # Create kill button with improved styling but shorter text
-            kill_button = QPushButton("Kill")
-            kill_button.setFixedWidth(70)
-            
-            if self.is_dark_mode:
-                kill_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #CF6679;
-                        color: white;
-                        font-weight: bold;
-                        border-radius: 6px;
-                        padding: 6px;
-                    }
-                    QPushButton:hover {
-                        background-color: #E57373;
-                    }
-                """)
-            else:
-                kill_button.setStyleSheet("""
-                    QPushButton {
-                        background-color: #F44336;
-                        color: white;
-                        font-weight: bold;
-                        border-radius: 6px;
-                        padding: 6px;
-                    }
-                    QPushButton:hover {
-                        background-color: #E53935;
-                    }
-                """)
-                
-            kill_button.clicked.connect(lambda _, pid=process["pid"]: self.kill_process(pid))
-            card_layout.addWidget(kill_button)
+        # Sampling runs on a worker thread, the GUI only renders what it publishes
+        self.sampler_bridge = SamplerBridge()
+        self.sampler_bridge.sample_ready.connect(self.update_data, Qt.QueuedConnection)
+        self.sampler_bridge.alert_raised.connect(self.show_alert, Qt.QueuedConnection)
+
+        # Rules run on the sampler thread, the GUI only receives finished events
+        sinks = [CallbackSink(self.sampler_bridge.alert_raised.emit)]
+        if self.attach is None:
+            sinks.append(LogSink())  # An attached daemon logs its own alerts
+        self.alerts = AlertEngine([memory_rule], sinks)
+        self.alerts.start()
+        self.leaks = LeakDetector()
+        listeners = [self.alerts.evaluate, self.leaks.update]
+        if self.attach is not None:
+            # The daemon already stores history, only display what it streams
+            self.sampler = RemoteSampler(self.attach, on_sample=self.sampler_bridge.sample_ready.emit,
+                                         listeners=listeners)
+        else:
+            # Memory is sampled every tick, the process scan only as often as the scheduler allows
+            self.scheduler = AdaptiveScheduler(base_interval=SAMPLE_INTERVAL, threshold=lambda: memory_rule.threshold)
+            self.sampler = Sampler(interval=SAMPLE_INTERVAL, on_sample=self.sampler_bridge.sample_ready.emit,
+                                   listeners=([self.store.append] if self.store is not None else []) + listeners,
+                                   scheduler=self.scheduler)
+        self.sampler.start()
+
+    def open_store(self):
+        """The metrics file, read-only when a daemon owns it, None when it cannot be used"""
+        try:
+            try:
+                return MetricsStore(readonly=self.attach is not None)
+            except StoreLocked as e:
+                print(f"{e}, showing its history without recording")
+                return MetricsStore(readonly=True)
+        except ValueError as e:
+            print(f"Could not open stored history, running without it: {e}")
+            return None
+
+    def load_history(self):
+        if self.store is None:
+            return
+        try:
+            stored = self.store.last(HISTORY_HOURS * 3600, resolution=SAMPLE_INTERVAL)
+            raw = self.store.last(self.rollups.retention, fields=("memory_percent",))
+        except ValueError as e:
+            print(f"Could not load stored history: {e}")
+            return
+        self.history.extend(stored.pop("timestamp"), stored)
+        self.rollups.load(raw["timestamp"], raw["memory_percent"])
+
+    def on_view_changed(self, *args):
+        """User zoomed or panned the graph"""
+        (x_min, x_max), _ = self.graph_widget.getViewBox().viewRange()
+        self.view_span = x_max - x_min
+        latest = self.history.times()[-1] if len(self.history) else x_max
+        # Keep scrolling with new samples unless the user panned into the past
+        self.follow_live = x_max >= latest - 0.05 * self.view_span
+        self.refresh_plot()
+
+    @instrument.timed("gui.plot")
+    def refresh_plot(self):
+        """Plot the visible range from raw samples or the coarsest-needed rollup tier"""
+        viewbox = self.graph_widget.getViewBox()
+        (x_min, x_max), _ = viewbox.viewRange()
+        span = x_max - x_min
+        pixels = max(1, int(viewbox.width()))
+
+        if span / SAMPLE_INTERVAL <= pixels:
+            first, last = self.history.index_range(x_min - SAMPLE_INTERVAL, x_max + SAMPLE_INTERVAL)
+            self.time_data = self.history.times()[first:last]
+            self.memory_data = self.history.values("memory_percent")[first:last]
+            self.peak_curve.setData([], [])
+            self.pressure_curve.setData(self.time_data, self.history.values("psi_some_avg10")[first:last])
+        else:
+            tier = self.rollups.tier_for(span, pixels)
+            self.time_data, stats = self.rollups.series(tier, x_min, x_max)
+            self.memory_data = stats["mean"]
+            self.peak_curve.setData(self.time_data, stats["max"])
+            self.pressure_curve.setData([], [])
+
+        self.memory_curve.setData(self.time_data, self.memory_data)
+        self.fill_curve.setData(self.time_data, self.memory_data)
+        self.update_fill_curve()
+
+    def set_visible_for_scheduler(self, visible):
+        if self.scheduler is not None:
+            self.scheduler.set_visible(visible)
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.WindowStateChange:
+            self.set_visible_for_scheduler(not self.isMinimized())
+        super().changeEvent(event)
+
+    def hideEvent(self, event):
+        self.set_visible_for_scheduler(False)
+        super().hideEvent(event)
+
+    def showEvent(self, event):
+        self.set_visible_for_scheduler(not self.isMinimized())
+        super().showEvent(event)
+
+    def closeEvent(self, event):
+        self.sampler.stop()
+        self.alerts.stop()
+        if self.store is not None:
+            self.store.close()
+        if self.query_client is not None:
+            self.query_client.close()
+        super().closeEvent(event)
+
+    def show_overhead(self, visible):
+        """Time the hot paths only while the panel is open"""
+        instrument.enable(visible)
+        if visible:
+            instrument.reset()
+        self.overhead_frame.setVisible(visible)
+
+    def update_overhead_panel(self):
+        report = instrument.report()
+        own = report["process"]
+        rows = "".join(
+            f"<tr><td>{name}</td><td align='right'>{t['count']}</td><td align='right'>{t['mean_ms']:.2f}</td>"
+            f"<td align='right'>{t['p90_ms']:.2f}</td><td align='right'>{t['max_ms']:.2f}</td></tr>"
+            for name, t in list(report["timers"].items())[:12]
+        )
+        self.overhead_label.setText(
+            f"<b>ResFlow (PID {own['pid']}):</b> {own['rss_mb']:.1f}MB RSS, {own['cpu_percent']:.1f}% CPU, "
+            f"{own['threads']} threads"
+            "<table cellspacing='6'><tr><th align='left'>Path</th><th>Calls</th><th>Mean ms</th>"
+            f"<th>p90 ms</th><th>Max ms</th></tr>{rows}</table>"
+        )
+
+    def update_leak_label(self):
+        suspects = self.leaks.fastest_growing(3, min_rate=0.1)
+        if not suspects:
+            self.leak_label.setText("Growing fastest: no process is steadily growing")
+            return
+        details = ", ".join(f"<b>{p['name']}</b> (PID: {p['pid']}) +{p['growth_mb_per_min']:.1f}MB/min"
+                            for p in suspects)
+        self.leak_label.setText(f"Growing fastest: {details}")
+
+    def show_alert(self, event):
+        """Non-modal notification, sampling and the graph keep running behind it"""
+        if QSystemTrayIcon.isSystemTrayAvailable():
+            if self.tray_icon is None:
+                self.tray_icon = QSystemTrayIcon(self.windowIcon(), self)
+                self.tray_icon.show()
+            self.tray_icon.showMessage("High Memory Usage Alert", event.message, QSystemTrayIcon.Warning)
+            return
+
+        if self.alert_box is None:
+            self.alert_box = QMessageBox(self)
+            self.alert_box.setIcon(QMessageBox.Warning)
+            self.alert_box.setWindowTitle("High Memory Usage Alert")
+            self.alert_box.setModal(False)
+        self.alert_box.setText(event.message)
+        self.alert_box.show()
+
+    def set_accurate_memory(self, enabled):
+        if self.attach is None:
+            set_accurate_memory(enabled)  # An attached daemon fills them in when started with --pss
+        self.process_table.set_accurate_columns(enabled)
+
+    def set_grouping(self, index):
+        self.grouping = self.group_combo.itemData(index)
+        self.drill_group = None
+        self.refresh_processes()
+
+    def enter_group(self, group):
+        self.drill_group = group
+        self.refresh_processes()
+
+    def leave_group(self):
+        self.drill_group = None
+        self.refresh_processes()
+
+    def group_members(self, key):
+        """Members of one group, asked from the daemon when attached since samples only carry group totals"""
+        if self.attach is None:
+            return query_groups(self.shown_snapshot.groups, self.grouping, key, limit=0)
+        try:
+            if self.query_client is None:
+                self.query_client = IpcClient(self.attach, timeout=1.0)
+            return self.query_client.query("groups", by=self.grouping, key=key, limit=0)
+        except (OSError, TimeoutError, RuntimeError) as e:
+            self.query_client = None
+            self.statusBar().showMessage(f"Could not load group members: {e}")
+            return []
+
+    @instrument.timed("gui.table")
+    def refresh_processes(self):
+        snapshot = self.shown_snapshot
+        if snapshot is None:
+            return
+        if self.grouping is None:
+            self.process_title.setText("Top Memory Consumers")
+            rows = snapshot.processes
+        elif self.drill_group is None:
+            self.process_title.setText(f"Memory by {self.grouping}")
+            rows = snapshot.groups.get(self.grouping, [])
+        else:
+            self.process_title.setText(f"{self.grouping.capitalize()}: {self.drill_group['name']}")
+            rows = self.group_members(self.drill_group["key"])
+        self.back_button.setVisible(self.drill_group is not None)
+        self.process_table.set_grouped(self.grouping is not None and self.drill_group is None)
+        self.process_table.update_processes(rows)
 
-            self.process_cards.addWidget(card)
-            
     def kill_process(self, pid):
         try:
             os.kill(pid, 9)
@@ -434,41 +720,61 @@ class MemoryTrackerApp(QMainWindow):
         except BaseException as e:
             print(f"Error killing process with PID {pid}: {e}")
 
+    @instrument.timed("gui.update_data")
     def update_data(self):
-        from tracker.alert import show_alert, alert_threshold
-        from tracker.logger import log_memory
-
-        usage = get_memory_usage()
-        if usage["percent"] > alert_threshold and not self.alert_triggered:
-            show_alert(self, usage["percent"])
-            log_memory(f"ALERT: High memory usage detected at {usage['percent']}% (Threshold: {alert_threshold}%)")
-            self.alert_triggered = True
-        else:
-            self.alert_triggered = False
+        # Only the newest sample is rendered, older ones were dropped by the sampler
+        sample = self.sampler.take()
+        if sample is None:
+            return
+        usage = sample.memory
+        snapshot = sample.snapshot
 
         # Update memory label
+        pressure = sample.pressure
+        stall = ""
+        if pressure.get("psi_some_avg10") or pressure.get("major_faults") or pressure.get("swap_out"):
+            stall = (f" | Stalled: {pressure['psi_some_avg10']:.1f}% (PSI 10s), "
+                     f"{pressure['major_faults']:.0f} major faults/s, {pressure['swap_out']:.0f} pages swapped out/s")
         self.memory_label.setText(
-            f"Memory Usage: {usage['percent']}% ({usage['used']}MB/{usage['total']}MB)"
+            f"Memory Usage: {usage['percent']}% ({usage['used']}MB/{usage['total']}MB){stall}"
         )
 
-        # Get process information
-        top_processes = get_top_processes(5)
-        self.update_process_cards(top_processes)
+        # Update process information, only when the table was actually rescanned
+        if snapshot.timestamp != self.shown_snapshot_time:
+            self.shown_snapshot_time = snapshot.timestamp
+            self.shown_snapshot = snapshot
+            self.refresh_processes()
+        if sample.seq % 10 == 0:
+            with instrument.timer("gui.leaks"):
+                self.update_leak_label()
+        if self.overhead_frame.isVisible() and sample.seq % 2 == 0:
+            self.update_overhead_panel()
+        if self.scheduler is not None:
+            rates = self.scheduler.rates()
+            message = (f"Process scan every {rates['scan_interval']:.1f}s ({rates['reason']}), "
+                       f"{rates['scan_cost_ms']:.0f}ms per scan")
+            smaps = get_smaps_reader()
+            if smaps is not None:
+                smaps_stats = smaps.stats()
+                message += (f"; PSS {smaps_stats['reads']} reads, {smaps_stats['avg_read_ms']:.1f}ms each, "
+                            f"{smaps_stats['cache_hits']} cached")
+            self.statusBar().showMessage(message)
 
         # Update graph data
-        self.elapsed_time += 1
-        self.time_data = np.append(self.time_data, self.elapsed_time)
-        self.memory_data = np.append(self.memory_data, usage["percent"])
+        self.history.append(sample.timestamp, {
+            "memory_percent": usage["percent"],
+            "used_mb": usage["used"],
+            "cpu_percent": sample.cpu_percent,
+            "swap_percent": sample.swap["percent"],
+            "psi_some_avg10": sample.pressure.get("psi_some_avg10", 0.0),
+        })
 
-        # Keep only the latest 60 data points (1 minute of data)
-        if len(self.memory_data) > 60:
-            self.memory_data = self.memory_data[-60:]
-            self.time_data = self.time_data[-60:]
+        self.rollups.add(sample.timestamp, usage["percent"])
 
-        # Update the plot
-        self.memory_curve.setData(self.time_data, self.memory_data)
-        self.fill_curve.setData(self.time_data, self.memory_data)
-        self.update_fill_curve()
+        # Update the plot, following the newest sample unless the user panned away
+        if self.follow_live:
+            self.graph_widget.setXRange(sample.timestamp - self.view_span, sample.timestamp, padding=0)
+        self.refresh_plot()
 
         # Add warning zone if memory usage is high
         if usage["percent"] > 70:
@@ -482,9 +788,9 @@ class MemoryTrackerApp(QMainWindow):
             self.memory_curve.setPen(pg.mkPen(color=line_color, width=3))
             self.fill_curve.setBrush(pg.mkBrush(color=fill_color))
 
-def start_app():
+def start_app(attach=None):
     app = QApplication(sys.argv)
-    window = MemoryTrackerApp()
+    window = MemoryTrackerApp(attach=attach)
     window.show()
     # Set up signal handling for Ctrl+C
     def signal_handler(sig, frame):
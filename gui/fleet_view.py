@@ -0,0 +1,162 @@
+"""Fleet window: the hottest hosts and processes reported to a `resflow aggregate`."""
+import signal
+import sys
+import threading
+
+from PyQt5.QtCore import QObject, QSortFilterProxyModel, Qt, QTimer, pyqtSignal
+from PyQt5.QtWidgets import (
+    QAbstractItemView, QApplication, QHeaderView, QLabel, QMainWindow, QSplitter, QTableView,
+    QVBoxLayout, QWidget
+)
+
+from gui.process_table import SORT_ROLE, ProcessTableModel
+from tracker.ipc import IpcClient
+
+POLL_INTERVAL = 1.0
+PROCESS_LIMIT = 50
+
+HOST_COLUMNS = (
+    ("host", "Host", "{}"),
+    ("memory_percent", "Memory %", "{:.1f}"),
+    ("used_mb", "Used (MB)", "{:.0f}"),
+    ("total_mb", "Total (MB)", "{:.0f}"),
+    ("cpu_percent", "CPU %", "{:.1f}"),
+    ("swap_percent", "Swap %", "{:.1f}"),
+    ("age", "Last seen (s)", "{:.1f}"),
+)
+
+FLEET_PROCESS_COLUMNS = (
+    ("name", "Name", "{}"),
+    ("host", "Host", "{}"),
+    ("pid", "PID", "{}"),
+    ("memory_mb", "Memory (MB)", "{:.2f}"),
+    ("memory_percent", "Memory %", "{:.2f}"),
+    ("cpu_percent", "CPU %", "{:.2f}"),
+)
+
+
+class FleetPoller(QObject):
+    """Queries the aggregator on a worker thread so a slow socket never stalls the window"""
+    updated = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, path, interval=POLL_INTERVAL):
+        super().__init__()
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ResFlowFleetPoll", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(2.0)
+
+    def _run(self):
+        client = None
+        while not self._stop_event.is_set():
+            try:
+                if client is None:
+                    client = IpcClient(self.path)
+                hosts = client.query("hosts")
+                processes = client.query("processes", limit=PROCESS_LIMIT)
+            except (OSError, ConnectionError, RuntimeError) as e:
+                if client is not None:
+                    client.close()
+                    client = None
+                self.failed.emit(str(e))
+            else:
+                self.updated.emit(hosts, processes)
+            self._stop_event.wait(self.interval)
+        if client is not None:
+            client.close()
+
+
+def _table(model, sort_column):
+    proxy = QSortFilterProxyModel(model)
+    proxy.setSourceModel(model)
+    proxy.setSortRole(SORT_ROLE)
+    proxy.setDynamicSortFilter(True)
+    view = QTableView()
+    view.setModel(proxy)
+    view.setSortingEnabled(True)
+    view.sortByColumn(sort_column, Qt.DescendingOrder)
+    view.setSelectionBehavior(QAbstractItemView.SelectRows)
+    view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+    view.setAlternatingRowColors(True)
+    view.setShowGrid(False)
+    view.verticalHeader().setVisible(False)
+    header = view.horizontalHeader()
+    header.setSectionResizeMode(QHeaderView.Interactive)
+    header.setSectionResizeMode(0, QHeaderView.Stretch)
+    return view
+
+
+class FleetWindow(QMainWindow):
+    def __init__(self, path):
+        super().__init__()
+        self.setWindowTitle("ResFlow - Fleet")
+        self.setGeometry(100, 100, 900, 700)
+
+        central = QWidget()
+        layout = QVBoxLayout(central)
+        self.setCentralWidget(central)
+
+        title = QLabel("ResFlow Fleet")
+        title.setStyleSheet("font-size: 20px; font-weight: bold;")
+        layout.addWidget(title)
+
+        self.summary_label = QLabel("Connecting to the aggregator...")
+        self.summary_label.setStyleSheet("font-size: 14px;")
+        layout.addWidget(self.summary_label)
+
+        splitter = QSplitter(Qt.Vertical)
+        self.host_model = ProcessTableModel(self, HOST_COLUMNS, "host")
+        self.host_table = _table(self.host_model, 1)  # Memory %
+        splitter.addWidget(self.host_table)
+        self.process_model = ProcessTableModel(self, FLEET_PROCESS_COLUMNS, "key")
+        self.process_table = _table(self.process_model, 3)  # Memory (MB)
+        splitter.addWidget(self.process_table)
+        layout.addWidget(splitter)
+        self.fit_columns = True
+
+        self.poller = FleetPoller(path)
+        self.poller.updated.connect(self.show_fleet)
+        self.poller.failed.connect(self.show_error)
+        self.poller.start()
+
+    def show_fleet(self, hosts, processes):
+        self.host_model.update(hosts)
+        self.process_model.update(processes)
+        if self.fit_columns and processes:
+            # Fit the columns to the first rows, after that the user may resize them
+            self.fit_columns = False
+            self.host_table.resizeColumnsToContents()
+            self.process_table.resizeColumnsToContents()
+        stale = sum(1 for h in hosts if h["stale"])
+        used = sum(h["used_mb"] for h in hosts if not h["stale"])
+        total = sum(h["total_mb"] for h in hosts if not h["stale"])
+        percent = used / total * 100 if total else 0.0
+        self.summary_label.setText(f"{len(hosts)} hosts ({stale} stale) | "
+                                   f"Fleet memory: {percent:.1f}% ({used / 1024:.1f} of {total / 1024:.1f} GB)")
+
+    def show_error(self, message):
+        self.summary_label.setText(f"Aggregator unreachable: {message}")
+
+    def closeEvent(self, event):
+        self.poller.stop()
+        super().closeEvent(event)
+
+
+def start_fleet(path):
+    app = QApplication(sys.argv)
+    window = FleetWindow(path)
+    window.show()
+    signal.signal(signal.SIGINT, lambda *_: app.quit())
+    # Lets Python run the signal handler while Qt's event loop is running
+    timer = QTimer()
+    timer.start(500)
+    timer.timeout.connect(lambda: None)
+    sys.exit(app.exec_())
@@ -0,0 +1,202 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QSortFilterProxyModel, pyqtSignal
+from PyQt5.QtWidgets import QTableView, QHeaderView, QAbstractItemView, QMenu
+
+# Raw values for sorting, the display role holds formatted text
+SORT_ROLE = Qt.UserRole
+
+# (row key, header, display format)
+COLUMNS = (
+    ("name", "Name", "{}"),
+    ("pid", "PID", "{}"),
+    ("memory_mb", "Memory (MB)", "{:.2f}"),
+    ("memory_percent", "Memory %", "{:.2f}"),
+    ("cpu_percent", "CPU %", "{:.2f}"),
+    # Only filled in for the top processes when accurate memory is on, see tracker.smaps
+    ("pss_mb", "PSS (MB)", "{:.2f}"),
+    ("uss_mb", "USS (MB)", "{:.2f}"),
+    ("swap_mb", "Swap (MB)", "{:.2f}"),
+)
+ACCURATE_COLUMNS = range(5, 8)
+
+# Columns when the table lists process groups (see tracker.groups), rows keyed by "key"
+GROUP_COLUMNS = (
+    ("name", "Group", "{}"),
+    ("count", "Processes", "{}"),
+    ("memory_mb", "Memory (MB)", "{:.2f}"),
+    ("memory_percent", "Memory %", "{:.2f}"),
+    ("cpu_percent", "CPU %", "{:.2f}"),
+)
+
+
+class ProcessTableModel(QAbstractTableModel):
+    """Process rows keyed by PID and updated in place between ticks.
+
+    Rows whose values did not move emit nothing, changed rows emit a single
+    `dataChanged` over the changed columns, and only exited or new processes
+    cause row removals/insertions. Group rows work the same way, keyed by group.
+    """
+
+    def __init__(self, parent=None, columns=COLUMNS, key="pid"):
+        super().__init__(parent)
+        self.columns = columns
+        self.key = key
+        self._rows = []
+
+    def set_columns(self, columns, key):
+        """Switch between process and group rows, dropping the current rows"""
+        self.beginResetModel()
+        self.columns = columns
+        self.key = key
+        self._rows = []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][1]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        key, _, fmt = self.columns[index.column()]
+        value = self._rows[index.row()].get(key)
+        if role == Qt.DisplayRole:
+            return "—" if value is None else fmt.format(value)
+        if role == SORT_ROLE:
+            return -1 if value is None else value
+        if role == Qt.TextAlignmentRole and not isinstance(value, str):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def pid_at(self, row):
+        return self._rows[row].get("pid")
+
+    def key_at(self, row):
+        return self._rows[row][self.key]
+
+    def row_at(self, row):
+        return self._rows[row]
+
+    def update(self, processes):
+        key = self.key
+        incoming = {p[key]: p for p in processes}
+
+        # Drop exited processes in contiguous runs, from the bottom up so row numbers stay valid
+        row = len(self._rows) - 1
+        while row >= 0:
+            if self._rows[row][key] in incoming:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and self._rows[row][key] not in incoming:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, last)
+            del self._rows[row + 1:last + 1]
+            self.endRemoveRows()
+
+        for row, current in enumerate(self._rows):
+            new = incoming.pop(current[key])
+            changed = [col for col, (name, _, _) in enumerate(self.columns) if current.get(name) != new.get(name)]
+            self._rows[row] = new
+            if changed:
+                self.dataChanged.emit(self.index(row, changed[0]), self.index(row, changed[-1]),
+                                      [Qt.DisplayRole, SORT_ROLE])
+
+        if incoming:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(incoming) - 1)
+            self._rows.extend(incoming.values())
+            self.endInsertRows()
+
+
+class ProcessTable(QTableView):
+    """Sortable view over a ProcessTableModel, with a context menu to kill processes.
+
+    In group mode the rows are process groups and `group_activated` fires with
+    the group's row when one is double-clicked, to drill down into its members.
+    """
+    group_activated = pyqtSignal(dict)
+
+    def __init__(self, kill_callback, parent=None):
+        super().__init__(parent)
+        self.kill_callback = kill_callback
+        self.process_model = ProcessTableModel(self)
+        self.proxy = QSortFilterProxyModel(self)
+        self.proxy.setSourceModel(self.process_model)
+        self.proxy.setSortRole(SORT_ROLE)
+        self.proxy.setDynamicSortFilter(True)
+        self.setModel(self.proxy)
+
+        self.setSortingEnabled(True)
+        self.sortByColumn(2, Qt.DescendingOrder)  # Memory (MB)
+        self.show_accurate = False
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setAlternatingRowColors(True)
+        self.setShowGrid(False)
+        self.verticalHeader().setVisible(False)
+        self.resize_columns()
+
+        self.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.customContextMenuRequested.connect(self.show_context_menu)
+        self.doubleClicked.connect(self.on_double_click)
+
+    def resize_columns(self):
+        # ResizeToContents would measure every row on every update, fit the columns once instead
+        header = self.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.Interactive)
+        header.setSectionResizeMode(0, QHeaderView.Stretch)
+        self._fit_columns = True
+        grouped = self.process_model.key == "key"
+        for col in ACCURATE_COLUMNS:
+            self.setColumnHidden(col, grouped or not self.show_accurate)
+
+    def set_accurate_columns(self, visible):
+        """Show or hide the PSS/USS/swap columns"""
+        self.show_accurate = visible
+        self.resize_columns()
+
+    def update_processes(self, processes):
+        self.process_model.update(processes)
+        if self._fit_columns and processes:
+            # First rows since the columns changed
+            self._fit_columns = False
+            self.resizeColumnsToContents()
+
+    def set_grouped(self, grouped):
+        """Show group rows (True) or process rows (False)"""
+        if grouped == (self.process_model.key == "key"):
+            return
+        if grouped:
+            self.process_model.set_columns(GROUP_COLUMNS, "key")
+        else:
+            self.process_model.set_columns(COLUMNS, "pid")
+        self.resize_columns()
+
+    def on_double_click(self, index):
+        if self.process_model.key == "key":
+            self.group_activated.emit(self.process_model.row_at(self.proxy.mapToSource(index).row()))
+
+    def selected_pids(self):
+        pids = [self.process_model.pid_at(self.proxy.mapToSource(index).row())
+                for index in self.selectionModel().selectedRows()]
+        return [pid for pid in pids if pid is not None]
+
+    def kill_selected(self):
+        for pid in self.selected_pids():
+            self.kill_callback(pid)
+
+    def show_context_menu(self, pos):
+        if not self.selected_pids():
+            return
+        menu = QMenu(self)
+        menu.addAction("Kill", self.kill_selected)
+        menu.exec_(self.viewport().mapToGlobal(pos))
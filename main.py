@@ -1,4 +1,56 @@
-from gui.app_gui import start_app
+import argparse
+import importlib
+import sys
+
+# command -> (module, function adding its arguments, entry point, help).
+# Only the module of the command being run is imported, so e.g. `resflow query`
+# never pays for Qt, NumPy or the sampler.
+COMMANDS = {
+    "daemon": ("tracker.daemon", "add_arguments", "main", "sample, store and alert without a GUI"),
+    "watch": ("tracker.ipc", "add_watch_arguments", "watch_main", "print samples streamed by a running daemon"),
+    "query": ("tracker.ipc", "add_query_arguments", "query_main",
+              "ask a running daemon for stats, alerts or leak suspects"),
+    "agent": ("tracker.fleet", "add_agent_arguments", "agent_main", "stream this host's samples to an aggregator"),
+    "aggregate": ("tracker.fleet", "add_aggregate_arguments", "aggregate_main",
+                  "collect samples from agents on many hosts"),
+    "bench": ("bench.suite", "add_arguments", "main", "time collection, ranking, logging and GUI refresh"),
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(prog="resflow", description="ResFlow memory monitor")
+    subparsers = parser.add_subparsers(dest="command")
+    gui_parser = subparsers.add_parser("gui", help="open the desktop app (default)")
+    gui_parser.add_argument("--attach", nargs="?", const="", default=None, metavar="SOCKET",
+                            help="show samples from a running daemon instead of sampling locally")
+    gui_parser.add_argument("--fleet", nargs="?", const="", default=None, metavar="SOCKET",
+                            help="show the hosts and processes of a running aggregator")
+
+    # The top-level parser has no options of its own, so the first bare word names the command
+    command = next((arg for arg in argv if not arg.startswith("-")), None)
+    module = None
+    for name, (module_name, add_arguments, _, description) in COMMANDS.items():
+        command_parser = subparsers.add_parser(name, help=description)
+        if name == command:
+            module = importlib.import_module(module_name)
+            getattr(module, add_arguments)(command_parser)
+
+    args = parser.parse_args(argv)
+    if args.command in COMMANDS:
+        getattr(module, COMMANDS[args.command][2])(args)
+    elif getattr(args, "fleet", None) is not None:
+        from tracker.fleet import default_fleet_socket_path
+        from gui.fleet_view import start_fleet
+        start_fleet(args.fleet or default_fleet_socket_path())
+    else:
+        from gui.app_gui import start_app
+        attach = getattr(args, "attach", None)
+        if attach == "":
+            from tracker.ipc import default_socket_path
+            attach = default_socket_path()
+        start_app(attach=attach)
+
 
 if __name__ == "__main__":
-    start_app()
+    main()
@@ -0,0 +1,197 @@
+import os
+import socket
+import tempfile
+import time
+
+import pytest
+
+from tracker.fleet import HEADER, DeltaDecoder, DeltaEncoder, FleetAggregator, FleetAgent
+from tracker.monitor import ProcessSnapshot, Sample
+
+
+class ManualSampler:
+    """Stands in for tracker.monitor.Sampler, the test submits samples itself"""
+
+    def add_listener(self, listener):
+        pass
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def make_sample(seq, processes, memory_percent=50.0):
+    rows = [{"pid": pid, "name": name, "memory_mb": mb, "memory_percent": mb / 100, "cpu_percent": 1.0}
+            for pid, name, mb in processes]
+    return Sample(seq=seq, timestamp=1000.0 + seq, cpu_percent=10.0, snapshot=ProcessSnapshot(rows),
+                  memory={"percent": memory_percent, "used": 4000.0, "total": 8000.0, "available": 4000.0},
+                  swap={"percent": 0.0}, duration=0.0, jitter=0.0)
+
+
+def payload(frame):
+    return frame[HEADER.size:]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_delta_round_trip_sends_changes_and_removals():
+    encoder = DeltaEncoder(top_n=3)
+    decoder = DeltaDecoder()
+
+    frame = encoder.encode(make_sample(1, [(10, "postgres", 900.0), (11, "nginx", 300.0)]))
+    processes, figures = decoder.decode(payload(frame))
+    decoder.processes = processes
+    assert figures["seq"] == 1 and figures["memory_percent"] == 50.0
+    assert {pid: p["name"] for pid, p in processes.items()} == {10: "postgres", 11: "nginx"}
+
+    # Unchanged processes are not resent, a changed one is sent without its name
+    unchanged = encoder.encode(make_sample(2, [(10, "postgres", 900.0), (11, "nginx", 300.0)]))
+    changed = encoder.encode(make_sample(3, [(10, "postgres", 950.0), (11, "nginx", 300.0)]))
+    assert len(changed) < len(frame)
+    assert b"postgres" not in changed
+    for data in (unchanged, changed):
+        processes, _ = decoder.decode(payload(data))
+        decoder.processes = processes
+    assert processes[10] == {"pid": 10, "name": "postgres", "memory_mb": 950.0, "memory_percent": 9.5,
+                             "cpu_percent": 1.0}
+
+    # nginx left the top, redis is new
+    frame = encoder.encode(make_sample(4, [(10, "postgres", 950.0), (12, "redis", 200.0)]))
+    previous = decoder.processes
+    processes, _ = decoder.decode(payload(frame))
+    assert sorted(processes) == [10, 12]
+    assert processes[12]["name"] == "redis"
+    assert sorted(previous) == [10, 11], "decode must not change the table readers hold"
+
+
+def test_reused_pid_with_a_new_name_resends_the_name():
+    encoder = DeltaEncoder()
+    decoder = DeltaDecoder()
+    for sample in (make_sample(1, [(10, "bash", 5.0)]), make_sample(2, [(10, "python", 5.0)])):
+        decoder.processes, _ = decoder.decode(payload(encoder.encode(sample)))
+    assert decoder.processes[10]["name"] == "python"
+
+
+def test_new_encoder_starts_from_an_empty_state():
+    sample = make_sample(1, [(10, "postgres", 900.0)])
+    encoder = DeltaEncoder()
+    encoder.encode(sample)
+    # After a reconnect both ends start over, so names are sent again
+    assert b"postgres" in DeltaEncoder().encode(sample)
+
+
+def start_agents(address, hosts, token=None):
+    agents = [FleetAgent(address, host=host, interval=0.05, token=token, sampler=ManualSampler())
+              for host in hosts]
+    for agent in agents:
+        agent.start()
+    return agents
+
+
+def stop_all(agents, aggregator):
+    for agent in agents:
+        agent.stop()
+    aggregator.stop()
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def aggregator(request):
+    directory = None
+    if request.param == "tcp":
+        aggregator = FleetAggregator(":0", stale_after=60)
+        aggregator.start()
+        address = f"127.0.0.1:{aggregator.address[1]}"
+    else:
+        # Short path, Unix socket paths are limited to about 100 bytes
+        directory = tempfile.mkdtemp(prefix="resflow-test-")
+        address = f"unix:{os.path.join(directory, 'fleet.sock')}"
+        aggregator = FleetAggregator(address, stale_after=60)
+        aggregator.start()
+    yield aggregator, address
+    aggregator.stop()
+    if directory is not None:
+        os.rmdir(directory)
+
+
+def test_several_agents_are_aggregated(aggregator):
+    aggregator, address = aggregator
+    agents = start_agents(address, ["web", "db", "cache"])
+    try:
+        for seq in range(1, 4):
+            agents[0].submit(make_sample(seq, [(1, "nginx", 100.0 * seq)], memory_percent=40.0))
+            agents[1].submit(make_sample(seq, [(1, "postgres", 2000.0), (2, "vacuum", 50.0)], memory_percent=90.0))
+            agents[2].submit(make_sample(seq, [(1, "redis", 500.0)], memory_percent=60.0))
+            assert wait_for(lambda: all(agent.sent >= seq for agent in agents))
+        assert wait_for(lambda: aggregator.stats()["frames"] >= 9)
+
+        hosts = aggregator.hosts()
+        assert [h["host"] for h in hosts] == ["db", "cache", "web"]
+        assert hosts[0]["processes"] == 2 and not hosts[0]["stale"]
+
+        top = aggregator.processes(limit=3)
+        assert [(p["host"], p["name"]) for p in top] == [("db", "postgres"), ("cache", "redis"), ("web", "nginx")]
+        assert top[2]["memory_mb"] == 300.0
+        assert [p["name"] for p in aggregator.processes(host="db")] == ["postgres", "vacuum"]
+    finally:
+        for agent in agents:
+            agent.stop()
+
+
+def test_host_is_stale_after_its_agent_disconnects(aggregator):
+    aggregator, address = aggregator
+    (agent,) = start_agents(address, ["web"])
+    agent.submit(make_sample(1, [(1, "nginx", 100.0)]))
+    assert wait_for(lambda: aggregator.stats()["frames"] == 1)
+    assert not aggregator.hosts()[0]["stale"]
+
+    agent.stop()
+    assert wait_for(lambda: aggregator.stats()["agents"] == 0)
+    assert aggregator.hosts()[0]["stale"]
+    assert aggregator.processes() == []
+
+
+@pytest.mark.parametrize("token", [None, "wrong"])
+def test_bad_or_missing_token_is_rejected(token):
+    aggregator = FleetAggregator(":0", token="secret")
+    aggregator.start()
+    agents = start_agents(f"127.0.0.1:{aggregator.address[1]}", ["intruder"], token=token)
+    try:
+        agents[0].submit(make_sample(1, [(1, "miner", 100.0)]))
+        assert wait_for(lambda: aggregator.stats()["rejected"] == 1)
+        assert aggregator.hosts() == []
+        assert wait_for(lambda: aggregator.stats()["agents"] == 0)
+    finally:
+        stop_all(agents, aggregator)
+
+
+def test_right_token_is_accepted():
+    aggregator = FleetAggregator(":0", token="secret")
+    aggregator.start()
+    agents = start_agents(f"127.0.0.1:{aggregator.address[1]}", ["web"], token="secret")
+    try:
+        agents[0].submit(make_sample(1, [(1, "nginx", 100.0)]))
+        assert wait_for(lambda: len(aggregator.hosts()) == 1)
+        assert aggregator.stats()["rejected"] == 0
+    finally:
+        stop_all(agents, aggregator)
+
+
+def test_listening_off_loopback_requires_a_token():
+    with pytest.raises(ValueError, match="token"):
+        FleetAggregator("0.0.0.0:0")
+    FleetAggregator("0.0.0.0:0", token="secret")
+    FleetAggregator("localhost:0")
+
+
+def test_default_listen_address_is_loopback():
+    aggregator = FleetAggregator(":0")
+    assert aggregator.family == socket.AF_INET and aggregator.address[0] == "127.0.0.1"
@@ -0,0 +1,72 @@
+import pytest
+
+from tracker.monitor import ProcessSnapshot, Sample
+from tracker.rules import SustainedRule, parse_rule
+
+
+@pytest.mark.parametrize("spec", [
+    "sustained:memory_percent>90:",
+    "slope:used_mb>100/min:",
+    "process_growth:50/min:",
+    "slope:used_mb<100/min:5m",
+    "sustained:no_such_metric>1:1m",
+    "threshold:memory_percent",
+    "nonsense",
+])
+def test_invalid_specs_raise_value_error(spec):
+    with pytest.raises(ValueError):
+        parse_rule(spec)
+
+
+def test_durations_accept_units():
+    assert parse_rule("sustained:memory_percent>90:2m").duration == 120
+    assert parse_rule("sustained:memory_percent<10:1h").duration == 3600
+    rule = parse_rule("sustained:swap_percent>5:30")
+    assert isinstance(rule, SustainedRule) and rule.duration == 30 and rule.metric == "swap_percent"
+
+
+def memory_sample(timestamp, used_mb, processes=()):
+    snapshot = ProcessSnapshot(list(processes), timestamp=timestamp)
+    return Sample(seq=0, timestamp=timestamp, cpu_percent=0.0, snapshot=snapshot, swap={"percent": 0.0},
+                  memory={"percent": 50.0, "used": used_mb, "total": 8000.0, "available": 8000.0 - used_mb},
+                  duration=0.0, jitter=0.0)
+
+
+def first_alert(rule, samples):
+    for sample in samples:
+        event = rule.evaluate(sample)
+        if event is not None:
+            return event
+    return None
+
+
+def test_slope_rule_fires_on_steady_growth_after_most_of_a_window():
+    rule = parse_rule("slope:used_mb>100/min:5m", cooldown=0)
+    event = first_alert(rule, [memory_sample(1000.0 + t, 2000 + t * 200 / 60) for t in range(600)])
+    assert event is not None
+    assert event.timestamp == 1000.0 + 240  # 80% of the window
+    assert event.value == pytest.approx(200, rel=1e-6)
+
+
+def test_slope_rule_ignores_flat_and_shrinking_metrics():
+    rule = parse_rule("slope:used_mb>100/min:5m", cooldown=0)
+    assert first_alert(rule, [memory_sample(1000.0 + t, 2000.0) for t in range(600)]) is None
+    rule = parse_rule("slope:used_mb>100/min:5m", cooldown=0)
+    assert first_alert(rule, [memory_sample(1000.0 + t, 6000 - t * 5.0) for t in range(600)]) is None
+
+
+def test_process_growth_rule_names_the_growing_process():
+    rule = parse_rule("process_growth:10/min:10m", cooldown=0)
+    samples = []
+    for t in range(0, 1200, 5):
+        processes = [
+            {"pid": 1, "create_time": 1.0, "name": "leaky", "memory_mb": 100 + t / 3,
+             "memory_percent": 1.0, "cpu_percent": 0.0},
+            {"pid": 2, "create_time": 1.0, "name": "steady", "memory_mb": 500.0,
+             "memory_percent": 5.0, "cpu_percent": 0.0},
+        ]
+        samples.append(memory_sample(1000.0 + t, 2000.0, processes))
+    event = first_alert(rule, samples)
+    assert event is not None and event.timestamp == 1000.0 + 480
+    assert [p["name"] for p in event.processes] == ["leaky"]
+    assert event.value == pytest.approx(20, rel=1e-6)
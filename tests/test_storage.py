@@ -0,0 +1,129 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from tracker.monitor import ProcessSnapshot, Sample
+from tracker.storage import (DEFAULT_RAW_RETENTION, DEFAULT_RETENTION, DOWNSAMPLE_INTERVAL, HEADER_SIZE,
+                             MetricsStore, StoreLocked)
+
+DAY = 24 * 3600
+NOW = 1_700_000_040.0  # On a minute boundary, so no minute mixes the two fills
+
+
+def make_sample(timestamp, memory_percent=50.0, top=(("postgres", 900.0),)):
+    rows = [{"pid": pid, "name": name, "memory_mb": mb, "memory_percent": mb / 100, "cpu_percent": 0.0}
+            for pid, (name, mb) in enumerate(top, start=1)]
+    return Sample(seq=0, timestamp=timestamp, cpu_percent=5.0, snapshot=ProcessSnapshot(rows),
+                  memory={"percent": memory_percent, "used": 4000.0, "total": 8000.0, "available": 4000.0},
+                  swap={"percent": 0.0}, duration=0.0, jitter=0.0)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "metrics.bin")
+
+
+def fill(store, start, end, step, memory_percent=50.0):
+    timestamp = start
+    while timestamp < end:
+        store.append(make_sample(timestamp, memory_percent))
+        timestamp += step
+    store.flush()
+
+
+def test_second_writer_is_locked_out_until_the_first_closes(path):
+    store = MetricsStore(path)
+    with pytest.raises(StoreLocked):
+        MetricsStore(path)
+    # Readers never take the lock
+    assert len(MetricsStore(path, readonly=True)) == 0
+    store.close()
+    MetricsStore(path).close()
+
+
+def test_torn_trailing_record_is_dropped(path):
+    now = float(int(time.time()))  # Opening compacts against the clock, keep the records recent
+    store = MetricsStore(path)
+    fill(store, now - 10, now, 1)
+    store.close()
+    with open(path, "ab") as f:
+        f.write(b"\1" * (store.itemsize // 2))  # A crash halfway through a write
+
+    store = MetricsStore(path)
+    assert os.path.getsize(path) == HEADER_SIZE + 10 * store.itemsize
+    store.append(make_sample(now))
+    store.flush()
+    assert list(store.records()["timestamp"][-2:]) == [now - 1, now]
+    store.close()
+
+
+def test_damaged_header_raises_value_error(path):
+    with open(path, "wb") as f:
+        f.write(b"RFLOWMET{not json".ljust(HEADER_SIZE, b"\0"))
+    with pytest.raises(ValueError, match="damaged"):
+        MetricsStore(path)
+    with pytest.raises(ValueError):
+        MetricsStore(path, readonly=True)
+
+
+def test_compaction_drops_expired_and_downsamples_old_records(path):
+    store = MetricsStore(path, flush_interval=1e9)
+    # Every minute from 62 days ago, then every second from an hour before the raw retention
+    every_second = NOW - DEFAULT_RAW_RETENTION - 3600
+    fill(store, NOW - 62 * DAY, every_second, 60, memory_percent=40.0)
+    fill(store, every_second, NOW, 1, memory_percent=60.0)
+    before = len(store)
+
+    removed = store.compact(now=NOW)
+    assert removed == before - len(store)
+    times = store.records()["timestamp"]
+    assert np.all(np.diff(times) > 0)
+
+    # Past the retention nothing is left
+    assert times[0] >= NOW - DEFAULT_RETENTION - DOWNSAMPLE_INTERVAL
+    # Past the raw retention one record per minute, averaged, stamped with the minute
+    raw_start = (NOW - DEFAULT_RAW_RETENTION) // DOWNSAMPLE_INTERVAL * DOWNSAMPLE_INTERVAL
+    old = store.records()[times < raw_start]
+    assert np.all(np.diff(old["timestamp"]) == DOWNSAMPLE_INTERVAL)
+    assert np.all(old["timestamp"] % DOWNSAMPLE_INTERVAL == 0)
+    assert set(np.unique(old["memory_percent"])) == {40.0, 60.0}
+    assert old["top_name"][0][0] == b"postgres"
+    # Within it every sample is kept
+    recent = times[times >= raw_start]
+    assert len(recent) == NOW - raw_start and np.all(np.diff(recent) == 1)
+
+    # A second pass at the same time has nothing left to do
+    assert store.compact(now=NOW) <= 1
+    store.close()
+
+
+def test_compaction_only_merges_newly_aged_records(path):
+    store = MetricsStore(path, flush_interval=1e9, raw_retention=3600)
+    fill(store, NOW - 3 * 3600, NOW, 1)
+    store.compact(now=NOW)
+    merged = store.records()["timestamp"]
+    merged = merged[merged < NOW - 3600 - DOWNSAMPLE_INTERVAL]
+
+    # An hour later only that hour is merged, older minute records stay as they were
+    removed = store.compact(now=NOW + 3600)
+    assert removed == 3600 - 3600 // DOWNSAMPLE_INTERVAL
+    assert np.array_equal(store.records()["timestamp"][:len(merged)], merged)
+    store.close()
+
+    # The boundary survives a reopen
+    reopened = MetricsStore(path, raw_retention=3600)
+    assert reopened.compact(now=NOW + 3600) == 0
+    reopened.close()
+
+
+def test_reader_sees_the_compacted_file(path):
+    store = MetricsStore(path, flush_interval=1e9, raw_retention=3600)
+    fill(store, NOW - 2 * 3600, NOW, 1)
+    reader = MetricsStore(path, readonly=True)
+    assert len(reader.records()) == 2 * 3600
+    store.compact(now=NOW)
+    assert len(reader.records()) == len(store) < 2 * 3600
+    assert reader.query(start=NOW - 60)["timestamp"].tolist() == list(np.arange(NOW - 60, NOW))
+    store.close()
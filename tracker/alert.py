@@ -1,42 +1,212 @@
-from PyQt5.QtWidgets import QMessageBox
-import time
-from tracker.monitor import get_top_processes
-from tracker.logger import log_alert
+"""Alert rules evaluated inside the sampler, delivered asynchronously to sinks.
+
+Rules run on the sampler thread and only push AlertEvents onto per-sink
+queues. Every sink drains its own queue on its own thread with its own timeout
+and retry policy, so a slow webhook or an unanswered dialog never holds up
+sampling, logging or the other sinks.
+"""
+import json
+import os
+import queue
+import subprocess
+import threading
+
+from tracker.logger import log_alert, log_alert_message, log_memory
+# Rules live in tracker.rules, re-exported here for existing callers
+from tracker.rules import (
+    AlertEvent, AlertRule, ThresholdRule, SustainedRule, SlopeRule, ProcessGrowthRule, parse_rule,
+)
 
 # Default values
 DEFAULT_ALERT_THRESHOLD = 80  
 DEFAULT_COOLDOWN_TIME = 20
 
-# Global variables
-last_alert_time = 0  
+# Kept for callers that read the current settings
 alert_threshold = DEFAULT_ALERT_THRESHOLD
 COOLDOWN_TIME = DEFAULT_COOLDOWN_TIME
 
+
+class AlertSink:
+    """Delivers events from its own queue on its own thread, with retries"""
+    name = "sink"
+
+    def __init__(self, timeout=5.0, retries=2, retry_delay=1.0, max_queued=100):
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = queue.Queue(max_queued)
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def deliver(self, event):
+        raise NotImplementedError
+
+    def submit(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        if self._thread is None:
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"ResFlowAlert-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        if self._thread is not None:
+            self._stop_event.set()
+            try:
+                self.queue.put_nowait(None)  # Wakes the thread if it is waiting for an event
+            except queue.Full:
+                pass  # It is busy with the backlog and sees the stop event before the next attempt
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {"delivered": self.delivered, "failed": self.failed, "dropped": self.dropped,
+                "queued": self.queue.qsize()}
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            event = self.queue.get()
+            if event is None or self._stop_event.is_set():
+                return
+            for attempt in range(self.retries + 1):
+                try:
+                    self.deliver(event)
+                    self.delivered += 1
+                    break
+                except Exception as e:
+                    if attempt == self.retries:
+                        self.failed += 1
+                        print(f"Alert sink {self.name} failed: {e}")
+                    elif self._stop_event.wait(self.retry_delay * (2 ** attempt)):
+                        return
+
+
+class LogSink(AlertSink):
+    name = "log"
+
+    def deliver(self, event):
+        if event.rule != memory_rule.name:
+            log_alert_message(f"ALERT [{event.rule}]: " + event.message.replace("\n", "; "),
+                              rule=event.rule, value=event.value, threshold=event.threshold)
+            return
+        log_alert(event.value, event.snapshot)
+        log_memory(f"ALERT: High memory usage detected at {event.value}% (Threshold: {event.threshold}%)",
+                   event.snapshot)
+
+
+class PrintSink(AlertSink):
+    name = "print"
+
+    def deliver(self, event):
+        print(event.message, flush=True)
+
+
+class CallbackSink(AlertSink):
+    """Hands events to a function, e.g. a Qt signal's emit for a non-modal toast"""
+    name = "callback"
+
+    def __init__(self, callback, **kwargs):
+        super().__init__(**kwargs)
+        self.callback = callback
+
+    def deliver(self, event):
+        self.callback(event)
+
+
+class WebhookSink(AlertSink):
+    """POSTs the event as JSON"""
+    name = "webhook"
+
+    def __init__(self, url, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+
+    def deliver(self, event):
+        import urllib.request  # Pulls in http, email and ssl, only worth it once a webhook fires
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(event.to_dict()).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class CommandSink(AlertSink):
+    """Runs a shell command with the event as JSON on stdin and in RESFLOW_ALERT_* variables"""
+    name = "command"
+
+    def __init__(self, command, **kwargs):
+        super().__init__(**kwargs)
+        self.command = command
+
+    def deliver(self, event):
+        env = dict(os.environ, RESFLOW_ALERT_RULE=event.rule, RESFLOW_ALERT_VALUE=str(event.value),
+                   RESFLOW_ALERT_THRESHOLD=str(event.threshold))
+        subprocess.run(self.command, shell=True, input=json.dumps(event.to_dict()).encode(),
+                       env=env, timeout=self.timeout, check=True, capture_output=True)
+
+
+class AlertEngine:
+    """Evaluates rules against samples and fans events out to the sinks"""
+
+    def __init__(self, rules=None, sinks=None):
+        self.rules = list(rules or [])
+        self.sinks = list(sinks or [])
+        self.events = 0
+
+    def add_rule(self, rule):
+        self.rules.append(rule)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def start(self):
+        for sink in self.sinks:
+            sink.start()
+
+    def stop(self):
+        for sink in self.sinks:
+            sink.stop()
+
+    def evaluate(self, sample):
+        """Sampler listener, returns the events raised by this sample"""
+        raised = []
+        for rule in self.rules:
+            try:
+                event = rule.evaluate(sample)
+            except Exception as e:
+                print(f"Alert rule {rule.name} failed: {e}")
+                continue
+            if event is not None:
+                raised.append(event)
+                self.events += 1
+                for sink in self.sinks:
+                    sink.submit(event)
+        return raised
+
+    def stats(self):
+        return {"events": self.events, "sinks": [dict(name=sink.name, **sink.stats()) for sink in self.sinks]}
+
+
+# The rule driven by the threshold/cooldown settings in the GUI and daemon
+memory_rule = ThresholdRule("memory", DEFAULT_ALERT_THRESHOLD, DEFAULT_COOLDOWN_TIME)
+
 def set_alert_threshold(new_threshold):
     """Set the global alert threshold"""
     global alert_threshold
     alert_threshold = new_threshold
+    memory_rule.threshold = new_threshold
 
 def set_cooldown_time(new_cooldown):
     global COOLDOWN_TIME
     COOLDOWN_TIME = new_cooldown
-
-def show_alert(parent, usage_percent):
-    global last_alert_time
-    print(f"Checking alert: usage={usage_percent}, threshold={alert_threshold}")
-
-    current_time = time.time()
-    if usage_percent < alert_threshold or (current_time - last_alert_time) < COOLDOWN_TIME:
-        return  
-
-    last_alert_time = current_time  
-    log_alert(usage_percent)
-    top_processes = get_top_processes(3)  
-    process_details = "\n".join([f"{p['name']} (PID: {p['pid']}) - {p['memory_percent']:.2f}%" for p in top_processes])
-
-    msg = QMessageBox(parent)
-    msg.setIcon(QMessageBox.Warning)
-    msg.setWindowTitle("High Memory Usage Alert")
-    msg.setText(f"Memory usage is at {usage_percent}% (Threshold: {alert_threshold}%)!\n\nTop Memory Consuming Processes:\n{process_details}")
-    msg.exec_()
-    
+    memory_rule.cooldown = new_cooldown
@@ -0,0 +1,407 @@
+import operator
+import os
+
+import psutil
+
+from tracker import instrument
+from tracker.cpu import ProcessCpuTracker
+from tracker.procevents import create_event_source
+
+try:
+    import pwd
+except ImportError:  # Not on Unix
+    pwd = None
+
+# Processes below this share of memory are not worth ranking on their own, but still count towards their groups
+MIN_MEMORY_PERCENT = 0.1
+# With process events, idle processes below the cutoff are only re-read every this many scans
+IDLE_REFRESH = 10
+
+_user_names = {}
+
+
+def user_name(uid):
+    """Resolve a uid once, falling back to the number when it has no passwd entry"""
+    name = _user_names.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except (KeyError, AttributeError):
+            name = str(uid)
+        _user_names[uid] = name
+    return name
+
+
+def read_cgroup(proc_root, pid):
+    """The process' cgroup path: the unified (v2) one, else the v1 memory controller's"""
+    try:
+        with open(os.path.join(proc_root, str(pid), "cgroup"), "rb") as f:
+            lines = f.read().decode(errors="replace").splitlines()
+    except OSError:
+        return ""
+    paths = {}
+    for line in lines:
+        hierarchy, controllers, path = line.split(":", 2)
+        paths[controllers] = path
+    if "" in paths:
+        return paths[""]
+    for controllers, path in paths.items():
+        if "memory" in controllers.split(","):
+            return path
+    return next(iter(paths.values()), "")
+
+
+class PsutilCollector:
+    """Portable backend, asks psutil for every process"""
+    name = "psutil"
+    # On POSIX the uid is resolved through the shared name cache instead of a passwd lookup per process
+    attrs = ['pid', 'ppid', 'name', 'uids' if psutil.POSIX else 'username', 'memory_percent', 'cpu_times',
+             'memory_info', 'create_time']
+
+    def __init__(self):
+        self.cpu = ProcessCpuTracker()
+        self._cgroups = {}
+
+    def collect(self):
+        processes = []
+        cgroups = {}
+        self.cpu.begin()
+
+        for p in psutil.process_iter(self.attrs):
+            try:
+                key = (p.info['pid'], p.info['create_time'])
+                cpu_times = p.info['cpu_times']
+                cpu_percent = self.cpu.percent(key, cpu_times.user + cpu_times.system)
+                cgroup = self._cgroups.get(key)
+                if cgroup is None:
+                    cgroup = read_cgroup(psutil.PROCFS_PATH, p.info['pid']) if psutil.LINUX else ""
+                cgroups[key] = cgroup
+                if psutil.POSIX:
+                    user = user_name(p.info['uids'].real)
+                else:
+                    user = p.info['username'] or ""
+                processes.append({
+                    "pid": p.info['pid'],
+                    "name": p.info['name'],
+                    "memory_percent": round(p.info['memory_percent'], 2),
+                    "memory_mb": round(p.info['memory_info'].rss / (1024 * 1024), 2),  # Convert bytes to MB
+                    "cpu_percent": round(cpu_percent, 2),
+                    "create_time": p.info['create_time'],
+                    "ppid": p.info['ppid'],
+                    "user": user,
+                    "cgroup": cgroup,
+                })
+            except (psutil.NoSuchProcess, psutil.AccessDenied, TypeError, AttributeError):
+                continue  # Gone, not permitted, or attributes came back as None
+
+        self._cgroups = cgroups
+        self.cpu.end()
+        return processes
+
+
+class ProcCollector:
+    """Linux backend that reads /proc/<pid>/statm and /proc/<pid>/stat directly.
+
+    Both files are read into one reused buffer. Name, user and cgroup are cached
+    by (pid, start time), so they cost extra reads only for new processes and a
+    reused PID never inherits stale ones. Returns the same rows as psutil.
+    """
+    name = "proc"
+
+    def __init__(self, proc_root="/proc", buffer_size=4096, shard=None):
+        self.proc_root = proc_root
+        # (index, count): only read PIDs where pid % count == index, see ShardedCollector
+        self.shard = shard
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._identities = {}
+        self.cpu = ProcessCpuTracker()
+        self.boot_time = self._boot_time()
+
+    def _boot_time(self):
+        with open(os.path.join(self.proc_root, "stat"), "rb") as f:
+            for line in f:
+                if line.startswith(b"btime"):
+                    return int(line.split()[1])
+        raise RuntimeError("btime missing from stat")
+
+    def _read(self, path):
+        """Read a small /proc file into the shared buffer, returns the bytes read"""
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            n = os.readv(fd, [self._buffer])
+        finally:
+            os.close(fd)
+        return bytes(self._view[:n])
+
+    def _total_memory(self):
+        with open(os.path.join(self.proc_root, "meminfo"), "rb") as f:
+            for line in f:
+                if line.startswith(b"MemTotal:"):
+                    return int(line.split()[1]) * 1024
+        raise RuntimeError("MemTotal missing from meminfo")
+
+    def _identity(self, pid, start_time, comm):
+        """(key, (name, user, cgroup)) for a process, resolved once per process"""
+        key = (pid, start_time)
+        identity = self._identities.get(key)
+        if identity is None:
+            name = comm.decode(errors="replace")
+            # comm is truncated to 15 chars, recover the full name from cmdline like psutil does
+            if len(comm) >= 15:
+                try:
+                    cmdline = self._read(os.path.join(self.proc_root, str(pid), "cmdline"))
+                    exe = os.path.basename(cmdline.split(b"\0", 1)[0]).decode(errors="replace")
+                    if exe.startswith(name):
+                        name = exe
+                except OSError:
+                    pass
+            base = os.path.join(self.proc_root, str(pid))
+            try:
+                user = user_name(os.stat(base).st_uid)
+            except OSError:
+                user = ""
+            identity = (name, user, read_cgroup(self.proc_root, pid))
+        return key, identity
+
+    def _read_process(self, pid, total, identities):
+        """(identity key, row) of one process, None if it exited or is not readable"""
+        base = os.path.join(self.proc_root, str(pid))
+        try:
+            rss = int(self._read(base + "/statm").split()[1]) * self.page_size
+            stat = self._read(base + "/stat")
+        except (OSError, IndexError, ValueError):
+            return None
+
+        comm_end = stat.rfind(b")")
+        comm = stat[stat.find(b"(") + 1:comm_end]
+        fields = stat[comm_end + 2:].split()
+        ppid = int(fields[1])
+        ticks = int(fields[11]) + int(fields[12])  # utime + stime
+        start_time = int(fields[19])
+
+        key, identity = self._identity(pid, start_time, comm)
+        identities[key] = identity
+        name, user, cgroup = identity
+
+        cpu_percent = self.cpu.percent(key, ticks / self.clock_ticks)
+
+        return key, {
+            "pid": pid,
+            "name": name,
+            "memory_percent": round(rss / total * 100, 2),
+            "memory_mb": round(rss / (1024 * 1024), 2),
+            "cpu_percent": round(cpu_percent, 2),
+            "create_time": self.boot_time + start_time / self.clock_ticks,
+            "ppid": ppid,
+            "user": user,
+            "cgroup": cgroup,
+        }
+
+    def collect(self):
+        total = self._total_memory()
+        identities = {}
+        processes = []
+        self.cpu.begin()
+        index, count = self.shard or (0, 1)
+
+        for entry in os.listdir(self.proc_root):
+            if not entry.isdigit():
+                continue
+            pid = int(entry)
+            if pid % count != index:
+                continue
+            result = self._read_process(pid, total, identities)
+            if result is not None:
+                processes.append(result[1])
+
+        # Only keep cache entries for processes still alive
+        self._identities = identities
+        self.cpu.end()
+        return processes
+
+
+class EventProcCollector(ProcCollector):
+    """ProcCollector that learns about new and exited processes from tracker.procevents.
+
+    The process list is kept across scans instead of listed again. New and
+    exec'd processes are read, and so are candidates: processes at or above
+    MIN_MEMORY_PERCENT or using CPU on their last read. The remaining idle
+    processes keep their last row and are re-read every `idle_refresh` scans,
+    staggered by PID. The cost is that an idle process that wakes up or grows
+    can take up to `idle_refresh` scans to show it. A full scan only happens
+    on the first call and when the event source lost events.
+    """
+    name = "events"
+
+    def __init__(self, proc_root="/proc", buffer_size=4096, events=None, idle_refresh=IDLE_REFRESH, **event_options):
+        super().__init__(proc_root, buffer_size)
+        self.idle_refresh = idle_refresh
+        self.events = events or create_event_source(proc_root, **event_options)
+        self._rows = {}  # pid -> row from its last read
+        self._keys = {}  # pid -> (pid, start time), the identity and CPU key of that row
+        self._scans = 0
+        self.reads = 0
+        self.reused = 0
+        self.full_scans = 0
+
+    def close(self):
+        self.events.stop()
+
+    def short_lived(self, limit=20):
+        return self.events.short_lived(limit)
+
+    def stats(self):
+        return dict(self.events.stats(), reads=self.reads, reused=self.reused, full_scans=self.full_scans,
+                    tracked=len(self._rows))
+
+    def collect(self):
+        total = self._total_memory()
+        started, exited, resync = self.events.drain()
+        self._scans += 1
+        full = resync or not self._rows
+        if full:
+            pids = {int(entry) for entry in os.listdir(self.proc_root) if entry.isdigit()}
+            self.full_scans += 1
+        else:
+            pids = (self._rows.keys() - exited) | started
+
+        identities = {}
+        rows = {}
+        keys = {}
+        processes = []
+        reused = 0
+        self.cpu.begin()
+        tick = self._scans
+        for pid in pids:
+            row = self._rows.get(pid)
+            key = self._keys.get(pid)
+            if (not full and row is not None and pid not in started and (pid + tick) % self.idle_refresh
+                    and row["memory_percent"] < MIN_MEMORY_PERCENT and not row["cpu_percent"]):
+                identities[key] = self._identities[key]
+                self.cpu.keep(key)
+                reused += 1
+            else:
+                if pid in started and key is not None:
+                    self._identities.pop(key, None)  # exec changes the name under the same pid and start time
+                result = self._read_process(pid, total, identities)
+                if result is None:
+                    continue
+                key, row = result
+            rows[pid] = row
+            keys[pid] = key
+            processes.append(row)
+
+        self._rows = rows
+        self._keys = keys
+        self._identities = identities
+        self.cpu.end()
+        self.reads += len(processes) - reused
+        self.reused += reused
+        instrument.count("collect.reused", reused)
+        return processes
+
+
+# Row fields in the order worker processes send them, tuples pickle far smaller and faster than dicts
+ROW_FIELDS = ("pid", "name", "memory_percent", "memory_mb", "cpu_percent", "create_time", "ppid", "user", "cgroup")
+MAX_WORKERS = 16
+
+
+def _shard_worker(connection, proc_root, shard, buffer_size):
+    """Worker process loop: one scan of its shard per request, until it receives None"""
+    collector = ProcCollector(proc_root, buffer_size, shard=shard)
+    values = operator.itemgetter(*ROW_FIELDS)
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        connection.send([values(row) for row in collector.collect()])
+
+
+class ShardedCollector:
+    """ProcCollector split by pid % workers across a pool, for hosts with tens of thousands of PIDs.
+
+    Each shard keeps its own ProcCollector across scans, so the name, user
+    and cgroup caches and the CPU deltas stay with the shard that reads the
+    process. In "process" mode the shards run in worker processes and scale
+    with cores. In "thread" mode they share this process: parsing holds the
+    GIL, so only the /proc reads overlap. Every row comes back to this
+    process, because the groups need the whole table.
+    """
+    name = "sharded"
+
+    def __init__(self, proc_root="/proc", workers=None, mode="process", buffer_size=4096):
+        self.proc_root = proc_root
+        self.workers = workers or min(os.cpu_count() or 1, MAX_WORKERS)
+        self.mode = mode
+        self._connections = []
+        self._processes = []
+        self._collectors = []
+        self._pool = None
+        shards = [(index, self.workers) for index in range(self.workers)]
+        if mode == "process":
+            import multiprocessing
+            # Forking a process that runs Qt or other threads is unsafe, spawn starts clean workers
+            context = multiprocessing.get_context("spawn")
+            for shard in shards:
+                parent, child = context.Pipe()
+                process = context.Process(target=_shard_worker, args=(child, proc_root, shard, buffer_size),
+                                          name=f"ResFlowShard-{shard[0]}", daemon=True)
+                process.start()
+                child.close()
+                self._connections.append(parent)
+                self._processes.append(process)
+        elif mode == "thread":
+            from concurrent.futures import ThreadPoolExecutor
+            self._collectors = [ProcCollector(proc_root, buffer_size, shard=shard) for shard in shards]
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="ResFlowShard")
+        else:
+            raise ValueError(f"Unknown sharding mode {mode!r}, expected 'process' or 'thread'")
+
+    def collect(self):
+        if self._pool is not None:
+            return [row for rows in self._pool.map(ProcCollector.collect, self._collectors) for row in rows]
+        try:
+            for connection in self._connections:
+                connection.send("collect")
+            shards = [connection.recv() for connection in self._connections]
+        except (EOFError, OSError) as e:
+            raise RuntimeError(f"A sharded collector worker exited: {e}") from e
+        return [dict(zip(ROW_FIELDS, values)) for rows in shards for values in rows]
+
+    def close(self):
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            connection.close()
+        for process in self._processes:
+            process.join(2.0)
+            if process.is_alive():
+                process.terminate()
+        self._connections = []
+        self._processes = []
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+COLLECTORS = {
+    PsutilCollector.name: PsutilCollector,
+    ProcCollector.name: ProcCollector,
+    EventProcCollector.name: EventProcCollector,
+    ShardedCollector.name: ShardedCollector,
+}
+
+
+def create_collector(name="psutil", **kwargs):
+    try:
+        return COLLECTORS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown collector backend: {name}") from None
@@ -0,0 +1,76 @@
+import time
+
+import psutil
+
+
+def _busy_total(times):
+    # Linux already counts guest time in user and guest_nice in nice, like psutil don't count it twice
+    total = sum(times) - getattr(times, "guest", 0.0) - getattr(times, "guest_nice", 0.0)
+    idle = times.idle + getattr(times, "iowait", 0.0)
+    return total - idle, total
+
+
+class SystemCpu:
+    """System-wide and per-core CPU % from counter deltas, never sleeps.
+
+    The first call has no previous counters and reports the average since boot;
+    every later call reports usage since the previous call.
+    """
+
+    def __init__(self):
+        self._total = None
+        self._cores = None
+
+    @staticmethod
+    def _percent(previous, current):
+        busy = current[0] - (previous[0] if previous else 0.0)
+        total = current[1] - (previous[1] if previous else 0.0)
+        if total <= 0:
+            return 0.0
+        return round(min(100.0, max(0.0, busy / total * 100)), 1)
+
+    def sample(self):
+        """Return (system percent, [per-core percent]) since the previous call"""
+        total = _busy_total(psutil.cpu_times())
+        cores = [_busy_total(t) for t in psutil.cpu_times(percpu=True)]
+        previous_cores = self._cores if self._cores and len(self._cores) == len(cores) else [None] * len(cores)
+        system = self._percent(self._total, total)
+        per_core = [self._percent(p, c) for p, c in zip(previous_cores, cores)]
+        self._total = total
+        self._cores = cores
+        return system, per_core
+
+
+class ProcessCpuTracker:
+    """Per-process CPU % from cpu-time deltas keyed by (pid, create_time).
+
+    A process gets 0.0 the first time it is seen and its real usage from the
+    second sample on. Like psutil, 100% means one full core.
+    """
+
+    def __init__(self):
+        self._previous = {}
+        self._current = {}
+
+    def begin(self, now=None):
+        """Start a pass over the process table"""
+        self._now = time.monotonic() if now is None else now
+        self._current = {}
+
+    def percent(self, key, cpu_seconds):
+        previous = self._previous.get(key)
+        self._current[key] = (cpu_seconds, self._now)
+        if previous is None or self._now <= previous[1]:
+            return 0.0
+        return max(0.0, (cpu_seconds - previous[0]) / (self._now - previous[1]) * 100)
+
+    def keep(self, key):
+        """Carry a process not read in this pass over to the next one, its delta just spans more time"""
+        previous = self._previous.get(key)
+        if previous is not None:
+            self._current[key] = previous
+
+    def end(self):
+        """Finish the pass, forgetting processes that were not seen"""
+        self._previous = self._current
+        self._current = {}
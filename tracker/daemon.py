@@ -0,0 +1,161 @@
+"""Headless sampling, storage and alerting. Must never import Qt."""
+import signal
+import threading
+
+from tracker import alert, instrument, logger
+from tracker.alert import AlertEngine, LogSink, PrintSink, WebhookSink, CommandSink
+from tracker.rules import parse_rule
+from tracker.groups import query_groups
+from tracker.leaks import LeakDetector
+from tracker.scheduler import AdaptiveScheduler
+from tracker.ipc import IpcServer, default_socket_path
+from tracker.monitor import (Sampler, get_collector, get_pressure_reader, get_smaps_reader, set_accurate_memory,
+                             set_collector)
+from tracker.storage import MetricsStore, DEFAULT_PATH, StoreLocked
+
+
+class Daemon:
+    """Runs the sampler with storage and alerting attached, no GUI required"""
+
+    def __init__(self, interval=1.0, store_path=DEFAULT_PATH, socket_path=None, alert_rules=None, alert_sinks=None,
+                 adaptive=True, cpu_budget=0.05, verbose=False):
+        self.verbose = verbose
+        self.store = MetricsStore(store_path) if store_path else None
+        self.server = IpcServer(socket_path) if socket_path else None
+        self.alerts = AlertEngine([alert.memory_rule] + list(alert_rules or []),
+                                  [LogSink(), PrintSink()] + list(alert_sinks or []))
+        self.leaks = LeakDetector()
+        self.scheduler = AdaptiveScheduler(base_interval=interval, cpu_budget=cpu_budget,
+                                           threshold=lambda: alert.memory_rule.threshold) if adaptive else None
+        self.sampler = Sampler(interval=interval, scheduler=self.scheduler)
+        if self.store is not None:
+            self.sampler.add_listener(self.store.append)
+        self.sampler.add_listener(self.alerts.evaluate)
+        self.sampler.add_listener(self.leaks.update)
+        if self.verbose:
+            self.sampler.add_listener(self.print_sample)
+        if self.server is not None:
+            self.sampler.add_listener(self.server.publish)
+            self.server.register("stats", self.sampler.stats)
+            self.server.register("alerts", self.alerts.stats)
+            self.server.register("logging", logger.writer_stats)
+            self.server.register("instrumentation", instrument.report)
+            self.server.register("leaks", self.leaks.fastest_growing)
+            self.server.register("groups", self.groups)
+            self.server.register("pressure", get_pressure_reader().stats)
+            if self.scheduler is not None:
+                self.server.register("scheduler", self.scheduler.rates)
+            if get_smaps_reader() is not None:
+                self.server.register("smaps", get_smaps_reader().stats)
+            collector = get_collector()
+            if hasattr(collector, "events"):
+                self.server.register("events", collector.stats)
+                self.server.register("short_lived", collector.short_lived)
+        self._stop_event = threading.Event()
+
+    def groups(self, by="tree", key=None, limit=20):
+        """Largest process groups in the newest sample, or the members of one group"""
+        sample = self.sampler.latest()
+        return query_groups(sample.snapshot.groups if sample else None, by, key, limit)
+
+    def print_sample(self, sample):
+        print(f"Memory Usage: {sample.memory['percent']}% ({sample.memory['used']}MB/{sample.memory['total']}MB), "
+              f"CPU: {sample.cpu_percent}%, sampled in {sample.duration * 1000:.1f}ms"
+              f"{'' if sample.scanned else ' (process scan skipped)'}")
+
+    def start(self):
+        self.alerts.start()
+        if self.server is not None:
+            self.server.start()
+        self.sampler.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.sampler.stop()
+        self.alerts.stop()
+        if self.server is not None:
+            self.server.stop()
+        if self.store is not None:
+            self.store.close()
+        logger.shutdown()
+
+    def run(self):
+        """Sample until SIGINT or SIGTERM"""
+        def handle_signal(sig, frame):
+            print("Stopping daemon...")
+            self._stop_event.set()
+
+        signal.signal(signal.SIGINT, handle_signal)
+        signal.signal(signal.SIGTERM, handle_signal)
+        self.start()
+        while not self._stop_event.wait(0.5):
+            pass
+        self.stop()
+
+
+def add_arguments(parser):
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--store", default=DEFAULT_PATH, help="metrics history file")
+    parser.add_argument("--no-store", action="store_true", help="do not write history to disk")
+    parser.add_argument("--socket", default=default_socket_path(), help="socket that viewers attach to")
+    parser.add_argument("--no-socket", action="store_true", help="do not serve samples to viewers")
+    parser.add_argument("--collector", choices=["psutil", "proc", "events", "sharded"], default="psutil",
+                        help="process table backend, 'events' follows process starts and exits, "
+                             "'sharded' reads /proc with several worker processes (Linux)")
+    parser.add_argument("--spike-mb", type=float, default=100.0,
+                        help="with --collector events, remember processes that peak above this and exit quickly")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="with --collector sharded, worker processes (default: one per core, up to 16)")
+    parser.add_argument("--pss", action="store_true",
+                        help="also read PSS/USS/swap of the top processes from smaps_rollup (Linux)")
+    parser.add_argument("--pss-refresh", type=float, default=10.0, help="seconds a PSS reading is reused")
+    parser.add_argument("--threshold", type=int, default=alert.DEFAULT_ALERT_THRESHOLD,
+                        help="memory usage alert threshold in percent")
+    parser.add_argument("--cooldown", type=int, default=alert.DEFAULT_COOLDOWN_TIME,
+                        help="seconds between repeated alerts")
+    parser.add_argument("--fixed-scan", action="store_true",
+                        help="rescan processes every tick instead of adapting the scan rate")
+    parser.add_argument("--cpu-budget", type=float, default=0.05,
+                        help="share of one core the process scan may use (default 0.05)")
+    parser.add_argument("--rule", action="append", default=[], metavar="SPEC",
+                        help="extra alert rule (repeatable), e.g. sustained:memory_percent>90:2m, "
+                             "slope:used_mb>100/min:5m, process_growth:50/min:10m")
+    parser.add_argument("--webhook", action="append", default=[], metavar="URL",
+                        help="POST alerts as JSON to this URL (repeatable)")
+    parser.add_argument("--alert-command", action="append", default=[], metavar="CMD",
+                        help="run this shell command for every alert (repeatable)")
+    parser.add_argument("--sink-timeout", type=float, default=5.0, help="seconds per webhook/command attempt")
+    parser.add_argument("--instrument", action="store_true",
+                        help="time ResFlow's own hot paths, see 'resflow query instrumentation'")
+    parser.add_argument("--log-json", action="store_true", help="write logs as JSON lines (logs/*.jsonl)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every sample")
+
+
+def main(args):
+    if args.collector == "events":
+        set_collector(args.collector, spike_mb=args.spike_mb)
+    elif args.collector == "sharded":
+        set_collector(args.collector, workers=args.workers)
+    else:
+        set_collector(args.collector)
+    instrument.enable(args.instrument)
+    if args.pss:
+        set_accurate_memory(True, refresh_interval=args.pss_refresh)
+    if args.log_json:
+        logger.configure(json_lines=True)
+    alert.set_alert_threshold(args.threshold)
+    alert.set_cooldown_time(args.cooldown)
+    sinks = [WebhookSink(url, timeout=args.sink_timeout) for url in args.webhook]
+    sinks += [CommandSink(command, timeout=args.sink_timeout) for command in args.alert_command]
+    try:
+        rules = [parse_rule(spec, args.cooldown) for spec in args.rule]
+    except ValueError as e:
+        raise SystemExit(f"resflow daemon: {e}")
+    try:
+        daemon = Daemon(interval=args.interval, store_path=None if args.no_store else args.store,
+                        socket_path=None if args.no_socket else args.socket, alert_rules=rules, alert_sinks=sinks,
+                        adaptive=not args.fixed_scan, cpu_budget=args.cpu_budget, verbose=args.verbose)
+    except (StoreLocked, ValueError) as e:
+        raise SystemExit(f"resflow daemon: {e}, pass --store PATH or --no-store")
+    print(f"ResFlow daemon sampling every {args.interval}s (Ctrl+C to stop)")
+    daemon.run()
@@ -0,0 +1,490 @@
+"""Multi-host collection: agents stream compact samples to one aggregator.
+
+Each agent keeps one persistent TCP or Unix socket connection open and sends
+a JSON hello, then one binary frame per sample, framed like tracker.ipc. A
+sample frame carries the system-wide figures plus only the top processes that
+changed since the previous frame on the same connection. Names are only sent
+the first time a PID appears. A new connection starts from an empty state on
+both ends, so nothing needs resynchronising after a reconnect.
+
+The aggregator serves every agent from one selector thread and answers
+`hosts`, `processes` and `fleet_stats` queries over the local IPC socket.
+Must never import Qt.
+"""
+import heapq
+import ipaddress
+import json
+import os
+import selectors
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from tracker import instrument
+from tracker.ipc import HEADER, FrameReader, IpcServer, default_socket_path, encode_frame
+from tracker.monitor import Sampler
+
+DEFAULT_PORT = 7878
+DEFAULT_TOP_N = 10
+# A host that has not sent a sample for this long is shown as stale
+STALE_AFTER = 10.0
+
+SAMPLE_KIND = b"S"
+# seq, timestamp, memory %, used MB, total MB, CPU %, swap %, changed processes, removed processes
+SAMPLE_HEADER = struct.Struct("<IdfffffHH")
+# pid, memory MB, memory %, CPU %, name length (0 keeps the name already known for the pid)
+PROCESS = struct.Struct("<IfffB")
+REMOVED = struct.Struct("<I")
+
+
+def default_fleet_socket_path():
+    base, ext = os.path.splitext(default_socket_path())
+    return f"{base}-fleet{ext}"
+
+
+def parse_address(address):
+    """"unix:/path" or "/path" for Unix sockets, "host:port" or ":port" (this host only) for TCP"""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    if address.startswith("/"):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port or DEFAULT_PORT))
+
+
+def is_loopback(family, address):
+    if family == socket.AF_UNIX:
+        return True
+    host = address[0]
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class DeltaEncoder:
+    """Turns samples into binary frames relative to what this connection already sent"""
+
+    def __init__(self, top_n=DEFAULT_TOP_N):
+        self.top_n = top_n
+        self._sent = {}  # pid -> (name, values)
+
+    def encode(self, sample):
+        current = {}
+        changed = []
+        for p in sample.snapshot.top(self.top_n):
+            name = p["name"] or ""
+            values = (round(p["memory_mb"], 2), round(p["memory_percent"], 2), round(p["cpu_percent"], 2))
+            previous = self._sent.get(p["pid"])
+            current[p["pid"]] = (name, values)
+            if previous == (name, values):
+                continue
+            encoded_name = b"" if previous is not None and previous[0] == name else name.encode()[:255]
+            changed.append(PROCESS.pack(p["pid"], *values, len(encoded_name)) + encoded_name)
+        removed = [REMOVED.pack(pid) for pid in self._sent if pid not in current]
+        self._sent = current
+
+        memory = sample.memory
+        header = SAMPLE_HEADER.pack(sample.seq, sample.timestamp, memory["percent"], memory["used"],
+                                    memory["total"], sample.cpu_percent, sample.swap["percent"],
+                                    len(changed), len(removed))
+        payload = SAMPLE_KIND + header + b"".join(changed) + b"".join(removed)
+        return HEADER.pack(len(payload)) + payload
+
+
+class DeltaDecoder:
+    """Rebuilds a host's system figures and top processes from its frames.
+
+    `decode` never changes `processes` in place, it returns the next table as
+    a new dict for the caller to swap in, so readers on other threads can
+    iterate the current one under the caller's lock.
+    """
+
+    def __init__(self):
+        self.processes = {}
+
+    def decode(self, payload):
+        """(system figures, new process table) after applying one frame"""
+        processes = dict(self.processes)
+        offset = len(SAMPLE_KIND)
+        (seq, timestamp, memory_percent, used_mb, total_mb, cpu_percent, swap_percent,
+         changed, removed) = SAMPLE_HEADER.unpack_from(payload, offset)
+        offset += SAMPLE_HEADER.size
+        for _ in range(changed):
+            pid, memory_mb, process_percent, process_cpu, name_length = PROCESS.unpack_from(payload, offset)
+            offset += PROCESS.size
+            if name_length:
+                name = bytes(payload[offset:offset + name_length]).decode(errors="replace")
+                offset += name_length
+            else:
+                name = processes[pid]["name"] if pid in processes else ""
+            processes[pid] = {"pid": pid, "name": name, "memory_mb": round(memory_mb, 2),
+                                   "memory_percent": round(process_percent, 2), "cpu_percent": round(process_cpu, 2)}
+        for _ in range(removed):
+            (pid,) = REMOVED.unpack_from(payload, offset)
+            offset += REMOVED.size
+            processes.pop(pid, None)
+        return processes, {
+            "seq": seq,
+            "timestamp": timestamp,
+            "memory_percent": round(memory_percent, 2),
+            "used_mb": round(used_mb, 2),
+            "total_mb": round(total_mb, 2),
+            "cpu_percent": round(cpu_percent, 2),
+            "swap_percent": round(swap_percent, 2),
+        }
+
+
+def _decode_frame(payload):
+    """JSON control messages start with '{', everything else is a binary sample"""
+    if payload[:1] == b"{":
+        return json.loads(payload)
+    return bytes(payload)
+
+
+class FleetAgent:
+    """Samples this host and streams it to an aggregator over one persistent connection.
+
+    Sampling never waits on the network: the sampler hands each sample to a
+    sender thread that only keeps the newest one. While the aggregator is
+    unreachable samples are dropped and the connection is retried every
+    `retry_interval` seconds.
+    """
+
+    def __init__(self, address, host=None, interval=1.0, top_n=DEFAULT_TOP_N, token=None,
+                 retry_interval=2.0, sampler=None):
+        self.family, self.address = parse_address(address)
+        self.host = host or socket.gethostname()
+        self.interval = interval
+        self.top_n = top_n
+        self.token = token
+        self.retry_interval = retry_interval
+        self.sampler = sampler or Sampler(interval=interval)
+        self.sampler.add_listener(self.submit)
+        self._pending = deque(maxlen=1)
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._sock = None
+        self._encoder = None
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.connects = 0
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ResFlowAgent", daemon=True)
+        self._thread.start()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        self._stop_event.set()
+        self._ready.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        self._disconnect()
+
+    def submit(self, sample):
+        if self._pending:
+            self.dropped += 1
+        self._pending.append(sample)
+        self._ready.set()
+
+    def stats(self):
+        return {"host": self.host, "connected": self._sock is not None, "sent": self.sent,
+                "dropped": self.dropped, "bytes_sent": self.bytes_sent, "connects": self.connects}
+
+    def _connect(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.settimeout(5.0)
+        try:
+            sock.connect(self.address)
+            if self.family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            hello = {"type": "hello", "host": self.host, "interval": self.interval, "top_n": self.top_n}
+            if self.token:
+                hello["token"] = self.token
+            sock.sendall(encode_frame(hello))
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._encoder = DeltaEncoder(self.top_n)
+        self.connects += 1
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _run(self):
+        next_attempt = 0.0
+        reported = False  # Only report the first failed attempt of an outage
+        while not self._stop_event.is_set():
+            self._ready.wait(self.interval)
+            self._ready.clear()
+            if not self._pending:
+                continue
+            sample = self._pending.popleft()
+            if self._sock is None:
+                if time.monotonic() < next_attempt:
+                    self.dropped += 1
+                    continue
+                try:
+                    self._connect()
+                except OSError as e:
+                    if not reported:
+                        print(f"Aggregator unreachable, retrying every {self.retry_interval}s: {e}")
+                        reported = True
+                    next_attempt = time.monotonic() + self.retry_interval
+                    self.dropped += 1
+                    continue
+                reported = False
+            frame = self._encoder.encode(sample)
+            try:
+                self._sock.sendall(frame)
+            except OSError as e:
+                print(f"Lost connection to the aggregator: {e}")
+                self._disconnect()
+                self.dropped += 1
+                continue
+            self.sent += 1
+            self.bytes_sent += len(frame)
+
+
+class _Agent:
+    """Aggregator-side state of one agent connection"""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.reader = FrameReader(decode=_decode_frame)
+        self.decoder = DeltaDecoder()
+        self.host = None
+        self.latest = None
+        self.last_seen = None
+        self.connected_at = time.time()
+        self.samples = 0
+        self.bytes = 0
+
+
+class FleetAggregator:
+    """Accepts agents on `listen` and keeps the latest state of every host"""
+
+    def __init__(self, listen=f":{DEFAULT_PORT}", token=None, stale_after=STALE_AFTER):
+        self.family, self.address = parse_address(listen)
+        if not token and not is_loopback(self.family, self.address):
+            raise ValueError(f"Listening on {listen} lets any host send samples, pass a token")
+        self.token = token
+        self.stale_after = stale_after
+        self._hosts = {}  # host name -> _Agent currently sending for it
+        self._agents = {}
+        self._lock = threading.Lock()
+        self._selector = None
+        self._listener = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.frames = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def start(self):
+        if self.family == socket.AF_UNIX and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(self.address)
+        self._listener.listen(512)
+        self._listener.setblocking(False)
+        if self.family == socket.AF_INET:
+            self.address = self._listener.getsockname()  # Resolves port 0 for tests
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, None)
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ResFlowAggregator", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        with self._lock:
+            agents = list(self._agents.values())
+        for agent in agents:
+            self._close(agent)
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            if self.family == socket.AF_UNIX and os.path.exists(self.address):
+                os.unlink(self.address)
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            for key, _ in self._selector.select(timeout=0.5):
+                if key.data is None:
+                    self._accept()
+                else:
+                    self._read(key.data)
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        agent = _Agent(sock, address if isinstance(address, tuple) else "unix")
+        with self._lock:
+            self._agents[sock.fileno()] = agent
+        self._selector.register(sock, selectors.EVENT_READ, agent)
+
+    def _close(self, agent):
+        with self._lock:
+            self._agents.pop(agent.sock.fileno(), None)
+        try:
+            if self._selector is not None:
+                self._selector.unregister(agent.sock)
+        except (KeyError, ValueError):
+            pass
+        agent.sock.close()
+
+    def _read(self, agent):
+        try:
+            data = agent.sock.recv(65536)
+            if not data:
+                raise ConnectionError("agent closed the connection")
+            frames = agent.reader.feed(data)
+        except BlockingIOError:
+            return
+        except (OSError, ValueError):
+            self._close(agent)
+            return
+        agent.bytes += len(data)
+        try:
+            for frame in frames:
+                self._handle(agent, frame)
+        except (struct.error, KeyError, UnicodeDecodeError, ValueError) as e:
+            print(f"Dropping agent {agent.host or agent.address}: {e}")
+            self.errors += 1
+            self._close(agent)
+
+    def _handle(self, agent, frame):
+        if isinstance(frame, dict):
+            if frame.get("type") != "hello" or agent.host is not None:
+                raise ValueError(f"unexpected message {frame.get('type')!r}")
+            if self.token and frame.get("token") != self.token:
+                self.rejected += 1
+                raise ValueError("bad token")
+            agent.host = str(frame["host"])
+            with self._lock:
+                self._hosts[agent.host] = agent  # A reconnecting agent replaces its old connection
+            return
+        if agent.host is None:
+            raise ValueError("sample before hello")
+        with instrument.timer("fleet.decode"):
+            processes, latest = agent.decoder.decode(frame)
+        with self._lock:
+            agent.decoder.processes = processes
+            agent.latest = latest
+            agent.last_seen = time.time()
+            agent.samples += 1
+            self.frames += 1
+
+    def hosts(self, limit=None):
+        """Every host with its latest figures, highest memory use first"""
+        now = time.time()
+        with self._lock:
+            agents = list(self._hosts.values())
+        rows = []
+        for agent in agents:
+            if agent.latest is None:
+                continue
+            age = now - agent.last_seen
+            rows.append(dict(agent.latest, host=agent.host, age=round(age, 1),
+                             stale=age > self.stale_after or agent.sock.fileno() == -1,
+                             processes=len(agent.decoder.processes), samples=agent.samples,
+                             bytes=agent.bytes))
+        rows.sort(key=lambda r: (not r["stale"], r["memory_percent"]), reverse=True)
+        return rows[:limit] if limit else rows
+
+    def processes(self, limit=20, host=None):
+        """The biggest processes across every live host, each tagged with its host"""
+        with self._lock:
+            agents = [a for a in self._hosts.values() if host is None or a.host == host]
+            candidates = [dict(p, host=a.host, key=f"{a.host}:{p['pid']}")
+                          for a in agents if a.sock.fileno() != -1
+                          for p in a.decoder.processes.values()]
+        return heapq.nlargest(limit, candidates, key=lambda p: p["memory_mb"])
+
+    def stats(self):
+        with self._lock:
+            return {"agents": len(self._agents), "hosts": len(self._hosts), "frames": self.frames,
+                    "bytes": sum(a.bytes for a in self._agents.values()), "rejected": self.rejected,
+                    "errors": self.errors}
+
+
+def add_agent_arguments(parser):
+    parser.add_argument("aggregator", help="aggregator address, host:port or unix:/path")
+    parser.add_argument("--host", help="name reported for this machine (default: hostname)")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_N, help="processes sent per sample")
+    parser.add_argument("--token", help="shared secret the aggregator expects")
+
+
+def add_aggregate_arguments(parser):
+    parser.add_argument("--listen", default=f":{DEFAULT_PORT}",
+                        help="host:port or unix:/path to accept agents on, the default accepts only this host; "
+                             "other addresses (e.g. 0.0.0.0:7878) require --token")
+    parser.add_argument("--socket", default=default_fleet_socket_path(), help="local socket for queries and the GUI")
+    parser.add_argument("--token", help="shared secret agents must send")
+
+
+def _run_until_signal(start, stop, message):
+    import signal
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    start()
+    print(message)
+    while not stop_event.wait(0.5):
+        pass
+    stop()
+
+
+def agent_main(args):
+    agent = FleetAgent(args.aggregator, host=args.host, interval=args.interval, top_n=args.top, token=args.token)
+    _run_until_signal(agent.start, agent.stop,
+                      f"ResFlow agent {agent.host} streaming to {args.aggregator} (Ctrl+C to stop)")
+
+
+def aggregate_main(args):
+    try:
+        aggregator = FleetAggregator(args.listen, token=args.token)
+    except ValueError as e:
+        raise SystemExit(f"resflow aggregate: {e}")
+    server = IpcServer(args.socket)
+    server.register("hosts", aggregator.hosts)
+    server.register("processes", aggregator.processes)
+    server.register("fleet_stats", aggregator.stats)
+
+    def start():
+        aggregator.start()
+        server.start()
+
+    def stop():
+        server.stop()
+        aggregator.stop()
+
+    _run_until_signal(start, stop, f"ResFlow aggregator accepting agents on {args.listen}, "
+                                   f"queries on {args.socket} (Ctrl+C to stop)")
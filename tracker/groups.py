@@ -0,0 +1,147 @@
+"""Memory and CPU summed by process tree, name, user and cgroup.
+
+Many small processes (browser renderers, Gunicorn workers) can each stay
+under the per-process cutoff while together using most of the memory. Each
+scan is summed in one pass that only keeps totals and member lists, the
+sorted summaries are built when a grouping is first looked at.
+"""
+
+import heapq
+
+GROUPINGS = ("tree", "name", "user", "cgroup")
+
+# Ancestors that own whole sessions or services, a tree is rooted just below them
+SERVICE_MANAGERS = frozenset({
+    "systemd", "init", "launchd", "runit", "s6-svscan", "supervisord",
+    "tini", "dumb-init", "containerd-shim", "containerd-shim-runc-v2",
+})
+
+# Groups sent along with every sample to attached viewers
+SUMMARY_LIMIT = 50
+
+
+class _Group:
+    __slots__ = ("key", "label", "memory_mb", "memory_percent", "cpu_percent", "members")
+
+    def __init__(self, key, label):
+        self.key = key
+        self.label = label
+        self.memory_mb = 0.0
+        self.memory_percent = 0.0
+        self.cpu_percent = 0.0
+        self.members = []
+
+    def add(self, row):
+        self.members.append(row)
+        self.memory_mb += row["memory_mb"]
+        self.memory_percent += row["memory_percent"]
+        self.cpu_percent += row["cpu_percent"]
+
+    def summary(self):
+        return {
+            "key": self.key,
+            "name": self.label,
+            "count": len(self.members),
+            "memory_mb": round(self.memory_mb, 2),
+            "memory_percent": round(self.memory_percent, 2),
+            "cpu_percent": round(self.cpu_percent, 2),
+        }
+
+
+def tree_roots(processes):
+    """Map each pid to the pid of its tree root, in one pass with memoised walks"""
+    by_pid = {p["pid"]: p for p in processes}
+    roots = {}
+    for p in processes:
+        chain = []
+        pid = p["pid"]
+        while pid not in roots:
+            chain.append(pid)
+            parent = by_pid[pid].get("ppid", 0)
+            if (parent <= 1 or parent not in by_pid or parent in chain
+                    or by_pid[parent]["name"] in SERVICE_MANAGERS):
+                roots[pid] = pid
+                break
+            pid = parent
+        root = roots[pid]
+        for pid in chain:
+            roots[pid] = root
+    return roots
+
+
+class ProcessGroups:
+    """One scan's groups, read like {grouping: [group summaries with their member rows]}, largest first.
+
+    Never modified after construction, so it can be shared by every viewer
+    of a snapshot. A grouping's sorted list is built on its first lookup.
+    """
+
+    def __init__(self, processes=()):
+        self._groups = {grouping: {} for grouping in GROUPINGS}
+        self._views = {}
+        by_pid = {p["pid"]: p for p in processes}
+        roots = tree_roots(processes)
+        tree, names, users, cgroups = (self._groups[grouping] for grouping in GROUPINGS)
+        for row in processes:
+            root = roots[row["pid"]]
+            group = tree.get(root)
+            if group is None:
+                group = tree[root] = _Group(str(root), f"{by_pid[root]['name']} ({root})")
+            group.add(row)
+            for groups, key in ((names, row["name"]), (users, row.get("user") or "?"),
+                                (cgroups, row.get("cgroup") or "/")):
+                group = groups.get(key)
+                if group is None:
+                    group = groups[key] = _Group(key, key)
+                group.add(row)
+
+    def get(self, grouping, default=None):
+        rows = self._views.get(grouping)
+        if rows is None:
+            groups = self._groups.get(grouping)
+            if groups is None:
+                return default
+            rows = []
+            for group in groups.values():
+                summary = group.summary()
+                summary["members"] = group.members
+                rows.append(summary)
+            rows.sort(key=lambda g: g["memory_mb"], reverse=True)
+            self._views[grouping] = rows
+        return rows
+
+    def __getitem__(self, grouping):
+        rows = self.get(grouping)
+        if rows is None:
+            raise KeyError(grouping)
+        return rows
+
+    def items(self):
+        return [(grouping, self.get(grouping)) for grouping in GROUPINGS]
+
+    def largest(self, grouping, limit):
+        """Summaries of the `limit` largest groups, without sorting the rest or listing members"""
+        groups = heapq.nlargest(limit, self._groups[grouping].values(), key=lambda g: g.memory_mb)
+        return [group.summary() for group in groups]
+
+
+def summarize(groups, limit=SUMMARY_LIMIT):
+    """Drop member rows and keep the largest groups, for sending over the wire"""
+    if isinstance(groups, ProcessGroups):
+        return {grouping: groups.largest(grouping, limit) for grouping in GROUPINGS}
+    return {grouping: [{k: v for k, v in g.items() if k != "members"} for g in rows[:limit]]
+            for grouping, rows in groups.items()}
+
+
+def query_groups(groups, by="tree", key=None, limit=20):
+    """Headless view of a snapshot's groups: the largest groups, or one group's members"""
+    if by not in GROUPINGS:
+        raise ValueError(f"Unknown grouping {by!r}, expected one of {', '.join(GROUPINGS)}")
+    rows = (groups or {}).get(by, [])
+    if key is None:
+        return [{k: v for k, v in g.items() if k != "members"} for g in rows[:limit]]
+    for group in rows:
+        if group["key"] == str(key):
+            members = sorted(group.get("members") or [], key=lambda p: p["memory_mb"], reverse=True)
+            return members[:limit] if limit else members
+    return []
@@ -0,0 +1,199 @@
+"""Timers, counters and histograms around ResFlow's own hot paths.
+
+Everything is off until `enable()` is called. While disabled `timer()` hands
+back one shared no-op context manager and `count()` returns straight away,
+so the instrumented code pays a function call and a flag check. `report()`
+also includes ResFlow's own RSS and CPU, which are measured even when the
+timers are off.
+
+    with instrument.timer("scan.collect"):
+        rows = collector.collect()
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+
+# Histogram bucket upper bounds in milliseconds, the last bucket catches everything slower
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_enabled = False
+_lock = threading.Lock()
+_timers = {}
+_counters = {}
+
+
+class Histogram:
+    """Count, total, max and fixed log-scale buckets of durations in milliseconds"""
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+        }
+
+
+class _Timer:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(enabled=True):
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled():
+    return _enabled
+
+
+def timer(name):
+    """Context manager timing the block into the `name` histogram"""
+    return _Timer(name) if _enabled else _NULL_TIMER
+
+
+def timed(name):
+    """Decorator form of `timer`"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorate
+
+
+def observe(name, ms):
+    """Record one duration, for code that measures it itself"""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _timers.get(name)
+        if histogram is None:
+            histogram = _timers[name] = Histogram()
+        histogram.add(ms)
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+
+class _SelfUsage:
+    """ResFlow's own RSS and CPU, CPU from deltas between calls like tracker.cpu"""
+
+    def __init__(self):
+        import psutil
+        self.process = psutil.Process(os.getpid())
+        self._previous = None
+
+    def sample(self):
+        with self.process.oneshot():
+            times = self.process.cpu_times()
+            rss = self.process.memory_info().rss
+            threads = self.process.num_threads()
+        now = time.monotonic()
+        cpu_seconds = times.user + times.system
+        cpu_percent = 0.0
+        if self._previous is not None and now > self._previous[1]:
+            cpu_percent = (cpu_seconds - self._previous[0]) / (now - self._previous[1]) * 100
+        self._previous = (cpu_seconds, now)
+        return {
+            "pid": self.process.pid,
+            "rss_mb": round(rss / (1024 * 1024), 2),
+            "cpu_percent": round(cpu_percent, 2),
+            "cpu_seconds": round(cpu_seconds, 2),
+            "threads": threads,
+        }
+
+
+_self_usage = None
+
+
+def self_usage():
+    global _self_usage
+    if _self_usage is None:
+        _self_usage = _SelfUsage()
+    return _self_usage.sample()
+
+
+def report():
+    """Everything measured so far, slowest total first, plus ResFlow's own usage"""
+    with _lock:
+        timers = sorted(((name, h.to_dict()) for name, h in _timers.items()),
+                        key=lambda item: item[1]["total_ms"], reverse=True)
+        counters = dict(sorted(_counters.items()))
+    return {
+        "enabled": _enabled,
+        "timers": dict(timers),
+        "counters": counters,
+        "process": self_usage(),
+    }
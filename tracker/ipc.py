@@ -0,0 +1,414 @@
+"""Local streaming of samples over a Unix domain socket.
+
+Frames are a 4-byte big-endian length followed by a UTF-8 JSON object. The
+server sends {"type": "sample", "data": ...} to subscribed clients and answers
+{"op": "query", "id": ..., "name": ..., "params": {...}} requests with
+{"type": "reply", "id": ..., "result": ...} or an "error" field.
+"""
+import json
+import os
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+from tracker import instrument
+
+HEADER = struct.Struct(">I")
+MAX_FRAME = 16 * 1024 * 1024
+# Samples queued per client before the oldest are dropped
+DEFAULT_MAX_PENDING = 8
+
+
+def default_socket_path():
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "resflow.sock")
+    return os.path.join(tempfile.gettempdir(), f"resflow-{os.getuid()}.sock")
+
+
+def encode_frame(message):
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    return HEADER.pack(len(payload)) + payload
+
+
+class FrameReader:
+    """Reassembles frames from a byte stream, `decode` turns each payload into a message"""
+
+    def __init__(self, decode=json.loads):
+        self.decode = decode
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        self._buffer += data
+        messages = []
+        while len(self._buffer) >= HEADER.size:
+            (length,) = HEADER.unpack_from(self._buffer)
+            if length > MAX_FRAME:
+                raise ValueError(f"Frame of {length} bytes exceeds the limit")
+            end = HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            messages.append(self.decode(self._buffer[HEADER.size:end]))
+            del self._buffer[:end]
+        return messages
+
+
+class _Connection:
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = FrameReader()
+        self.replies = deque()
+        self.samples = deque()
+        self.outgoing = None
+        self.subscribed = False
+        self.dropped = 0
+
+    def has_output(self):
+        return self.outgoing is not None or self.replies or self.samples
+
+
+class IpcServer:
+    """Publishes samples to any number of local clients from one collector.
+
+    Each sample is encoded once and queued per client. A client that falls
+    behind keeps only its newest `max_pending` samples, so a stuck viewer can
+    never block the sampler or grow memory without bound.
+    """
+
+    def __init__(self, path=None, max_pending=DEFAULT_MAX_PENDING):
+        self.path = path or default_socket_path()
+        self.max_pending = max_pending
+        self._handlers = {}
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._selector = None
+        self._listener = None
+        self._wake_reader, self._wake_writer = socket.socketpair()
+        # A full wake buffer already means a wakeup is pending, publish() must never block on it
+        self._wake_writer.setblocking(False)
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._latest = None
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.register("latest", lambda: self._latest.to_dict() if self._latest else None)
+        self.register("server_stats", self.stats)
+
+    def register(self, name, handler):
+        """Answer `query` requests for `name` with `handler(**params)`"""
+        self._handlers[name] = handler
+
+    def start(self):
+        if os.path.exists(self.path):
+            # Only replace the socket if nobody is listening on it anymore
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"Another ResFlow instance is serving {self.path}")
+            finally:
+                probe.close()
+
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        os.chmod(self.path, 0o600)
+        self._listener.listen()
+        self._listener.setblocking(False)
+        self._wake_reader.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, "listen")
+        self._selector.register(self._wake_reader, selectors.EVENT_READ, "wake")
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ResFlowIpc", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        for conn in list(self._connections.values()):
+            self._close(conn)
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+
+    def publish(self, sample):
+        self._latest = sample
+        frame = encode_frame({"type": "sample", "data": sample.to_dict()})
+        instrument.count("ipc.frame_bytes", len(frame))
+        with self._lock:
+            for conn in self._connections.values():
+                if not conn.subscribed:
+                    continue
+                if len(conn.samples) >= self.max_pending:
+                    conn.samples.popleft()
+                    conn.dropped += 1
+                    self.frames_dropped += 1
+                conn.samples.append(frame)
+        self._wake()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "clients": len(self._connections),
+                "subscribers": sum(1 for c in self._connections.values() if c.subscribed),
+                "frames_sent": self.frames_sent,
+                "frames_dropped": self.frames_dropped,
+            }
+
+    def _wake(self):
+        try:
+            self._wake_writer.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # A wakeup is already pending
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            for key, events in self._selector.select(timeout=0.5):
+                if key.data == "listen":
+                    self._accept()
+                elif key.data == "wake":
+                    try:
+                        while self._wake_reader.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    conn = key.data
+                    try:
+                        if events & selectors.EVENT_READ:
+                            self._read(conn)
+                        if events & selectors.EVENT_WRITE and conn.sock.fileno() != -1:
+                            self._flush(conn)
+                    except Exception:
+                        # One misbehaving client must not take down the thread every viewer depends on
+                        self._close(conn)
+            self._update_interest()
+
+    def _accept(self):
+        try:
+            sock, _ = self._listener.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        conn = _Connection(sock)
+        with self._lock:
+            self._connections[sock.fileno()] = conn
+        self._selector.register(sock, selectors.EVENT_READ, conn)
+
+    def _close(self, conn):
+        with self._lock:
+            self._connections.pop(conn.sock.fileno(), None)
+        try:
+            if self._selector is not None:
+                self._selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        conn.sock.close()
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+            if not data:
+                raise ConnectionError("client closed the connection")
+            messages = conn.reader.feed(data)
+        except BlockingIOError:
+            return
+        except (OSError, ValueError):
+            self._close(conn)
+            return
+        for message in messages:
+            self._handle(conn, message)
+
+    def _handle(self, conn, message):
+        if not isinstance(message, dict):
+            with self._lock:
+                conn.replies.append(encode_frame({"type": "reply", "id": None,
+                                                  "error": "Requests must be JSON objects"}))
+            return
+        op = message.get("op")
+        reply = {"type": "reply", "id": message.get("id")}
+        if op == "subscribe":
+            conn.subscribed = True
+            reply["result"] = True
+        elif op == "unsubscribe":
+            conn.subscribed = False
+            reply["result"] = True
+        elif op == "query" and message.get("name") in self._handlers:
+            try:
+                reply["result"] = self._handlers[message["name"]](**message.get("params", {}))
+            except Exception as e:
+                reply["error"] = str(e)
+        else:
+            reply["error"] = f"Unknown request: {op} {message.get('name', '')}".strip()
+        with self._lock:
+            conn.replies.append(encode_frame(reply))
+
+    def _flush(self, conn):
+        while True:
+            if conn.outgoing is None:
+                with self._lock:
+                    if conn.replies:
+                        conn.outgoing = memoryview(conn.replies.popleft())
+                    elif conn.samples:
+                        conn.outgoing = memoryview(conn.samples.popleft())
+                    else:
+                        return
+            try:
+                sent = conn.sock.send(conn.outgoing)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._close(conn)
+                return
+            conn.outgoing = conn.outgoing[sent:]
+            if not len(conn.outgoing):
+                conn.outgoing = None
+                self.frames_sent += 1
+
+    def _update_interest(self):
+        with self._lock:
+            connections = list(self._connections.values())
+        for conn in connections:
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if conn.has_output() else 0)
+            try:
+                if self._selector.get_key(conn.sock).events != events:
+                    self._selector.modify(conn.sock, events, conn)
+            except (KeyError, ValueError):
+                pass
+
+
+class IpcClient:
+    """Blocking client for scripts and the CLI"""
+
+    def __init__(self, path=None, timeout=5.0):
+        self.path = path or default_socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(self.path)
+        self._reader = FrameReader()
+        self._messages = deque()
+        self._next_id = 0
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send(self, message):
+        self.sock.sendall(encode_frame(message))
+
+    def read_message(self, timeout=None):
+        """Next message from the server, or None if `timeout` passes first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._messages:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.sock.settimeout(remaining)
+            try:
+                data = self.sock.recv(65536)
+            except socket.timeout:
+                return None
+            if not data:
+                raise ConnectionError("ResFlow daemon closed the connection")
+            self._messages.extend(self._reader.feed(data))
+        return self._messages.popleft()
+
+    def _request(self, message, timeout=5.0):
+        self._next_id += 1
+        message["id"] = self._next_id
+        self.send(message)
+        skipped = []
+        try:
+            while True:
+                reply = self.read_message(timeout)
+                if reply is None:
+                    raise TimeoutError(f"No reply to {message.get('op')} request")
+                if reply.get("type") == "reply" and reply.get("id") == message["id"]:
+                    break
+                skipped.append(reply)
+        finally:
+            # Samples that arrived while waiting stay available to samples()
+            self._messages.extendleft(reversed(skipped))
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return reply.get("result")
+
+    def subscribe(self):
+        return self._request({"op": "subscribe"})
+
+    def query(self, name, **params):
+        return self._request({"op": "query", "name": name, "params": params})
+
+    def samples(self):
+        """Yield samples as they arrive, subscribe() first"""
+        from tracker.monitor import Sample
+        while True:
+            message = self.read_message()
+            if message is not None and message.get("type") == "sample":
+                yield Sample.from_dict(message["data"])
+
+
+def add_watch_arguments(parser):
+    parser.add_argument("--socket", default=None, help="daemon socket path")
+    parser.add_argument("--json", action="store_true", help="print raw JSON lines")
+
+
+def add_query_arguments(parser):
+    parser.add_argument("name", help="query to run, e.g. stats, alerts, leaks, latest")
+    parser.add_argument("params", nargs="*", metavar="KEY=VALUE", help="query parameters, values parsed as JSON")
+    parser.add_argument("--socket", default=None, help="daemon socket path")
+
+
+def query_main(args):
+    """Run one query against a running daemon and print the JSON result"""
+    params = {}
+    for param in args.params:
+        key, _, value = param.partition("=")
+        try:
+            params[key] = json.loads(value)
+        except ValueError:
+            params[key] = value
+    try:
+        with IpcClient(args.socket) as client:
+            result = client.query(args.name, **params)
+    except (OSError, ConnectionError, RuntimeError) as e:
+        raise SystemExit(f"resflow query: {e}")
+    print(json.dumps(result, indent=2))
+
+
+def watch_main(args):
+    """Print samples streamed by a running daemon"""
+    try:
+        with IpcClient(args.socket) as client:
+            client.subscribe()
+            for sample in client.samples():
+                if args.json:
+                    print(json.dumps(sample.to_dict()), flush=True)
+                else:
+                    top = ", ".join(f"{p['name']} ({p['pid']}) {p['memory_mb']}MB" for p in sample.snapshot.top(3))
+                    print(f"Memory Usage: {sample.memory['percent']}%; CPU: {sample.cpu_percent}%; Top: {top}", flush=True)
+    except (OSError, ConnectionError) as e:
+        print(f"Could not read from ResFlow daemon: {e}")
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,121 @@
+import heapq
+import math
+import threading
+
+# Older samples weigh e^-1 after this many seconds
+DEFAULT_TIME_CONSTANT = 600
+# Ignore trends observed for less than this, a process starting up is not a leak
+DEFAULT_MIN_AGE = 120
+
+
+class Trend:
+    """Exponentially weighted least-squares fit of a value (RSS here) against time, five floats of state.
+
+    Times are kept relative to the newest sample: on every update the sums
+    are decayed, the origin is moved to `now` and the new point lands at x=0,
+    so nothing grows with process age and no history is stored.
+    """
+    __slots__ = ("name", "first_seen", "last_seen", "rss", "peak", "w", "sx", "sy", "sxx", "sxy")
+
+    def __init__(self, name, timestamp, rss):
+        self.name = name
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.rss = rss
+        self.peak = rss
+        self.w = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self._add(rss)
+
+    def _add(self, rss):
+        self.w += 1.0
+        self.sy += rss
+        # x = 0 for the new point, so sx, sxx and sxy are unchanged
+
+    def update(self, timestamp, rss, time_constant):
+        dt = timestamp - self.last_seen
+        if dt > 0:
+            decay = math.exp(-dt / time_constant)
+            self.w *= decay
+            self.sx *= decay
+            self.sy *= decay
+            self.sxx *= decay
+            self.sxy *= decay
+            # Shift the origin forward by dt: x' = x - dt
+            self.sxx += -2 * dt * self.sx + dt * dt * self.w
+            self.sxy += -dt * self.sy
+            self.sx += -dt * self.w
+        self.last_seen = timestamp
+        self.rss = rss
+        self.peak = max(self.peak, rss)
+        self._add(rss)
+
+    def slope(self):
+        """Bytes (or whatever RSS is measured in) per second"""
+        denominator = self.w * self.sxx - self.sx * self.sx
+        if denominator <= 1e-12:
+            return 0.0
+        return (self.w * self.sxy - self.sx * self.sy) / denominator
+
+
+class LeakDetector:
+    """Tracks an RSS trend for every process and reports the fastest growing ones.
+
+    Processes are keyed by (pid, create_time) so a reused PID starts a fresh
+    trend. Each update is O(1) per process, exited processes are swept out.
+    """
+
+    def __init__(self, time_constant=DEFAULT_TIME_CONSTANT, min_age=DEFAULT_MIN_AGE, sweep_interval=10.0):
+        self.time_constant = time_constant
+        self.min_age = min_age
+        self.sweep_interval = sweep_interval
+        self._trends = {}
+        self._last_sweep = None
+        self._last_snapshot_time = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._trends)
+
+    def update(self, sample):
+        """Sampler listener, ticks that reused the previous snapshot add nothing"""
+        snapshot = sample.snapshot
+        if snapshot.timestamp == self._last_snapshot_time:
+            return
+        self._last_snapshot_time = snapshot.timestamp
+        self.update_processes(snapshot.timestamp, snapshot.processes)
+
+    def update_processes(self, timestamp, processes):
+        time_constant = self.time_constant
+        with self._lock:
+            trends = self._trends
+            for p in processes:
+                key = (p["pid"], p.get("create_time"))
+                trend = trends.get(key)
+                if trend is None:
+                    trends[key] = Trend(p["name"], timestamp, p["memory_mb"])
+                else:
+                    trend.update(timestamp, p["memory_mb"], time_constant)
+
+            if self._last_sweep is None:
+                self._last_sweep = timestamp
+            elif timestamp - self._last_sweep >= self.sweep_interval:
+                # Anything not seen since the last sweep has exited (or dropped below the cutoff)
+                cutoff = self._last_sweep
+                self._trends = {k: t for k, t in trends.items() if t.last_seen > cutoff}
+                self._last_sweep = timestamp
+
+    def fastest_growing(self, limit=5, min_rate=0.0):
+        """Processes with the steepest upward RSS trend, in MB per minute"""
+        with self._lock:
+            candidates = [(trend.slope() * 60, key, trend) for key, trend in self._trends.items()
+                          if trend.last_seen - trend.first_seen >= self.min_age]
+        top = heapq.nlargest(limit, candidates, key=lambda c: c[0])
+        return [{
+            "pid": key[0],
+            "create_time": key[1],
+            "name": trend.name,
+            "memory_mb": round(trend.rss, 2),
+            "peak_mb": round(trend.peak, 2),
+            "growth_mb_per_min": round(rate, 3),
+            "observed_seconds": round(trend.last_seen - trend.first_seen),
+        } for rate, key, trend in top if rate > min_rate]
@@ -1,44 +1,237 @@
+"""Text and JSON-lines logs, written in batches on a background thread.
+
+Callers only put the log record on a queue, so logging never adds file I/O or
+message formatting to a sampling tick or the GUI thread. A single writer
+thread drains the queue into the rotating files. It flushes once per batch,
+when `batch_size` records are pending or `flush_interval` seconds after the
+first pending one, whichever comes first.
+"""
+import atexit
+import json
 import logging
 import os
+import queue
+import threading
+import time
 from logging.handlers import RotatingFileHandler
+from tracker import instrument
 from tracker.monitor import get_top_processes
 
 log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-
-# Memory usage log
-memory_log_file = os.path.join(log_dir, "memory_log.txt")
-memory_handler = RotatingFileHandler(memory_log_file, maxBytes=5 * 1024 * 1024, backupCount=3)
-
-# Alert log
-alert_log_file = os.path.join(log_dir, "alert_log.txt")
-alert_handler = RotatingFileHandler(alert_log_file, maxBytes=2 * 1024 * 1024, backupCount=2)
-
-log_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-
-memory_handler.setFormatter(log_formatter)
-alert_handler.setFormatter(log_formatter)
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 1.0
+MAX_QUEUED = 10000
 
 memory_logger = logging.getLogger("MemoryLogger")
 memory_logger.setLevel(logging.INFO)
-memory_logger.addHandler(memory_handler)
 
 alert_logger = logging.getLogger("AlertLogger")
 alert_logger.setLevel(logging.INFO)
-alert_logger.addHandler(alert_handler)
 
-def log_memory(usage_percent):
-    top_processes = get_top_processes(3)
-    process_details = "; ".join([f"{p['name']} (PID: {p['pid']}) - {p['memory_percent']:.2f}%" for p in top_processes])
-    
-    memory_logger.info(f"Memory Usage: {usage_percent}%; Top Processes: {process_details}")
+_STOP = object()
+_writer = None
+_writer_lock = threading.Lock()
+_options = {"json_lines": False, "batch_size": BATCH_SIZE, "flush_interval": FLUSH_INTERVAL}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with any structured `fields` passed through `extra`"""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, default=str)
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """Leaves flushing to the batch writer instead of flushing after every record"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class _QueueingHandler(logging.Handler):
+    """Hands unformatted records to the batch writer, tagged with their file handler"""
+
+    def __init__(self, writer, target):
+        super().__init__()
+        self.writer = writer
+        self.target = target
+
+    def emit(self, record):
+        self.writer.enqueue(self.target, record)
+
+
+class BatchWriter:
+    """Drains queued records into their file handlers on one background thread"""
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_queued=MAX_QUEUED):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(max_queued)
+        self.handlers = []
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self._thread = None
+
+    def enqueue(self, handler, record):
+        try:
+            self.queue.put_nowait((handler, record))
+        except queue.Full:
+            self.dropped += 1
+            instrument.count("log.dropped")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="ResFlowLogWriter", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Write out everything still queued, then stop the thread"""
+        if self._thread is not None:
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        return {"written": self.written, "batches": self.batches, "dropped": self.dropped,
+                "queued": self.queue.qsize()}
+
+    def _run(self):
+        pending = set()
+        count = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
 
-def log_alert(usage_percent):
+            if item is not None and item is not _STOP:
+                handler, record = item
+                try:
+                    handler.handle(record)
+                except Exception as e:
+                    print(f"Log writer error: {e}")
+                pending.add(handler)
+                count += 1
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if pending and (item is None or item is _STOP or count >= self.batch_size
+                            or time.monotonic() >= deadline):
+                with instrument.timer("log.flush"):
+                    for handler in pending:
+                        handler.flush_batch()
+                instrument.count("log.records", count)
+                self.written += count
+                self.batches += 1
+                pending.clear()
+                count = 0
+                deadline = None
+            if item is _STOP:
+                return
+
+
+def configure(json_lines=None, batch_size=None, flush_interval=None):
+    """Change the log format or batching, restarting the writer if it is running"""
+    for key, value in (("json_lines", json_lines), ("batch_size", batch_size), ("flush_interval", flush_interval)):
+        if value is not None:
+            _options[key] = value
+    shutdown()
+
+
+def _file_handler(name, max_bytes, backup_count):
+    extension = "jsonl" if _options["json_lines"] else "txt"
+    handler = BatchedRotatingFileHandler(os.path.join(log_dir, f"{name}.{extension}"),
+                                         maxBytes=max_bytes, backupCount=backup_count)
+    if _options["json_lines"]:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    return handler
+
+
+def _get_writer():
+    """Open the log files and start the writer on first use"""
+    global _writer
+    if _writer is not None:
+        return _writer
+    with _writer_lock:
+        if _writer is None:
+            os.makedirs(log_dir, exist_ok=True)
+            writer = BatchWriter(_options["batch_size"], _options["flush_interval"])
+            writer.handlers = [_file_handler("memory_log", 5 * 1024 * 1024, 3),
+                               _file_handler("alert_log", 2 * 1024 * 1024, 2)]
+            memory_logger.addHandler(_QueueingHandler(writer, writer.handlers[0]))
+            alert_logger.addHandler(_QueueingHandler(writer, writer.handlers[1]))
+            writer.start()
+            _writer = writer
+    return _writer
+
+
+def shutdown():
+    """Flush and close the log files. Logging again reopens them"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+        if writer is None:
+            return
+        for logger in (memory_logger, alert_logger):
+            for handler in [h for h in logger.handlers if isinstance(h, _QueueingHandler)]:
+                logger.removeHandler(handler)
+        writer.stop()
+        for handler in writer.handlers:
+            handler.close()
+
+
+def writer_stats():
+    return _writer.stats() if _writer is not None else None
+
+
+atexit.register(shutdown)
+
+
+class _ProcessList:
+    """Formats the top processes only when the writer thread renders the message"""
+
+    def __init__(self, processes):
+        self.processes = processes
+
+    def __str__(self):
+        return "; ".join(f"{p['name']} (PID: {p['pid']}) - {p['memory_percent']:.2f}%" for p in self.processes)
+
+
+def _process_fields(processes):
+    return [{"pid": p["pid"], "name": p["name"], "memory_percent": p["memory_percent"]} for p in processes]
+
+
+def log_memory(usage_percent, snapshot=None):
+    _get_writer()
+    top_processes = get_top_processes(3, snapshot)
+    memory_logger.info("Memory Usage: %s%%; Top Processes: %s", usage_percent, _ProcessList(top_processes),
+                       extra={"fields": {"usage": usage_percent, "top_processes": _process_fields(top_processes)}})
+
+def log_alert(usage_percent, snapshot=None):
+    _get_writer()
     # Get the top process consuming the most memory
-    top_process = get_top_processes(1)[0]
-    top_process_details = f"{top_process['name']} (PID: {top_process['pid']}) - {top_process['memory_percent']:.2f}%"
+    top_process = get_top_processes(1, snapshot)
 
     # Log the alert with the highest memory-consuming process
-    alert_logger.warning(
-        f"ALERT: High Memory Usage at {usage_percent}%; Highest Memory Process: {top_process_details}"
-    )
+    alert_logger.warning("ALERT: High Memory Usage at %s%%; Highest Memory Process: %s",
+                         usage_percent, _ProcessList(top_process),
+                         extra={"fields": {"usage": usage_percent, "top_processes": _process_fields(top_process)}})
+
+def log_alert_message(message, **fields):
+    _get_writer()
+    alert_logger.warning(message, extra={"fields": fields})
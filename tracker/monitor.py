@@ -1,5 +1,66 @@
+import heapq
+import threading
+import time
+from dataclasses import dataclass, field
+
 import psutil
 
+from tracker import instrument
+from tracker.collectors import MIN_MEMORY_PERCENT, create_collector
+from tracker.cpu import SystemCpu
+from tracker.groups import ProcessGroups, summarize
+from tracker.ipc import IpcClient, default_socket_path
+from tracker.pressure import PressureReader, oom_score_max
+from tracker.smaps import SmapsReader
+
+# How many processes are ranked each tick with a bounded select, larger requests select again
+RANK_LIMIT = 10
+
+# A snapshot older than this is considered stale and the process table is rescanned
+SNAPSHOT_TTL = 0.5
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_smaps = None
+_collector = create_collector("psutil")
+_system_cpu = SystemCpu()
+_cpu_lock = threading.Lock()
+_pressure = PressureReader()
+_pressure_lock = threading.Lock()
+
+
+def rank_key(process):
+    """Order processes by memory first and CPU second"""
+    return (process["memory_percent"], process["cpu_percent"])
+
+
+class ProcessSnapshot:
+    """One scan of the process table, shared by everything that runs in the same tick.
+
+    `processes` only holds processes above the memory cutoff, `groups` sums every
+    process by tree, name, user and cgroup (see tracker.groups).
+    """
+
+    def __init__(self, processes, ranked=None, ttl=SNAPSHOT_TTL, timestamp=None, groups=None):
+        self.processes = processes
+        self.groups = groups or {}
+        self.ranked = ranked if ranked is not None else heapq.nlargest(RANK_LIMIT, processes, key=rank_key)
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.taken_at = time.monotonic()
+        self.ttl = ttl
+
+    def age(self):
+        return time.monotonic() - self.taken_at
+
+    def is_expired(self):
+        return self.age() >= self.ttl
+
+    def top(self, limit=5):
+        if limit <= len(self.ranked) or len(self.ranked) == len(self.processes):
+            return self.ranked[:limit]
+        return heapq.nlargest(limit, self.processes, key=rank_key)
+
+
 def get_memory_usage():
     mem = psutil.virtual_memory()
     return {
@@ -9,27 +70,332 @@ def get_memory_usage():
         "percent": mem.percent
     }
 
+def get_swap_usage():
+    swap = psutil.swap_memory()
+    return {
+        "total": round(swap.total / (1024 * 1024), 2),
+        "used": round(swap.used / (1024 * 1024), 2),
+        "percent": swap.percent
+    }
+
+def get_cpu_times():
+    """Return (system percent, [per-core percent]) since the previous call, without blocking"""
+    with _cpu_lock:
+        return _system_cpu.sample()
+
+def get_pressure():
+    """Memory stall and paging since the previous call, see tracker.pressure"""
+    with _pressure_lock:
+        return _pressure.sample()
+
+def get_pressure_reader():
+    return _pressure
+
 def get_cpu_usage():
     """Get CPU usage percentage"""
-    return psutil.cpu_percent(interval=0.1)
-
-def get_top_processes(limit=5):
-    processes = []
-    
-    for p in psutil.process_iter(['pid', 'name', 'memory_percent', 'cpu_percent', 'memory_info']):
-        try:
-            if p.info['memory_percent'] < 0.1:  # Ignore processes using less than 0.1% memory
-                continue
-            processes.append({
-                "pid": p.info['pid'],
-                "name": p.info['name'],
-                "memory_percent": round(p.info['memory_percent'], 2),
-                "memory_mb": round(p.info['memory_info'].rss / (1024 * 1024), 2),  # Convert bytes to MB
-                "cpu_percent": round(p.info['cpu_percent'], 2)
-            })
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            continue
-
-    processes.sort(key=lambda x: (x['memory_percent'], x['cpu_percent']), reverse=True)
-    
-    return processes[:limit]
\ No newline at end of file
+    return get_cpu_times()[0]
+
+def set_collector(collector, **kwargs):
+    """Switch the process table backend, by name ("psutil", "proc", "events", "sharded") or instance"""
+    global _collector
+    if isinstance(collector, str):
+        collector = create_collector(collector, **kwargs)
+    with _snapshot_lock:
+        previous, _collector = _collector, collector
+        if previous is not collector and hasattr(previous, "close"):
+            previous.close()
+
+def get_collector():
+    return _collector
+
+def set_accurate_memory(enabled, **kwargs):
+    """Add PSS/USS/swap (pss_mb, uss_mb, swap_mb) to the top processes, see tracker.smaps"""
+    global _smaps
+    with _snapshot_lock:
+        _smaps = SmapsReader(**kwargs) if enabled else None
+
+def get_smaps_reader():
+    return _smaps
+
+def scan_processes():
+    """Walk the process table once and return every process, unsorted"""
+    return _collector.collect()
+
+def get_snapshot(ttl=SNAPSHOT_TTL):
+    """Return the cached snapshot, rescanning only once it has expired"""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.is_expired():
+            with instrument.timer("scan.collect"):
+                rows = scan_processes()
+            with instrument.timer("scan.groups"):
+                groups = ProcessGroups(rows)
+            with instrument.timer("scan.rank"):
+                processes = [p for p in rows if p["memory_percent"] >= MIN_MEMORY_PERCENT]
+                ranked = heapq.nlargest(RANK_LIMIT, processes, key=rank_key)
+            if _smaps is not None:
+                with instrument.timer("scan.smaps"):
+                    _smaps.enrich(ranked)
+            with instrument.timer("scan.oom"), _pressure_lock:
+                _pressure.read_oom_scores(ranked, getattr(_collector, "proc_root", None))
+            instrument.count("scan.processes", len(rows))
+            _snapshot = ProcessSnapshot(processes, ranked, ttl, groups=groups)
+        return _snapshot
+
+def get_top_processes(limit=5, snapshot=None):
+    if snapshot is None:
+        snapshot = get_snapshot()
+    return snapshot.top(limit)
+
+
+@dataclass(frozen=True)
+class Sample:
+    """Everything collected in one sampler tick. Never modified once published"""
+    seq: int
+    timestamp: float
+    memory: dict
+    cpu_percent: float
+    swap: dict
+    snapshot: ProcessSnapshot
+    duration: float  # Seconds spent collecting this sample
+    jitter: float  # Seconds between the scheduled and the actual start of the tick
+    scanned: bool = True  # False when the process snapshot was reused from an earlier tick
+    cpu_per_core: tuple = ()
+    pressure: dict = field(default_factory=dict)  # tracker.pressure.FIELDS
+
+    @property
+    def processes(self):
+        return self.snapshot.processes
+
+    def to_dict(self):
+        """Plain JSON-friendly form, used to ship samples to other processes"""
+        return {
+            "seq": self.seq,
+            "timestamp": self.timestamp,
+            "memory": self.memory,
+            "cpu_percent": self.cpu_percent,
+            "swap": self.swap,
+            "processes": self.snapshot.processes,
+            "ranked": [p["pid"] for p in self.snapshot.ranked],
+            "snapshot_timestamp": self.snapshot.timestamp,
+            "groups": summarize(self.snapshot.groups),
+            "duration": self.duration,
+            "jitter": self.jitter,
+            "scanned": self.scanned,
+            "cpu_per_core": list(self.cpu_per_core),
+            "pressure": self.pressure,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        by_pid = {p["pid"]: p for p in data["processes"]}
+        ranked = [by_pid[pid] for pid in data["ranked"] if pid in by_pid]
+        snapshot = ProcessSnapshot(data["processes"], ranked,
+                                   timestamp=data.get("snapshot_timestamp", data["timestamp"]),
+                                   groups=data.get("groups"))
+        return cls(
+            seq=data["seq"],
+            timestamp=data["timestamp"],
+            memory=data["memory"],
+            cpu_percent=data["cpu_percent"],
+            swap=data["swap"],
+            snapshot=snapshot,
+            duration=data["duration"],
+            jitter=data["jitter"],
+            scanned=data.get("scanned", True),
+            cpu_per_core=tuple(data.get("cpu_per_core", ())),
+            pressure=data.get("pressure", {}),
+        )
+
+
+class SampleSource:
+    """Publishes samples produced on a worker thread, subclasses implement `_run`.
+
+    Only the newest sample is kept for the consumer: if the previous one has not
+    been taken yet when a new one arrives, the old one is dropped. `on_sample` is
+    called from the worker thread whenever a sample becomes available, so GUI code
+    should hand it to a queued signal and call `take()` from the receiving slot.
+    """
+
+    def __init__(self, on_sample=None, listeners=None):
+        self.on_sample = on_sample
+        # Called on the worker thread with every sample, for storage and other consumers
+        self.listeners = list(listeners or [])
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._pending = None
+        self._latest = None
+        self._published = 0
+        self._dropped = 0
+        self._missed_ticks = 0
+        self._duration_total = 0.0
+        self._duration_max = 0.0
+        self._jitter_total = 0.0
+        self._jitter_max = 0.0
+
+    def start(self):
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="ResFlowSampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def take(self):
+        """Return the newest sample not yet consumed, or None"""
+        with self._lock:
+            sample, self._pending = self._pending, None
+            return sample
+
+    def latest(self):
+        """Return the newest sample whether or not it was consumed"""
+        return self._latest
+
+    def stats(self):
+        with self._lock:
+            count = self._published
+            return {
+                "samples": count,
+                "dropped": self._dropped,
+                "missed_ticks": self._missed_ticks,
+                "last_duration": self._latest.duration if self._latest else 0.0,
+                "avg_duration": self._duration_total / count if count else 0.0,
+                "max_duration": self._duration_max,
+                "last_jitter": self._latest.jitter if self._latest else 0.0,
+                "avg_jitter": self._jitter_total / count if count else 0.0,
+                "max_jitter": self._jitter_max,
+            }
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def _publish(self, sample):
+        for listener in self.listeners:
+            try:
+                if instrument.is_enabled():
+                    with instrument.timer("listener." + getattr(listener, "__qualname__", type(listener).__name__)):
+                        listener(sample)
+                else:
+                    listener(sample)
+            except Exception as e:
+                print(f"Sample listener error: {e}")
+        with self._lock:
+            # Without a consumer (e.g. the daemon) nothing is pending, so nothing is dropped
+            notify = self._pending is None
+            if not notify:
+                self._dropped += 1
+            if self.on_sample is not None:
+                self._pending = sample
+            self._latest = sample
+            self._published += 1
+            self._duration_total += sample.duration
+            self._duration_max = max(self._duration_max, sample.duration)
+            self._jitter_total += sample.jitter
+            self._jitter_max = max(self._jitter_max, sample.jitter)
+        if notify and self.on_sample is not None:
+            self.on_sample()
+
+
+class Sampler(SampleSource):
+    """Collects samples on a worker thread at a fixed cadence"""
+
+    def __init__(self, interval=1.0, on_sample=None, listeners=None, scheduler=None):
+        super().__init__(on_sample, listeners)
+        self.interval = interval
+        # Optional AdaptiveScheduler deciding which ticks rescan the process table
+        self.scheduler = scheduler
+        self._snapshot = None
+        self._seq = 0
+
+    def collect(self, scheduled=None):
+        timestamp = time.time()
+        started = time.monotonic()
+        jitter = max(0.0, started - scheduled) if scheduled is not None else 0.0
+        with instrument.timer("sample.memory"):
+            memory = get_memory_usage()
+        with instrument.timer("sample.cpu"):
+            cpu, per_core = get_cpu_times()
+        with instrument.timer("sample.swap"):
+            swap = get_swap_usage()
+        with instrument.timer("sample.pressure"):
+            pressure = get_pressure()
+
+        scheduler = self.scheduler
+        if scheduler is not None:
+            scheduler.observe(timestamp, memory["percent"], cpu)
+        scanned = self._snapshot is None or scheduler is None or scheduler.should_scan()
+        if scanned:
+            scan_started = time.monotonic()
+            self._snapshot = get_snapshot()
+            scan_cost = time.monotonic() - scan_started
+            instrument.observe("sample.scan", scan_cost * 1000)
+            if scheduler is not None:
+                scheduler.record_scan(scan_cost)
+        snapshot = self._snapshot
+        pressure["oom_score_max"] = oom_score_max(snapshot.ranked)
+        self._seq += 1
+        instrument.count("sample.scanned" if scanned else "sample.scan_skipped")
+        return Sample(
+            seq=self._seq,
+            timestamp=timestamp,
+            memory=memory,
+            cpu_percent=cpu,
+            swap=swap,
+            snapshot=snapshot,
+            duration=time.monotonic() - started,
+            jitter=jitter,
+            scanned=scanned,
+            cpu_per_core=tuple(per_core),
+            pressure=pressure,
+        )
+
+    def _run(self):
+        # Schedule against absolute deadlines so slow ticks don't make the cadence drift
+        deadline = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                with instrument.timer("sample.collect"):
+                    sample = self.collect(deadline)
+                self._publish(sample)
+            except Exception as e:
+                print(f"Sampler error: {e}")
+
+            deadline += self.interval
+            now = time.monotonic()
+            if now > deadline:
+                # Fell behind by at least a whole tick, skip ahead instead of bursting
+                missed = int((now - deadline) // self.interval) + 1
+                self._missed_ticks += missed
+                deadline += missed * self.interval
+            self._stop_event.wait(deadline - time.monotonic())
+
+
+class RemoteSampler(SampleSource):
+    """Drop-in Sampler that receives samples from a daemon instead of scanning locally"""
+
+    def __init__(self, path=None, on_sample=None, listeners=None, retry_interval=1.0):
+        super().__init__(on_sample, listeners)
+        self.path = path or default_socket_path()
+        self.retry_interval = retry_interval
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                with IpcClient(self.path) as client:
+                    client.subscribe()
+                    while not self._stop_event.is_set():
+                        message = client.read_message(timeout=0.5)
+                        if message is not None and message.get("type") == "sample":
+                            self._publish(Sample.from_dict(message["data"]))
+            except (OSError, ConnectionError, TimeoutError) as e:
+                print(f"Lost connection to ResFlow daemon at {self.path}: {e}")
+                self._stop_event.wait(self.retry_interval)
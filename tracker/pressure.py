@@ -0,0 +1,150 @@
+"""Memory stall and OOM risk: PSI, paging counters from vmstat, and per-process oom_score.
+
+"Used" memory includes page cache and says little about whether anything is
+waiting for memory. /proc/pressure/memory reports the share of time tasks
+were stalled on memory (Linux 4.20+, CONFIG_PSI), and /proc/vmstat shows
+major faults and swapping as they happen. Both files stay open and are
+re-read with pread, so a read costs one syscall and can run every tick.
+Sources missing on this kernel read as 0.
+"""
+import os
+import time
+
+# Processes at the top of the ranking whose oom_score is read on every scan
+OOM_TOP_K = 10
+
+# vmstat counters and the sample fields their per-second rates go to
+_VMSTAT = {
+    b"pgmajfault": "major_faults",
+    b"pswpin": "swap_in",
+    b"pswpout": "swap_out",
+}
+# Per-sample values, oom_score_max is the highest oom_score among the top processes
+FIELDS = ("psi_some_avg10", "psi_full_avg10", "stall_percent", "major_faults", "swap_in", "swap_out",
+          "oom_score_max")
+
+
+def parse_psi(data):
+    """{"some": (avg10, total µs), "full": (...)} from a /proc/pressure file"""
+    result = {}
+    for line in data.splitlines():
+        kind, *pairs = line.split()
+        values = dict(pair.split(b"=", 1) for pair in pairs)
+        result[kind.decode()] = (float(values[b"avg10"]), int(values[b"total"]))
+    return result
+
+
+def parse_vmstat(data):
+    counters = {}
+    for line in data.splitlines():
+        name, _, value = line.partition(b" ")
+        field = _VMSTAT.get(name)
+        if field is not None:
+            counters[field] = int(value)
+    return counters
+
+
+class _Handle:
+    """A /proc file kept open and re-read from the start with pread"""
+    __slots__ = ("fd", "size")
+
+    def __init__(self, path, size):
+        self.fd = os.open(path, os.O_RDONLY)
+        self.size = size
+
+    def read(self):
+        data = os.pread(self.fd, self.size, 0)
+        while len(data) == self.size:  # Grown past the buffer, read it all and remember the size
+            self.size *= 2
+            data = os.pread(self.fd, self.size, 0)
+        return data
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PressureReader:
+    """Reads PSI and vmstat each sample, and oom_score for the top processes each scan"""
+
+    def __init__(self, proc_root="/proc"):
+        self.proc_root = proc_root
+        self._psi = self._open("pressure/memory", 256)
+        self._vmstat = self._open("vmstat", 8192)
+        self._previous = None  # (monotonic time, full stall µs, vmstat counters)
+        self._oom = {}  # (pid, create_time) -> open oom_score handle
+        self.oom_reads = 0
+        self.oom_failures = 0
+
+    def _open(self, name, size):
+        try:
+            return _Handle(os.path.join(self.proc_root, name), size)
+        except OSError:
+            return None
+
+    def available(self):
+        return {"psi": self._psi is not None, "vmstat": self._vmstat is not None}
+
+    def sample(self):
+        """The FIELDS of this moment, rates and stall_percent since the previous call.
+
+        oom_score_max is left at 0 for the caller, it comes from the process scan.
+        """
+        now = time.monotonic()
+        values = dict.fromkeys(FIELDS, 0.0)
+        full_total = 0
+        if self._psi is not None:
+            psi = parse_psi(self._psi.read())
+            some = psi.get("some", (0.0, 0))
+            full = psi.get("full", (0.0, 0))
+            values["psi_some_avg10"] = some[0]
+            values["psi_full_avg10"] = full[0]
+            full_total = full[1]
+        counters = parse_vmstat(self._vmstat.read()) if self._vmstat is not None else {}
+
+        if self._previous is not None and now > self._previous[0]:
+            elapsed = now - self._previous[0]
+            # Every task stalled on memory for this share of the interval, exact rather than a 10 s average
+            values["stall_percent"] = round(min(100.0, (full_total - self._previous[1]) / (elapsed * 1e4)), 2)
+            for field, count in counters.items():
+                values[field] = round(max(0, count - self._previous[2].get(field, count)) / elapsed, 1)
+        self._previous = (now, full_total, counters)
+        return values
+
+    def read_oom_scores(self, processes, proc_root=None, top_k=OOM_TOP_K):
+        """Set "oom_score" on the first `top_k` rows in place, reusing each process' handle"""
+        proc_root = proc_root or self.proc_root
+        handles = {}
+        for row in processes[:top_k]:
+            key = (row["pid"], row["create_time"])
+            handle = self._oom.pop(key, None)
+            try:
+                if handle is None:
+                    handle = _Handle(os.path.join(proc_root, str(row["pid"]), "oom_score"), 16)
+                row["oom_score"] = int(handle.read())  # Raises once the process is gone
+            except (OSError, ValueError):
+                if handle is not None:
+                    handle.close()
+                self.oom_failures += 1
+                continue
+            handles[key] = handle
+            self.oom_reads += 1
+        # Processes that left the top or exited
+        for handle in self._oom.values():
+            handle.close()
+        self._oom = handles
+        return processes
+
+    def stats(self):
+        return dict(self.available(), oom_reads=self.oom_reads, oom_failures=self.oom_failures,
+                    oom_open=len(self._oom))
+
+    def close(self):
+        for handle in (self._psi, self._vmstat, *self._oom.values()):
+            if handle is not None:
+                handle.close()
+        self._psi = self._vmstat = None
+        self._oom = {}
+
+
+def oom_score_max(processes, top_k=OOM_TOP_K):
+    return max((p.get("oom_score", 0) for p in processes[:top_k]), default=0)
@@ -0,0 +1,290 @@
+"""Process start and exit events, so the live process set is kept up to date between scans.
+
+On Linux with CAP_NET_ADMIN the kernel's process connector (a netlink socket)
+reports every fork, exec and exit as it happens. Everywhere else the fallback
+diffs the /proc directory listing a few times a second, which is still far
+cheaper than reading every process.
+
+Processes that exit between two sampler ticks never show up in a scan. Each
+source therefore polls the peak RSS (VmHWM) of young processes every
+`probe_interval` seconds. When a process above `spike_mb` exits, it is kept in
+`short_lived()`.
+"""
+import errno
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+from tracker import instrument
+
+# How often young processes have their peak RSS read, and for how long after they start
+PROBE_INTERVAL = 0.1
+WATCH_FOR = 5.0
+# Peak RSS that makes an exited young process worth remembering
+SPIKE_MB = 100.0
+SHORT_LIVED_HISTORY = 100
+POLL_INTERVAL = 0.25
+
+# linux/netlink.h, linux/connector.h and linux/cn_proc.h
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+NLMSG_HEADER = struct.Struct("=IHHII")  # length, type, flags, seq, pid
+CN_MSG = struct.Struct("=IIIIHH")  # idx, val, seq, ack, length, flags
+EVENT_HEADER = struct.Struct("=IIQ")  # what, cpu, timestamp_ns
+EVENT_PIDS = struct.Struct("=IIII")  # fork: parent pid/tgid, child pid/tgid; exec/exit: pid, tgid, ...
+EVENT_OFFSET = NLMSG_HEADER.size + CN_MSG.size + EVENT_HEADER.size
+
+
+def read_peak(proc_root, pid):
+    """(name, peak RSS in kB) from /proc/<pid>/status, VmRSS where VmHWM is missing"""
+    name = ""
+    peak = 0
+    with open(os.path.join(proc_root, str(pid), "status"), "rb") as f:
+        for line in f:
+            if line.startswith(b"Name:"):
+                name = line[5:].strip().decode(errors="replace")
+            elif line.startswith(b"VmHWM:") or (line.startswith(b"VmRSS:") and not peak):
+                peak = int(line.split()[1])
+    return name, peak
+
+
+class ProcessEvents:
+    """Collects started and exited PIDs on a background thread until the collector drains them.
+
+    Subclasses implement `_open()`, `_close()` and `_wait(timeout)`. `_wait`
+    blocks for up to `timeout` seconds and reports what it sees through
+    `_started()` and `_exited()`.
+    """
+    source = None
+
+    def __init__(self, proc_root="/proc", probe_interval=PROBE_INTERVAL, watch_for=WATCH_FOR,
+                 spike_mb=SPIKE_MB, history=SHORT_LIVED_HISTORY):
+        self.proc_root = proc_root
+        self.probe_interval = probe_interval
+        self.watch_for = watch_for
+        self.spike_kb = spike_mb * 1024
+        self._lock = threading.Lock()
+        self._started_pids = set()
+        self._exited_pids = set()
+        self._resync = False
+        self._young = {}  # pid -> [name, started at, peak kB], only touched by the event thread
+        self._short_lived = deque(maxlen=history)
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.started = 0
+        self.exited = 0
+        self.overflows = 0
+
+    def start(self):
+        self._open()
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"ResFlowEvents-{self.source}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(2.0)
+            self._thread = None
+        self._close()
+
+    def drain(self):
+        """(started PIDs, exited PIDs, resync) since the last call, resync when events were lost"""
+        with self._lock:
+            started, self._started_pids = self._started_pids, set()
+            exited, self._exited_pids = self._exited_pids, set()
+            resync, self._resync = self._resync, False
+        return started, exited, resync
+
+    def short_lived(self, limit=20):
+        """Processes that peaked above `spike_mb` and exited within `watch_for` seconds, newest first"""
+        with self._lock:
+            rows = list(self._short_lived)
+        rows.reverse()
+        return rows[:limit] if limit else rows
+
+    def stats(self):
+        return {
+            "source": self.source,
+            "started": self.started,
+            "exited": self.exited,
+            "watched": len(self._young),
+            "short_lived": len(self._short_lived),
+            "overflows": self.overflows,
+        }
+
+    def _run(self):
+        next_probe = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self._wait(max(0.0, next_probe - time.monotonic()))
+            except OSError as e:
+                print(f"Process events failed, rescanning: {e}")
+                self._lost_events()
+                self._stop_event.wait(self.probe_interval)
+            now = time.monotonic()
+            if now >= next_probe:
+                self._probe(now)
+                next_probe = now + self.probe_interval
+
+    def _started(self, pid):
+        with self._lock:
+            self._started_pids.add(pid)
+        self.started += 1
+        self._young[pid] = [None, time.monotonic(), 0]
+        self._probe_one(pid, self._young[pid])
+
+    def _exited(self, pid):
+        with self._lock:
+            self._exited_pids.add(pid)
+        self.exited += 1
+        entry = self._young.pop(pid, None)
+        if entry is None or entry[2] < self.spike_kb:
+            return
+        instrument.count("events.short_lived")
+        with self._lock:
+            self._short_lived.append({
+                "pid": pid,
+                "name": entry[0] or "",
+                "peak_mb": round(entry[2] / 1024, 2),
+                "lifetime": round(time.monotonic() - entry[1], 3),
+                "exited_at": time.time(),
+            })
+
+    def _lost_events(self):
+        """Events were dropped, the collector has to rescan every process once"""
+        self.overflows += 1
+        with self._lock:
+            self._resync = True
+
+    def _probe_one(self, pid, entry):
+        try:
+            name, peak = read_peak(self.proc_root, pid)
+        except (OSError, ValueError, IndexError):
+            return  # Exited or became a zombie, the exit event settles it
+        entry[0] = name or entry[0]
+        entry[2] = max(entry[2], peak)
+
+    def _probe(self, now):
+        for pid, entry in list(self._young.items()):
+            if now - entry[1] > self.watch_for:
+                del self._young[pid]  # Lives long enough for the regular scans to see
+            else:
+                self._probe_one(pid, entry)
+
+    def _open(self):
+        raise NotImplementedError
+
+    def _close(self):
+        pass
+
+    def _wait(self, timeout):
+        raise NotImplementedError
+
+
+class NetlinkProcessEvents(ProcessEvents):
+    """Fork, exec and exit events from the kernel's process connector, needs CAP_NET_ADMIN"""
+    source = "netlink"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sock = None
+
+    def _open(self):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            sock.bind((0, CN_IDX_PROC))
+            op = struct.pack("=I", PROC_CN_MCAST_LISTEN)
+            message = CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(op), 0) + op
+            sock.send(NLMSG_HEADER.pack(NLMSG_HEADER.size + len(message), NLMSG_DONE, 0, 0, 0) + message)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _wait(self, timeout):
+        self._sock.settimeout(timeout if timeout > 0 else 0.001)
+        try:
+            data = self._sock.recv(65536)
+        except socket.timeout:
+            return
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                raise
+            self._lost_events()  # The kernel dropped events while we were not reading
+            return
+
+        offset = 0
+        while offset + EVENT_OFFSET + EVENT_PIDS.size <= len(data):
+            length = NLMSG_HEADER.unpack_from(data, offset)[0]
+            what = EVENT_HEADER.unpack_from(data, offset + NLMSG_HEADER.size + CN_MSG.size)[0]
+            pids = EVENT_PIDS.unpack_from(data, offset + EVENT_OFFSET)
+            # Threads come through as well, only whole processes (pid == tgid) matter
+            if what == PROC_EVENT_FORK and pids[2] == pids[3]:
+                self._started(pids[3])
+            elif what == PROC_EVENT_EXEC and pids[0] == pids[1]:
+                self._started(pids[1])  # New name and memory map, same pid
+            elif what == PROC_EVENT_EXIT and pids[0] == pids[1]:
+                self._exited(pids[1])
+            if length <= 0:
+                break
+            offset += (length + 3) & ~3  # NLMSG_ALIGN
+
+
+class PollingProcessEvents(ProcessEvents):
+    """Diffs the PID directories of `proc_root` every `poll_interval` seconds"""
+    source = "polling"
+
+    def __init__(self, *args, poll_interval=POLL_INTERVAL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.poll_interval = poll_interval
+        self._known = set()
+        self._next_poll = 0.0
+
+    def _pids(self):
+        return {int(entry) for entry in os.listdir(self.proc_root) if entry.isdigit()}
+
+    def _open(self):
+        self._known = self._pids()
+
+    def _wait(self, timeout):
+        self._stop_event.wait(min(timeout, max(0.0, self._next_poll - time.monotonic())))
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+        current = self._pids()
+        for pid in current - self._known:
+            self._started(pid)
+        for pid in self._known - current:
+            self._exited(pid)
+        self._known = current
+
+
+def create_event_source(proc_root="/proc", **kwargs):
+    """The netlink source where the kernel allows it, else polling"""
+    if proc_root == "/proc" and hasattr(socket, "AF_NETLINK"):
+        events = NetlinkProcessEvents(proc_root, **kwargs)
+        try:
+            events.start()
+            return events
+        except OSError:
+            pass  # No CAP_NET_ADMIN, or no process connector in this kernel
+    events = PollingProcessEvents(proc_root, **kwargs)
+    events.start()
+    return events
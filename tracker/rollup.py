@@ -0,0 +1,126 @@
+import bisect
+import math
+
+import numpy as np
+
+from tracker.timeseries import RingBuffer
+
+STATS = ("min", "max", "mean", "p95")
+
+# (bucket width, retention) in seconds, finest first
+DEFAULT_TIERS = (
+    (1, 6 * 3600),
+    (10, 2 * 24 * 3600),
+    (60, 7 * 24 * 3600),
+    (600, 60 * 24 * 3600),
+)
+
+
+def _p95(sorted_values):
+    # Nearest-rank percentile, the same definition the vectorised load uses
+    return sorted_values[max(0, math.ceil(0.95 * len(sorted_values)) - 1)]
+
+
+class RollupTier:
+    """Buckets of one fixed width, each holding min/max/mean/p95 of its samples.
+
+    The newest bucket is kept in the ring buffer while it is still filling and
+    rewritten in place on every sample, so readers always see current data.
+    """
+
+    def __init__(self, width, retention):
+        self.width = width
+        self.retention = retention
+        self.buffer = RingBuffer(max(1, int(retention // width)), STATS)
+        self._bucket = None
+        self._values = []
+        self._total = 0.0
+
+    def add(self, timestamp, value):
+        if value is None or math.isnan(value):
+            return
+        bucket = math.floor(timestamp / self.width) * self.width
+        if bucket != self._bucket:
+            is_new = True
+            self._bucket = bucket
+            self._values = []
+            self._total = 0.0
+        else:
+            is_new = False
+
+        # Kept sorted, so min, max and p95 are lookups and a sample costs one insertion
+        bisect.insort(self._values, value)
+        self._total += value
+        ordered = self._values
+        stats = {
+            "min": ordered[0],
+            "max": ordered[-1],
+            "mean": self._total / len(ordered),
+            "p95": _p95(ordered),
+        }
+        if is_new:
+            self.buffer.append(bucket, stats)
+        else:
+            self.buffer.replace_last(bucket, stats)
+
+    def load(self, timestamps, values):
+        """Rebuild from stored history in one vectorised pass (timestamps sorted)"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        timestamps, values = timestamps[keep], values[keep]
+        if len(values) == 0:
+            return
+
+        buckets = np.floor(timestamps / self.width) * self.width
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        counts = np.diff(np.concatenate((starts, [len(values)])))
+        # Sort values inside each bucket, buckets themselves are already in order
+        ordered = values[np.lexsort((values, buckets))]
+        p95_index = starts + np.maximum(0, np.ceil(0.95 * counts).astype(np.int64) - 1)
+
+        self.buffer.clear()
+        self.buffer.extend(buckets[starts], {
+            "min": np.minimum.reduceat(values, starts),
+            "max": np.maximum.reduceat(values, starts),
+            "mean": np.add.reduceat(values, starts) / counts,
+            "p95": ordered[p95_index],
+        })
+        # Keep the last bucket open so live samples keep filling it
+        self._bucket = buckets[-1]
+        self._values = sorted(values[starts[-1]:].tolist())
+        self._total = float(np.sum(self._values))
+
+
+class Rollups:
+    """Multi-resolution history of one metric, built incrementally as samples arrive"""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = [RollupTier(width, retention) for width, retention in tiers]
+
+    @property
+    def retention(self):
+        return max(tier.retention for tier in self.tiers)
+
+    def add(self, timestamp, value):
+        for tier in self.tiers:
+            tier.add(timestamp, value)
+
+    def load(self, timestamps, values):
+        for tier in self.tiers:
+            tier.load(timestamps, values)
+
+    def tier_for(self, span, max_points):
+        """Finest tier that draws `span` seconds in no more than `max_points` points"""
+        needed = span / max(1, max_points)
+        for tier in self.tiers:
+            if tier.width >= needed and span <= tier.retention:
+                return tier
+        return self.tiers[-1]
+
+    def series(self, tier, start, end):
+        """Views of (timestamps, {stat: values}) for buckets overlapping [start, end]"""
+        first, last = tier.buffer.index_range(start - tier.width, end)
+        times = tier.buffer.times()[first:last]
+        stats = {name: tier.buffer.values(name)[first:last] for name in STATS}
+        return times, stats
@@ -0,0 +1,262 @@
+"""Alert rules. Each keeps a few values of state however long its window, so many can run at 1 Hz."""
+from dataclasses import dataclass, field
+
+from tracker.leaks import Trend
+from tracker.monitor import get_top_processes
+from tracker.pressure import FIELDS as PRESSURE_FIELDS
+
+DEFAULT_COOLDOWN_TIME = 20
+
+# Values a rule can watch, read straight from a Sample
+METRICS = {
+    "memory_percent": lambda s: s.memory["percent"],
+    "used_mb": lambda s: s.memory["used"],
+    "available_mb": lambda s: s.memory["available"],
+    "cpu_percent": lambda s: s.cpu_percent,
+    "swap_percent": lambda s: s.swap["percent"],
+}
+# Memory stall, paging rates and OOM risk, e.g. "sustained:psi_full_avg10>10:30s" (see tracker.pressure)
+METRICS.update({name: (lambda s, name=name: s.pressure.get(name, 0.0)) for name in PRESSURE_FIELDS})
+
+
+def sample_metric(sample, metric):
+    try:
+        return METRICS[metric](sample)
+    except KeyError:
+        raise ValueError(f"Unknown metric: {metric}") from None
+
+
+@dataclass(frozen=True)
+class AlertEvent:
+    rule: str
+    timestamp: float
+    value: float
+    threshold: float
+    message: str
+    processes: tuple = ()
+    snapshot: object = field(default=None, repr=False, compare=False)
+
+    def to_dict(self):
+        return {
+            "rule": self.rule,
+            "timestamp": self.timestamp,
+            "value": self.value,
+            "threshold": self.threshold,
+            "message": self.message,
+            "processes": list(self.processes),
+        }
+
+
+def format_processes(processes):
+    return "\n".join([f"{p['name']} (PID: {p['pid']}) - {p['memory_percent']:.2f}%" for p in processes])
+
+
+class AlertRule:
+    """Base rule with its own cooldown. Subclasses implement `check(sample)`"""
+
+    def __init__(self, name, cooldown=DEFAULT_COOLDOWN_TIME):
+        self.name = name
+        self.cooldown = cooldown
+        self.last_fired = 0.0
+
+    def check(self, sample):
+        """Update state with `sample`; return (value, threshold, message[, processes]) when matched"""
+        raise NotImplementedError
+
+    def evaluate(self, sample):
+        result = self.check(sample)
+        if result is None or sample.timestamp - self.last_fired < self.cooldown:
+            return None
+        self.last_fired = sample.timestamp
+        value, threshold, message = result[:3]
+        processes = result[3] if len(result) > 3 else get_top_processes(3, sample.snapshot)
+        return AlertEvent(
+            rule=self.name,
+            timestamp=sample.timestamp,
+            value=value,
+            threshold=threshold,
+            message=message,
+            processes=tuple(processes),
+            snapshot=sample.snapshot,
+        )
+
+
+class ThresholdRule(AlertRule):
+    """Fires when a metric is at or above (or with `above=False`, at or below) `threshold`"""
+
+    def __init__(self, name="memory", threshold=80, cooldown=DEFAULT_COOLDOWN_TIME,
+                 metric="memory_percent", above=True):
+        super().__init__(name, cooldown)
+        self.threshold = threshold
+        self.metric = metric
+        self.above = above
+
+    def matches(self, value):
+        return value >= self.threshold if self.above else value <= self.threshold
+
+    def check(self, sample):
+        value = sample_metric(sample, self.metric)
+        if not self.matches(value):
+            return None
+        if self.metric == "memory_percent":
+            top = format_processes(get_top_processes(3, sample.snapshot))
+            return (value, self.threshold,
+                    f"Memory usage is at {value}% (Threshold: {self.threshold}%)!\n\n"
+                    f"Top Memory Consuming Processes:\n{top}")
+        return value, self.threshold, f"{self.metric} is at {value} (Threshold: {self.threshold})"
+
+
+class SustainedRule(ThresholdRule):
+    """Fires only once the threshold condition has held for `duration` seconds straight"""
+
+    def __init__(self, name, threshold, duration, cooldown=DEFAULT_COOLDOWN_TIME,
+                 metric="memory_percent", above=True):
+        super().__init__(name, threshold, cooldown, metric, above)
+        self.duration = duration
+        self._since = None
+
+    def check(self, sample):
+        value = sample_metric(sample, self.metric)
+        if not self.matches(value):
+            self._since = None
+            return None
+        if self._since is None:
+            self._since = sample.timestamp
+        held = sample.timestamp - self._since
+        if held < self.duration:
+            return None
+        return value, self.threshold, (f"{self.metric} has been at or {'above' if self.above else 'below'} "
+                                       f"{self.threshold} for {held:.0f}s (now {value})")
+
+
+class SlopeRule(AlertRule):
+    """Fires when a metric grows faster than `rate` units per minute over about `window` seconds.
+
+    The slope is the leak detector's exponentially weighted fit with `window`
+    as its time constant, a few floats however long the window.
+    """
+
+    def __init__(self, name, rate, window=300, cooldown=DEFAULT_COOLDOWN_TIME, metric="used_mb"):
+        super().__init__(name, cooldown)
+        self.rate = rate
+        self.metric = metric
+        self.window = window
+        self.trend = None
+
+    def check(self, sample):
+        value = sample_metric(sample, self.metric)
+        if self.trend is None:
+            self.trend = Trend(self.metric, sample.timestamp, value)
+        else:
+            self.trend.update(sample.timestamp, value, self.window)
+        # Wait for most of a window so a single jump is not read as a trend
+        if self.trend.last_seen - self.trend.first_seen < 0.8 * self.window:
+            return None
+        per_minute = self.trend.slope() * 60
+        if per_minute < self.rate:
+            return None
+        return per_minute, self.rate, (f"{self.metric} is growing at {per_minute:.1f}/min "
+                                       f"over the last {self.window}s (Threshold: {self.rate}/min)")
+
+
+class ProcessGrowthRule(AlertRule):
+    """Fires when any ranked process's RSS grows faster than `rate` MB per minute over `window` seconds.
+
+    Each process keeps the leak detector's exponentially weighted trend, with
+    `window` as its time constant, so the state per process is a few floats.
+    """
+
+    def __init__(self, name, rate, window=600, cooldown=DEFAULT_COOLDOWN_TIME, min_mb=0.0):
+        super().__init__(name, cooldown)
+        self.rate = rate
+        self.window = window
+        self.min_mb = min_mb
+        self._trends = {}
+        self._last_snapshot_time = None
+
+    def check(self, sample):
+        snapshot = sample.snapshot
+        if snapshot.timestamp == self._last_snapshot_time:
+            return None  # Process table was not rescanned this tick
+        self._last_snapshot_time = snapshot.timestamp
+        trends = {}
+        offenders = []
+        for p in snapshot.processes:
+            key = (p["pid"], p.get("create_time"))  # A reused PID starts a new trend
+            trend = self._trends.get(key)
+            if trend is None:
+                trend = Trend(p["name"], snapshot.timestamp, p["memory_mb"])
+            else:
+                trend.update(snapshot.timestamp, p["memory_mb"], self.window)
+            trends[key] = trend
+            if p["memory_mb"] < self.min_mb or trend.last_seen - trend.first_seen < 0.8 * self.window:
+                continue
+            per_minute = trend.slope() * 60
+            if per_minute >= self.rate:
+                offenders.append((per_minute, p))
+        # Processes that exited or dropped out of the snapshot lose their history
+        self._trends = trends
+        if not offenders:
+            return None
+        offenders.sort(key=lambda o: o[0], reverse=True)
+        details = "\n".join(f"{p['name']} (PID: {p['pid']}) - {p['memory_mb']}MB, +{rate:.1f}MB/min"
+                            for rate, p in offenders[:3])
+        return (offenders[0][0], self.rate,
+                f"{len(offenders)} process(es) growing faster than {self.rate}MB/min:\n{details}",
+                [p for _, p in offenders[:3]])
+
+
+def _parse_condition(condition):
+    for op, above in ((">", True), ("<", False)):
+        if op in condition:
+            metric, value = condition.split(op, 1)
+            return metric.strip(), _rate(value), above
+    raise ValueError(f"Expected METRIC>VALUE or METRIC<VALUE, got {condition!r}")
+
+
+def _rate(text):
+    text = text.strip()
+    if text.endswith("/min"):
+        text = text[:-len("/min")]
+    return float(text)
+
+
+def _seconds(text):
+    text = text.strip()
+    if not text:
+        raise ValueError("missing duration")
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def parse_rule(spec, cooldown=DEFAULT_COOLDOWN_TIME):
+    """Build a rule from a command-line spec:
+
+    threshold:METRIC>VALUE, sustained:METRIC>VALUE:DURATION,
+    slope:METRIC>RATE/min:WINDOW, process_growth:RATE/min:WINDOW
+    e.g. "sustained:memory_percent>90:2m" or "process_growth:50/min:10m"
+    """
+    kind, _, rest = spec.partition(":")
+    parts = rest.split(":")
+    if kind == "threshold" and len(parts) == 1:
+        metric, value, above = _parse_condition(parts[0])
+        return ThresholdRule(spec, value, cooldown, sample_metric_name(metric), above)
+    if kind == "sustained" and len(parts) == 2:
+        metric, value, above = _parse_condition(parts[0])
+        return SustainedRule(spec, value, _seconds(parts[1]), cooldown, sample_metric_name(metric), above)
+    if kind == "slope" and len(parts) == 2:
+        metric, value, above = _parse_condition(parts[0])
+        if not above:
+            raise ValueError(f"Slope rules only watch growth, use METRIC>RATE/min: {spec!r}")
+        return SlopeRule(spec, value, _seconds(parts[1]), cooldown, sample_metric_name(metric))
+    if kind == "process_growth" and len(parts) == 2:
+        return ProcessGrowthRule(spec, _rate(parts[0]), _seconds(parts[1]), cooldown)
+    raise ValueError(f"Invalid rule spec: {spec!r}")
+
+
+def sample_metric_name(metric):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric} (expected one of {', '.join(METRICS)})")
+    return metric
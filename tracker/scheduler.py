@@ -0,0 +1,98 @@
+import time
+
+
+class AdaptiveScheduler:
+    """Decides when the sampler runs the expensive process scan.
+
+    System-wide memory is sampled every `base_interval`. The process scan runs
+    every `normal_scan_interval`, speeding up towards `min_scan_interval` as
+    memory gets within `pressure_margin` points of the alert threshold or moves
+    quickly, and backing off to `idle_scan_interval` when the machine is quiet
+    and `hidden_scan_interval` when nobody is looking. The interval is never
+    shorter than the measured scan cost divided by `cpu_budget` (the share of
+    one core the scan may use).
+    """
+
+    def __init__(self, base_interval=1.0, min_scan_interval=1.0, normal_scan_interval=5.0,
+                 idle_scan_interval=15.0, hidden_scan_interval=30.0, cpu_budget=0.05,
+                 threshold=lambda: 80, pressure_margin=10.0, fast_change=0.5, idle_cpu=5.0):
+        self.base_interval = base_interval
+        self.min_scan_interval = min_scan_interval
+        self.normal_scan_interval = normal_scan_interval
+        self.idle_scan_interval = idle_scan_interval
+        self.hidden_scan_interval = hidden_scan_interval
+        self.cpu_budget = cpu_budget
+        self.threshold = threshold
+        self.pressure_margin = pressure_margin
+        self.fast_change = fast_change  # Memory % per second that counts as changing quickly
+        self.idle_cpu = idle_cpu
+        self.visible = True
+        self.reason = "startup"
+        self._percent = None
+        self._cpu = 0.0
+        self._observed_at = None
+        self._change_rate = 0.0
+        self._scan_cost = 0.0
+        self._last_scan = None
+        self._interval = min_scan_interval
+
+    def set_visible(self, visible):
+        self.visible = visible
+
+    def observe(self, timestamp, memory_percent, cpu_percent=0.0):
+        """Feed the cheap system-wide metrics from every tick"""
+        if self._observed_at is not None and timestamp > self._observed_at:
+            rate = abs(memory_percent - self._percent) / (timestamp - self._observed_at)
+            # Smooth over a few ticks so one jitter does not flip the rate
+            self._change_rate += 0.3 * (rate - self._change_rate)
+        self._percent = memory_percent
+        self._cpu = cpu_percent
+        self._observed_at = timestamp
+
+    def scan_interval(self):
+        if not self.visible:
+            interval, reason = self.hidden_scan_interval, "hidden"
+        elif self._percent is None:
+            interval, reason = self.min_scan_interval, "startup"
+        else:
+            pressure = 1 - (self.threshold() - self._percent) / self.pressure_margin
+            change = self._change_rate / self.fast_change
+            urgency = min(1.0, max(0.0, pressure, change))
+            if urgency > 0:
+                interval = self.normal_scan_interval - (self.normal_scan_interval - self.min_scan_interval) * urgency
+                reason = "pressure" if pressure >= change else "changing"
+            elif self._cpu < self.idle_cpu:
+                interval, reason = self.idle_scan_interval, "idle"
+            else:
+                interval, reason = self.normal_scan_interval, "normal"
+
+        floor = self._scan_cost / self.cpu_budget if self.cpu_budget else 0.0
+        if floor > interval:
+            interval, reason = floor, "cpu budget"
+        self._interval = interval
+        self.reason = reason
+        return interval
+
+    def should_scan(self, now=None):
+        now = time.monotonic() if now is None else now
+        return self._last_scan is None or now - self._last_scan >= self.scan_interval()
+
+    def record_scan(self, duration, now=None):
+        self._last_scan = time.monotonic() if now is None else now
+        if self._scan_cost == 0.0:
+            self._scan_cost = duration
+        else:
+            self._scan_cost += 0.2 * (duration - self._scan_cost)
+
+    def rates(self):
+        """Effective rates, for display and the IPC `scheduler` query"""
+        return {
+            "system_hz": 1 / self.base_interval,
+            "scan_hz": 1 / self._interval,
+            "scan_interval": self._interval,
+            "reason": self.reason,
+            "scan_cost_ms": self._scan_cost * 1000,
+            "scan_cpu_share": self._scan_cost / self._interval,
+            "cpu_budget": self.cpu_budget,
+            "visible": self.visible,
+        }
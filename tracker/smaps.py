@@ -0,0 +1,105 @@
+"""PSS, USS and swap per process from /proc/<pid>/smaps_rollup.
+
+RSS counts shared pages once per process that maps them, so forked workers
+look far bigger than they are. The kernel walks every mapping to answer an
+smaps_rollup read, so it is only read for the top candidates by RSS. Each
+value is kept for `refresh_interval` seconds, and entries for processes that
+left the top are dropped after `ttl` seconds.
+"""
+import os
+import time
+
+# smaps_rollup fields, in kB, and which column they add to
+_FIELDS = {
+    b"Pss:": "pss_mb",
+    b"Private_Clean:": "uss_mb",
+    b"Private_Dirty:": "uss_mb",
+    b"Private_Hugetlb:": "uss_mb",
+    b"Swap:": "swap_mb",
+}
+COLUMNS = ("pss_mb", "uss_mb", "swap_mb")
+
+
+def parse_smaps(data):
+    """Sum the interesting fields of smaps_rollup (or full smaps) output, in MB"""
+    totals = dict.fromkeys(COLUMNS, 0)
+    for line in data.splitlines():
+        column = _FIELDS.get(line.split(None, 1)[0] if line else b"")
+        if column is not None:
+            totals[column] += int(line.split()[1])
+    return {column: round(kb / 1024, 2) for column, kb in totals.items()}
+
+
+class SmapsReader:
+    """Adds pss_mb, uss_mb and swap_mb to the top processes, reading as little as possible"""
+
+    def __init__(self, proc_root="/proc", top_k=10, refresh_interval=10.0, ttl=60.0):
+        self.proc_root = proc_root
+        self.top_k = top_k
+        self.refresh_interval = refresh_interval
+        self.ttl = ttl
+        self._cache = {}  # (pid, create_time) -> (values or None, read at, last used)
+        self._rollup = True  # Kernels before 4.14 only have the full smaps file
+        self.reads = 0
+        self.failures = 0
+        self.hits = 0
+        self.evictions = 0
+        self.read_time = 0.0
+        self.last_read_time = 0.0
+
+    def _read(self, pid):
+        base = os.path.join(self.proc_root, str(pid))
+        if self._rollup:
+            try:
+                with open(base + "/smaps_rollup", "rb") as f:
+                    return parse_smaps(f.read())
+            except FileNotFoundError:
+                if not os.path.exists(base):
+                    raise
+                self._rollup = False
+        with open(base + "/smaps", "rb") as f:
+            return parse_smaps(f.read())
+
+    def enrich(self, processes, now=None):
+        """Attach cached or fresh values to the first `top_k` rows, in place"""
+        now = time.monotonic() if now is None else now
+        started = time.perf_counter()
+        read = 0
+        for row in processes[:self.top_k]:
+            key = (row["pid"], row["create_time"])
+            entry = self._cache.get(key)
+            if entry is not None and now - entry[1] < self.refresh_interval:
+                values = entry[0]
+                self._cache[key] = (values, entry[1], now)
+                self.hits += 1
+            else:
+                try:
+                    values = self._read(row["pid"])
+                except (OSError, ValueError, IndexError):
+                    values = None  # Gone or not ours to read, don't retry until the entry is stale
+                    self.failures += 1
+                self._cache[key] = (values, now, now)
+                read += 1
+            if values is not None:
+                row.update(values)
+
+        for key in [k for k, entry in self._cache.items() if now - entry[2] >= self.ttl]:
+            del self._cache[key]
+            self.evictions += 1
+        if read:
+            self.reads += read
+            self.last_read_time = time.perf_counter() - started
+            self.read_time += self.last_read_time
+        return processes
+
+    def stats(self):
+        return {
+            "reads": self.reads,
+            "failures": self.failures,
+            "cache_hits": self.hits,
+            "evictions": self.evictions,
+            "cached": len(self._cache),
+            "avg_read_ms": self.read_time / self.reads * 1000 if self.reads else 0.0,
+            "last_pass_ms": self.last_read_time * 1000,
+            "source": "smaps_rollup" if self._rollup else "smaps",
+        }
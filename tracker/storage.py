@@ -0,0 +1,390 @@
+import json
+import os
+import struct
+import time
+
+from tracker.pressure import FIELDS as PRESSURE_FIELDS
+
+try:
+    import fcntl
+except ImportError:  # Not on Unix
+    fcntl = None
+
+MAGIC = b"RFLOWMET"
+HEADER_SIZE = 4096  # Records start here, the header JSON is padded with zeros
+FORMAT_VERSION = 1
+DEFAULT_PATH = os.path.join("logs", "metrics.bin")
+DEFAULT_TOP_N = 5
+NAME_BYTES = 16
+# Records older than this are deleted, the same span as the coarsest rollup tier
+DEFAULT_RETENTION = 60 * 24 * 3600
+# Records older than this are merged into one record per DOWNSAMPLE_INTERVAL seconds
+DEFAULT_RAW_RETENTION = 2 * 24 * 3600
+DOWNSAMPLE_INTERVAL = 60
+# Seconds between compactions while appending
+COMPACT_INTERVAL = 3600
+
+# NumPy type strings used in the layout and their struct equivalents
+_STRUCT_CODES = {"<f8": "d", "<f4": "f", "<i4": "i", f"|S{NAME_BYTES}": f"{NAME_BYTES}s"}
+
+
+def record_layout(top_n=DEFAULT_TOP_N):
+    """Fixed-width layout of one sample on disk, in NumPy `dtype.descr` form"""
+    return [
+        ["timestamp", "<f8"],
+        ["memory_percent", "<f4"],
+        ["used_mb", "<f4"],
+        ["available_mb", "<f4"],
+        ["cpu_percent", "<f4"],
+        ["swap_percent", "<f4"],
+        *([name, "<f4"] for name in PRESSURE_FIELDS),
+        ["top_pid", "<i4", [top_n]],
+        ["top_name", f"|S{NAME_BYTES}", [top_n]],
+        ["top_memory_mb", "<f4", [top_n]],
+        ["top_memory_percent", "<f4", [top_n]],
+    ]
+
+
+def record_dtype(layout):
+    import numpy as np
+    return np.dtype([tuple(tuple(x) if isinstance(x, list) else x for x in field) for field in layout])
+
+
+class RecordPacker:
+    """Packs records with `struct`, so writing history never needs NumPy"""
+
+    def __init__(self, layout):
+        self.fields = []
+        codes = []
+        for field in layout:
+            count = field[2][0] if len(field) > 2 else None
+            self.fields.append((field[0], count, b"" if field[1].startswith("|S") else 0))
+            codes.append(_STRUCT_CODES[field[1]] * (count or 1))
+        self._struct = struct.Struct("<" + "".join(codes))
+        self.itemsize = self._struct.size
+
+    def pack(self, values):
+        """`values` maps field names to scalars or lists, missing ones are zero-filled"""
+        flat = []
+        for name, count, empty in self.fields:
+            value = values.get(name, empty)
+            if count is None:
+                flat.append(value)
+            else:
+                value = list(value)[:count]
+                flat.extend(value + [empty] * (count - len(value)))
+        return self._struct.pack(*flat)
+
+    def iter_unpack(self, data):
+        """{field: scalar or list} for every whole record in `data`"""
+        for flat in self._struct.iter_unpack(data):
+            values = {}
+            position = 0
+            for name, count, _ in self.fields:
+                if count is None:
+                    values[name] = flat[position]
+                    position += 1
+                else:
+                    values[name] = list(flat[position:position + count])
+                    position += count
+            yield values
+
+
+class StoreLocked(RuntimeError):
+    """Another process is already writing this metrics file"""
+
+
+def downsample(records, interval=DOWNSAMPLE_INTERVAL):
+    """Merge unpacked records into one per `interval`, stamped with the interval's start.
+
+    Scalar fields are averaged. The top process columns are those of the
+    record with the highest memory use, so the peak's culprits are kept.
+    """
+    merged = []
+    bucket = None
+    group = []
+    for record in list(records) + [None]:
+        start = None if record is None else record["timestamp"] // interval * interval
+        if group and start != bucket:
+            peak = max(group, key=lambda r: r["memory_percent"])
+            values = dict(peak)
+            for name, value in peak.items():
+                if not isinstance(value, list):
+                    values[name] = sum(r[name] for r in group) / len(group)
+            values["timestamp"] = bucket
+            merged.append(values)
+            group = []
+        bucket = start
+        if record is not None:
+            group.append(record)
+    return merged
+
+
+def decode_names(names):
+    return [n.decode(errors="replace") for n in names]
+
+
+class MetricsStore:
+    """Append-only binary history of samples, memory-mapped for queries.
+
+    The file is a small JSON header describing the record dtype followed by
+    fixed-width records, so range queries are a binary search over the
+    timestamp column and come back as NumPy arrays without any parsing. A torn
+    record at the end of the file (crash mid-write) is ignored and overwritten.
+
+    Only one process writes a file, it holds an exclusive flock for as long as
+    the store is open and opening a second writer raises StoreLocked. The
+    writer compacts the file on open and every COMPACT_INTERVAL: records older
+    than `retention` are dropped and those older than `raw_retention` are
+    merged into one record per DOWNSAMPLE_INTERVAL.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, top_n=DEFAULT_TOP_N, flush_interval=5.0, readonly=False,
+                 retention=DEFAULT_RETENTION, raw_retention=DEFAULT_RAW_RETENTION):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.readonly = readonly
+        self.retention = retention
+        self.raw_retention = raw_retention
+        self._map = None
+        self._mapped = None  # (record count, inode) the map was made for
+        self._compacted_until = 0.0
+        if readonly:
+            # Another process (the daemon) owns the file, only ever read it
+            self.layout = self._read_header() if os.path.exists(path) else record_layout(top_n)
+            self._init_layout()
+            self._file = None
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Lock before touching the header or the tail, another writer may be appending
+        self._file = self._open_locked(path)
+        try:
+            if os.path.getsize(path) >= HEADER_SIZE:
+                self.layout = self._read_header()
+            else:
+                self.layout = record_layout(top_n)
+                self._write_header()
+            self._init_layout()
+        except ValueError:
+            self._file.close()  # Releases the lock
+            raise
+
+        # Drop a partial trailing record before appending after it
+        size = os.path.getsize(path)
+        whole = HEADER_SIZE + (size - HEADER_SIZE) // self.itemsize * self.itemsize
+        if whole != size:
+            os.truncate(path, whole)
+
+        self._last_flush = time.monotonic()
+        self.compact()
+
+    @staticmethod
+    def _open_locked(path):
+        f = open(path, "ab")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                raise StoreLocked(f"Another ResFlow process is writing {path}") from None
+        return f
+
+    def _init_layout(self):
+        self.packer = RecordPacker(self.layout)
+        self.itemsize = self.packer.itemsize
+        self.top_n = next(field[2][0] for field in self.layout if field[0] == "top_pid")
+        self._dtype = None
+
+    def _read_header(self):
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if not header.startswith(MAGIC):
+            raise ValueError(f"{self.path} is not a ResFlow metrics file")
+        try:
+            meta = json.loads(header[len(MAGIC):].rstrip(b"\0"))
+            version, layout = meta["version"], meta["dtype"]
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f"{self.path} has a damaged header") from None
+        if version > FORMAT_VERSION:
+            raise ValueError(f"{self.path} uses a newer format (version {version})")
+        self._compacted_until = meta.get("compacted_until", 0.0)
+        return layout
+
+    def _header(self):
+        meta = json.dumps({"version": FORMAT_VERSION, "dtype": self.layout,
+                           "compacted_until": self._compacted_until}).encode()
+        header = MAGIC + meta
+        if len(header) > HEADER_SIZE:
+            raise ValueError("record layout does not fit in the header")
+        return header.ljust(HEADER_SIZE, b"\0")
+
+    def _write_header(self):
+        with open(self.path, "wb") as f:
+            f.write(self._header())
+
+    @property
+    def dtype(self):
+        if self._dtype is None:
+            self._dtype = record_dtype(self.layout)
+        return self._dtype
+
+    def make_record(self, sample):
+        top = sample.snapshot.top(self.top_n)
+        return self.packer.pack({
+            **sample.pressure,
+            "timestamp": sample.timestamp,
+            "memory_percent": sample.memory["percent"],
+            "used_mb": sample.memory["used"],
+            "available_mb": sample.memory["available"],
+            "cpu_percent": sample.cpu_percent,
+            "swap_percent": sample.swap["percent"],
+            "top_pid": [p["pid"] for p in top],
+            "top_name": [(p["name"] or "").encode()[:NAME_BYTES] for p in top],
+            "top_memory_mb": [p["memory_mb"] for p in top],
+            "top_memory_percent": [p["memory_percent"] for p in top],
+        })
+
+    def append(self, sample):
+        if self._file is None:
+            return
+        self._file.write(self.make_record(sample))
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+            if time.monotonic() - self._last_compact >= COMPACT_INTERVAL:
+                self.compact()
+
+    def _timestamp_index(self, f, count, timestamp):
+        """Index of the first record at or after `timestamp`, by binary search over the file"""
+        lo, hi = 0, count
+        while lo < hi:
+            middle = (lo + hi) // 2
+            f.seek(HEADER_SIZE + middle * self.itemsize)
+            if struct.unpack("<d", f.read(8))[0] < timestamp:
+                lo = middle + 1
+            else:
+                hi = middle
+        return lo
+
+    def compact(self, now=None):
+        """Drop records past `retention` and downsample those past `raw_retention`.
+
+        Writes a new file next to the old one and renames it over it, so
+        readers keep a consistent (if briefly stale) view. Returns the number
+        of records removed.
+        """
+        if self._file is None:
+            return 0
+        self._last_compact = time.monotonic()
+        self.flush()
+        now = time.time() if now is None else now
+        count = len(self)
+        raw_start = (now - self.raw_retention) // DOWNSAMPLE_INTERVAL * DOWNSAMPLE_INTERVAL
+        with open(self.path, "rb") as f:
+            keep = self._timestamp_index(f, count, now - self.retention)
+            merge = max(keep, self._timestamp_index(f, count, self._compacted_until))
+            raw = max(merge, self._timestamp_index(f, count, raw_start))
+            if keep == 0 and merge == raw:
+                return 0
+
+            f.seek(HEADER_SIZE + merge * self.itemsize)
+            merged = downsample(self.packer.iter_unpack(f.read((raw - merge) * self.itemsize)))
+            self._compacted_until = max(self._compacted_until, raw_start)
+            temporary = self.path + ".compact"
+            with open(temporary, "wb") as out:
+                out.write(self._header())
+                _copy_range(f, out, HEADER_SIZE + keep * self.itemsize, (merge - keep) * self.itemsize)
+                out.write(b"".join(self.packer.pack(record) for record in merged))
+                _copy_range(f, out, HEADER_SIZE + raw * self.itemsize, (count - raw) * self.itemsize)
+
+        new_file = self._open_locked(temporary)
+        os.replace(temporary, self.path)
+        self._file.close()
+        self._file = new_file
+        self._map = None
+        return count - len(self)
+
+    def flush(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self.flush()
+            self._file.close()
+        self._map = None
+
+    def __len__(self):
+        if not os.path.exists(self.path):
+            return 0
+        return max(0, os.path.getsize(self.path) - HEADER_SIZE) // self.itemsize
+
+    def records(self):
+        """All flushed records as a read-only memory-mapped structured array"""
+        import numpy as np
+        if self._file is not None and not self._file.closed:
+            self.flush()
+        count = len(self)
+        if count == 0:
+            return np.zeros(0, dtype=self.dtype)
+        # A compaction replaces the file, so a map of the same length may still be of the old one
+        mapped = (count, os.stat(self.path).st_ino)
+        if self._map is None or self._mapped != mapped:
+            self._map = np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+            self._mapped = mapped
+        return self._map
+
+    def query(self, start=None, end=None, resolution=None,
+              fields=("memory_percent", "used_mb", "available_mb", "cpu_percent", "swap_percent",
+                      "psi_some_avg10", "stall_percent")):
+        """Return {"timestamp": ..., field: ...} arrays for samples in [start, end).
+
+        With `resolution` (seconds), samples are averaged into buckets of that
+        width and each bucket is stamped with its start time. Fields missing
+        from an older file's layout come back as NaN.
+        """
+        import numpy as np
+        records = self.records()
+        times = records["timestamp"]
+        lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+        hi = len(times) if end is None else int(np.searchsorted(times, end, side="left"))
+        window = records[lo:hi]
+        names = window.dtype.names
+
+        if not resolution or len(window) == 0:
+            result = {"timestamp": np.array(window["timestamp"])}
+            for field in fields:
+                result[field] = np.array(window[field]) if field in names else np.full(len(window), np.nan)
+            return result
+
+        buckets = np.floor(window["timestamp"] / resolution)
+        edges = np.flatnonzero(np.diff(buckets)) + 1
+        starts = np.concatenate(([0], edges))
+        counts = np.diff(np.concatenate((starts, [len(window)])))
+        result = {"timestamp": buckets[starts] * resolution}
+        for field in fields:
+            if field not in names:
+                result[field] = np.full(len(starts), np.nan)
+                continue
+            values = window[field].astype(np.float64)
+            result[field] = np.add.reduceat(values, starts) / counts
+        return result
+
+    def last(self, seconds, resolution=None, **kwargs):
+        """Convenience wrapper, e.g. last(24 * 3600, resolution=60)"""
+        return self.query(start=time.time() - seconds, resolution=resolution, **kwargs)
+
+
+def _copy_range(source, destination, offset, length, chunk=1 << 20):
+    source.seek(offset)
+    while length > 0:
+        data = source.read(min(chunk, length))
+        if not data:
+            break
+        destination.write(data)
+        length -= len(data)
@@ -0,0 +1,104 @@
+import numpy as np
+
+DEFAULT_METRICS = ("memory_percent", "used_mb", "cpu_percent", "swap_percent", "psi_some_avg10")
+
+
+class RingBuffer:
+    """Fixed-capacity time series for several metrics, allocated once.
+
+    Every value is written twice, at `i` and `i + capacity`, so the newest `n`
+    points always sit in one contiguous slice and `times()`/`values()` can hand
+    out views without copying, even after the buffer has wrapped.
+    """
+
+    def __init__(self, capacity, metrics=DEFAULT_METRICS, dtype=np.float64):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.metrics = tuple(metrics)
+        self._rows = {name: i + 1 for i, name in enumerate(self.metrics)}  # Row 0 holds timestamps
+        self._data = np.full((len(self.metrics) + 1, 2 * capacity), np.nan, dtype=dtype)
+        self._head = 0
+        self._size = 0
+
+    @classmethod
+    def for_retention(cls, hours, interval=1.0, metrics=DEFAULT_METRICS):
+        """Size the buffer to keep `hours` of history sampled every `interval` seconds"""
+        return cls(max(1, int(hours * 3600 / interval)), metrics)
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, values):
+        """Store one point; `values` maps metric names to numbers, missing ones become NaN"""
+        column = np.full(len(self.metrics) + 1, np.nan)
+        column[0] = timestamp
+        for name, value in values.items():
+            row = self._rows.get(name)
+            if row is not None:
+                column[row] = value
+        head = self._head
+        self._data[:, head] = column
+        self._data[:, head + self.capacity] = column
+        self._head = (head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def replace_last(self, timestamp, values):
+        """Overwrite the newest point in place, e.g. while a bucket is still filling"""
+        if not self._size:
+            self.append(timestamp, values)
+            return
+        self._head = (self._head - 1) % self.capacity
+        self._size -= 1
+        self.append(timestamp, values)
+
+    def extend(self, timestamps, values):
+        """Bulk version of `append`, `values` maps metric names to arrays"""
+        timestamps = np.asarray(timestamps)[-self.capacity:]
+        count = len(timestamps)
+        if count == 0:
+            return
+        columns = np.full((len(self.metrics) + 1, count), np.nan)
+        columns[0] = timestamps
+        for name, array in values.items():
+            row = self._rows.get(name)
+            if row is not None:
+                columns[row] = np.asarray(array)[-count:]
+        positions = (self._head + np.arange(count)) % self.capacity
+        self._data[:, positions] = columns
+        self._data[:, positions + self.capacity] = columns
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def clear(self):
+        self._data.fill(np.nan)
+        self._head = 0
+        self._size = 0
+
+    def _window(self, last):
+        n = self._size if last is None else min(last, self._size)
+        end = self._head + self.capacity
+        return end - n, end
+
+    def times(self, last=None):
+        start, end = self._window(last)
+        return self._data[0, start:end]
+
+    def values(self, metric, last=None):
+        start, end = self._window(last)
+        return self._data[self._rows[metric], start:end]
+
+    def index_range(self, start, end):
+        """(first, last) offsets into `times()` covering [start, end], both inclusive"""
+        times = self.times()
+        return int(np.searchsorted(times, start, side="left")), int(np.searchsorted(times, end, side="right"))
+
+    def count_since(self, timestamp):
+        """Number of newest points whose timestamp is at or after `timestamp`"""
+        times = self.times()
+        return len(times) - int(np.searchsorted(times, timestamp, side="left"))
+
+    def latest(self, metric):
+        if not self._size:
+            return None
+        return self._data[self._rows[metric], self._head + self.capacity - 1]